@@ -1,4 +1,4 @@
-from RemoteMonitorLibrary.model.db_schema import Table, Field, FieldType, PrimaryKeys, Query, ForeignKey
+from RemoteMonitorLibrary.model.db_schema import Table, Field, FieldType, PrimaryKeys, Query, ForeignKey, Index
 
 
 class TraceHost(Table):
@@ -14,7 +14,7 @@ class Points(Table):
                        fields=(Field('HOST_REF', FieldType.Int), Field('PointName'), Field('Start'), Field('End')),
                        foreign_keys=[ForeignKey('HOST_REF', 'TraceHost', 'HOST_ID')],
                        queries=[Query('select_state', """SELECT {} FROM Points
-                       WHERE HOST_REF = {} AND PointName = '{}'""")])
+                       WHERE HOST_REF = ? AND PointName = ?""", Index('HOST_REF', 'PointName'))])
 
 
 class LinesCacheMap(Table):
@@ -23,15 +23,74 @@ class LinesCacheMap(Table):
                                  Field('LINE_REF', FieldType.Int)],
                          foreign_keys=[ForeignKey('OUTPUT_REF', 'TimeMeasurement', 'OUTPUT_ID'),
                                        ForeignKey('LINE_REF', 'LinesCache', 'LINE_ID')],
-                         queries=[Query('last_output_id', 'select max(OUTPUT_REF) from LinesCacheMap')])
+                         queries=[Query('last_output_id', 'select max(OUTPUT_REF) from LinesCacheMap',
+                                        Index('OUTPUT_REF', 'ORDER_ID'))])
 
 
-class LinesCache(Table):
+class OutputDigest(Table):
+    def __init__(self):
+        super().__init__(fields=[Field('Digest', unique=True), Field('OUTPUT_REF', FieldType.Int)],
+                         queries=[Query('select_output', 'SELECT OUTPUT_REF FROM OutputDigest WHERE Digest == ?')])
+
+
+class OutputDictionary(Table):
+    def __init__(self):
+        super().__init__(fields=[Field('DICT_ID', FieldType.Int, PrimaryKeys(True)),
+                                 Field('Name', unique=True), Field('Data', FieldType.Blob)],
+                         queries=[Query('select_dictionary',
+                                        'SELECT DICT_ID, Data FROM OutputDictionary WHERE Name == ?')])
+
+
+class OutputBlocks(Table):
+    def __init__(self):
+        super().__init__(fields=[Field('OUTPUT_REF', FieldType.Int), Field('BLOCK_ID', FieldType.Int),
+                                 Field('Codec'), Field('DICT_REF', FieldType.Int), Field('Data', FieldType.Blob)],
+                         foreign_keys=[ForeignKey('DICT_REF', 'OutputDictionary', 'DICT_ID')],
+                         queries=[Query('last_output_id', 'select max(OUTPUT_REF) from OutputBlocks',
+                                        Index('OUTPUT_REF', 'BLOCK_ID'))])
+
+
+class Partitions(Table):
     def __init__(self):
+        super().__init__(fields=[Field('PART_ID', FieldType.Int, PrimaryKeys(True)), Field('FileName'),
+                                 Field('Start'), Field('End')],
+                         queries=[Query('next_id', 'SELECT IFNULL(MAX(PART_ID), 0) + 1 FROM Partitions'),
+                                  Query('select_current', 'SELECT PART_ID, FileName, Start FROM Partitions '
+                                                          'WHERE End IS NULL ORDER BY PART_ID DESC LIMIT 1'),
+                                  Query('select_range', 'SELECT PART_ID, FileName FROM Partitions '
+                                                        'WHERE Start <= ? AND (End IS NULL OR End >= ?) '
+                                                        'ORDER BY PART_ID'),
+                                  Query('delete', 'DELETE FROM Partitions WHERE PART_ID = ?')])
+
+
+class LinesCache(Table):
+    def __init__(self, hash_type: FieldType = FieldType.Text):
         Table.__init__(self, fields=[
             Field('LINE_ID', FieldType.Int, PrimaryKeys(True)),
-            Field('HashTag', unique=True),
-            Field('Line')])
+            Field('HashTag', hash_type, unique=True),
+            Field('Line')],
+                       queries=[Query('select_line', 'SELECT LINE_ID, Line FROM LinesCache WHERE HashTag == ?')])
+
+
+class DimensionTable(Table):
+    def __init__(self, name, id_field, value_field: Field):
+        """
+        Distinct values stored once & referenced by integer ID from plugin tables
+        :param id_field: ID field name
+        :param value_field: interned value field (unique)
+        """
+        super().__init__(name=name, fields=[Field(id_field, FieldType.Int, PrimaryKeys(True)), value_field],
+                         queries=[Query('select_id', f'SELECT {id_field} FROM {name} WHERE {value_field.name} == ?')])
+        self._id_field = id_field
+        self._value_field = value_field
+
+    @property
+    def id_field(self):
+        return self._id_field
+
+    @property
+    def value_field(self) -> Field:
+        return self._value_field
 
 
 class PlugInTable(Table):
@@ -40,17 +99,90 @@ class PlugInTable(Table):
         self.add_field(Field('TL_REF', FieldType.Int))
         self.add_foreign_key(ForeignKey('TL_REF', 'TimeLine', 'TL_ID'))
         self.add_foreign_key(ForeignKey('HOST_REF', 'TraceHost', 'HOST_ID'))
+        self.add_index(Index('HOST_REF', 'TL_REF'))
 
     def add_output_cache_reference(self):
         self.add_field(Field('OUTPUT_REF', FieldType.Int))
         self.add_foreign_key(ForeignKey('OUTPUT_REF', 'LinesCacheMap', 'OUTPUT_REF'))
 
 
+ROLLUP_BUCKET = "datetime((CAST(strftime('%s', t.TimeStamp) AS INTEGER) / ?1) * ?1, 'unixepoch')"
+
+
+class RollupTable(Table):
+    REFERENCES = ('HOST_REF', 'TL_REF', 'OUTPUT_REF')
+    AGGREGATES = ('min', 'avg', 'max')
+
+    def __init__(self, source: Table, *keys):
+        """
+        Min/Avg/Max of plugin table numeric fields per time bucket; Bucket referenced by its start in TimeLine
+        :param source: plugin table aggregated
+        :param keys: source fields rows grouped by within bucket (i.e. PID, Command)
+        """
+        self._source = source
+        self._keys = keys
+        self._values = tuple(f.name for f in source.fields if f.type in (FieldType.Int, FieldType.Real)
+                             and f.name not in keys + self.REFERENCES)
+        name, keys_list = f"{source.name}_rollup", ''.join(f", n.{k}" for k in keys)
+        buckets = f"""SELECT n.HOST_REF, b.TL_ID, ?1{keys_list}, COUNT(), {', '.join(
+            f"{a.upper()}(n.{v})" for v in self._values for a in self.AGGREGATES)}
+                             FROM {source.name} n JOIN TimeLine t ON n.TL_REF = t.TL_ID
+                             JOIN TimeLine b ON b.TimeStamp = {ROLLUP_BUCKET}
+                             WHERE t.TimeStamp >= ?2 AND t.TimeStamp < ?3
+                             GROUP BY n.HOST_REF, b.TL_ID{keys_list}"""
+        super().__init__(name=name,
+                         fields=[Field('HOST_REF', FieldType.Int), Field('TL_REF', FieldType.Int),
+                                 Field('Resolution', FieldType.Int)] +
+                                [f for f in source.fields if f.name in keys] +
+                                [Field('Samples', FieldType.Int)] +
+                                [Field(f"{v}_{a}", FieldType.Real) for v in self._values for a in self.AGGREGATES],
+                         foreign_keys=[ForeignKey('TL_REF', 'TimeLine', 'TL_ID'),
+                                       ForeignKey('HOST_REF', 'TraceHost', 'HOST_ID')],
+                         indexes=[Index('HOST_REF', 'Resolution', 'TL_REF'), Index('Resolution', 'TL_REF')],
+                         queries=[
+                             Query('buckets', buckets),
+                             Query('aggregate', f"INSERT INTO {name}\n{buckets}"),
+                             Query('last_bucket', f"""SELECT MAX(t.TimeStamp) FROM {name} r
+                             JOIN TimeLine t ON r.TL_REF = t.TL_ID WHERE r.Resolution = ?"""),
+                             Query('first_sample', f"""SELECT MIN(t.TimeStamp) FROM {source.name} n
+                             JOIN TimeLine t ON n.TL_REF = t.TL_ID"""),
+                             Query('prune', f"""DELETE FROM {source.name}
+                             WHERE TL_REF IN (SELECT TL_ID FROM TimeLine WHERE TimeStamp < ?)"""),
+                             Query('source', f"""SELECT {', '.join(self._shape(f.name) for f in source.fields)}
+                             FROM {name} WHERE Resolution = ?
+                             UNION ALL SELECT * FROM {source.name}
+                             WHERE TL_REF IN (SELECT TL_ID FROM TimeLine WHERE TimeStamp >= ?)""")])
+        self._dimension_references.update({k: d for k, d in source.dimension_references.items() if k in keys})
+
+    def _shape(self, field_name):
+        if field_name in self._keys + self.REFERENCES[:2]:
+            return field_name
+        if field_name in self._values:
+            return f"{field_name}_avg AS {field_name}"
+        return f"NULL AS {field_name}"
+
+    @property
+    def source(self) -> Table:
+        return self._source
+
+    @property
+    def keys(self):
+        return self._keys
+
+    @property
+    def values(self):
+        return self._values
+
+
 class TimeLine(Table):
     def __init__(self):
         Table.__init__(self, name='TimeLine',
                        fields=[Field('TL_ID', FieldType.Int, PrimaryKeys(True)), Field('TimeStamp', FieldType.Text)],
-                       queries=[Query('select_last', 'SELECT TL_ID FROM TimeLine WHERE TimeStamp == "{timestamp}"')]
+                       queries=[Query('select_last', 'SELECT TL_ID FROM TimeLine WHERE TimeStamp == ?',
+                                      Index('TimeStamp')),
+                                Query('select_range', 'SELECT MIN(TimeStamp), MAX(TimeStamp) FROM TimeLine'),
+                                Query('select_latest',
+                                      'SELECT TimeStamp, TL_ID FROM TimeLine ORDER BY TL_ID DESC LIMIT ?')]
                        )
 
 
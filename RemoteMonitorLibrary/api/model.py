@@ -1,4 +1,4 @@
-from RemoteMonitorLibrary.model.db_schema import Table, Field, Query, PrimaryKeys, ForeignKey, FieldType
+from RemoteMonitorLibrary.model.db_schema import Table, Field, Query, PrimaryKeys, ForeignKey, FieldType, Index
 from RemoteMonitorLibrary.model.commandunit import CommandUnit
 
 
@@ -8,6 +8,7 @@ __all__ = [
     'Field',
     'FieldType',
     'ForeignKey',
+    'Index',
     'PrimaryKeys',
     'Query',
 ]
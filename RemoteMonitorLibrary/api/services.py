@@ -1,23 +1,142 @@
+import atexit
+import glob
 import hashlib
 import logging
+import lzma
+import os
 import sqlite3
-from concurrent.futures.thread import ThreadPoolExecutor
-from datetime import datetime
-from queue import Queue
-from threading import Timer, Thread, Event, RLock
-from time import sleep
-from typing import Mapping, AnyStr, List
-
-from robot.utils import DotDict
+import tempfile
+import zlib
+from concurrent.futures import Future, InvalidStateError, wait, ALL_COMPLETED
+from contextlib import contextmanager, closing
+from datetime import datetime, timedelta
+from enum import Enum
+from collections import deque
+from itertools import groupby, repeat
+from queue import Queue, Empty, Full
+from threading import Thread, Event, RLock
+from time import monotonic
+from typing import Mapping, AnyStr, List, Iterator, Tuple, Iterable, Sequence, Any
+
+from robot.utils import DotDict, is_truthy
 
 from RemoteMonitorLibrary.api import db
 from RemoteMonitorLibrary.model.registry_model import RegistryModule
 from RemoteMonitorLibrary.model.runner_model import plugin_runner_abstract
 from RemoteMonitorLibrary.utils import Singleton, sql_engine, get_error_info
+from RemoteMonitorLibrary.utils.collections import DataQueue, OverflowPolicy, LRUCache, Histogram, PriorityLock
+from RemoteMonitorLibrary.utils.journal import DataJournal, JOURNAL_EXT
 from RemoteMonitorLibrary.utils.logger_helper import logger
-from RemoteMonitorLibrary.utils.sql_engine import DB_DATETIME_FORMAT, insert_sql
+from RemoteMonitorLibrary.utils.scheduler import TimeoutScheduler, ScheduledCall
+from RemoteMonitorLibrary.utils.sql_engine import DB_DATETIME_FORMAT, insert_sql, update_sql
 
 DEFAULT_DB_FILE = 'RemoteMonitorLibrary.db'
+DEFAULT_BATCH_SIZE = 200
+DEFAULT_BATCH_TIMEOUT = 0.1
+DEFAULT_QUEUE_SIZE = 10000
+DEFAULT_OVERFLOW_POLICY = OverflowPolicy.Block.value
+DEFAULT_IDLE_TIMEOUT = 1
+DEFAULT_PIPELINE_DEPTH = 4
+DEFAULT_DRAIN_TIMEOUT = 5
+DEFAULT_TIMELINE_CACHE_SIZE = 3600
+DEFAULT_DIMENSION_CACHE_SIZE = 1024
+DEFAULT_PARTITION_MARGIN = 300
+SQLITE_MAX_ATTACHED = 10
+DEFAULT_ROLLUP_INTERVAL = 60
+DEFAULT_ROLLUP_LAG = 60
+DEFAULT_CHART_WIDTH = 640
+ROLLUP_EPOCH = datetime(1970, 1, 1)
+INT64_RANGE = 2 ** 64
+
+
+class LineHash(Enum):
+    """
+    LinesCache line identity
+    md5   - hex digest stored as TEXT (32 chars)
+    int64 - 64 bit blake2b digest stored as INTEGER; Collisions verified against stored line
+    """
+    MD5 = 'md5'
+    Int64 = 'int64'
+
+    @property
+    def field_type(self):
+        return db.FieldType.Int if self == LineHash.Int64 else db.FieldType.Text
+
+    @property
+    def verified(self):
+        return self == LineHash.Int64
+
+    def __call__(self, line: str):
+        if self == LineHash.Int64:
+            return int.from_bytes(hashlib.blake2b(line.encode('utf-8'), digest_size=8).digest(), 'big', signed=True)
+        return hashlib.md5(line.encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def next_key(key: int):
+        return (key + 1 + INT64_RANGE // 2) % INT64_RANGE - INT64_RANGE // 2
+
+
+DEFAULT_LINE_HASH = LineHash.MD5.value
+ZLIB_DICTIONARY_SIZE = 32 * 1024
+OUTPUT_READ_TEMPLATE = """{refs}SELECT m.OUTPUT_REF, m.ORDER_ID, l.Line, NULL, NULL, NULL
+FROM LinesCacheMap m JOIN LinesCache l ON l.LINE_ID = m.LINE_REF WHERE m.OUTPUT_REF IN ({where})
+UNION ALL
+SELECT b.OUTPUT_REF, b.BLOCK_ID, NULL, b.Codec, b.DICT_REF, b.Data
+FROM OutputBlocks b WHERE b.OUTPUT_REF IN ({where})
+ORDER BY 1, 2"""
+OUTPUT_REFS_TEMPLATE = """SELECT n.OUTPUT_REF FROM {table} n JOIN TimeLine t ON n.TL_REF = t.TL_ID
+WHERE n.HOST_REF = ?{period} AND n.OUTPUT_REF IS NOT NULL"""
+
+
+class OutputStorage(Enum):
+    """
+    Command output storage
+    lines - each unique line stored once in LinesCache; Output kept as lines order in LinesCacheMap
+    zlib  - output kept as zlib compressed blocks in OutputBlocks (Optional dictionary shared across outputs)
+    lzma  - output kept as lzma compressed blocks in OutputBlocks
+    """
+    Lines = 'lines'
+    Zlib = 'zlib'
+    Lzma = 'lzma'
+
+    def compress(self, data: bytes, zdict: bytes = None):
+        if self == OutputStorage.Lzma:
+            return lzma.compress(data)
+        compressor = zlib.compressobj(zdict=zdict) if zdict else zlib.compressobj()
+        return compressor.compress(data) + compressor.flush()
+
+    def decompress(self, data: bytes, zdict: bytes = None):
+        if self == OutputStorage.Lzma:
+            return lzma.decompress(data)
+        decompressor = zlib.decompressobj(zdict=zdict) if zdict else zlib.decompressobj()
+        return decompressor.decompress(data) + decompressor.flush()
+
+
+DEFAULT_OUTPUT_STORAGE = OutputStorage.Lines.value
+
+
+class WriterMode(Enum):
+    """
+    DB writer placement
+    thread  - writer thread within current process
+    process - dedicated writer process (SQLite work not compete with parsers for GIL); File DB only
+    """
+    Thread = 'thread'
+    Process = 'process'
+
+
+DEFAULT_WRITER_MODE = WriterMode.Thread.value
+
+
+def output_storage_options(name=None, **options):
+    """
+    Convert plugin options 'output_storage' & 'output_dictionary' into CacheLines.upload arguments
+    :param name: dictionary name (Shared by outputs of same plugin)
+    """
+    storage = OutputStorage(options.get('output_storage', None) or DEFAULT_OUTPUT_STORAGE)
+    dictionary = is_truthy(options.get('output_dictionary', False))
+    assert not dictionary or storage == OutputStorage.Zlib, "Output dictionary supported for zlib storage only"
+    return dict(storage=storage, dictionary=name if dictionary else None)
 
 
 class DataUnit:
@@ -25,10 +144,10 @@ class DataUnit:
         self._table = table
         self._ts = kwargs.get('datetime', None) or datetime.now().strftime(kwargs.get('format', DB_DATETIME_FORMAT))
         self._timeout = kwargs.get('timeout', None)
-        self._timer: Timer = None
+        self._timer: ScheduledCall = None
         self._data = list(data)
-        self._result = None
-        self._result_ready = False
+        self._future = Future()
+        self._enqueued_at = None
 
     @property
     def table(self):
@@ -38,6 +157,14 @@ class DataUnit:
     def timestamp(self):
         return self._ts
 
+    @property
+    def enqueued_at(self):
+        return self._enqueued_at
+
+    @enqueued_at.setter
+    def enqueued_at(self, value):
+        self._enqueued_at = value
+
     @staticmethod
     def _update_foreign_fields(table, **updates):
         return {fk.own_field: updates.get(fk.foreign_field) for fk in table.foreign_keys
@@ -63,53 +190,116 @@ class DataUnit:
     def __len__(self):
         return len(self._data)
 
-    @staticmethod
-    def _raise_timeout(msg):
-        def _():
-            raise TimeoutError(msg)
-
-        return _
+    def _expire(self):
+        try:
+            self._future.set_exception(TimeoutError(f"Timeout expired on query {self}"))
+        except InvalidStateError:
+            pass
 
     def __call__(self, **updates):
         if self._timeout:
-            self._timer = Timer(self._timeout, self._raise_timeout(f"Timeout expired on query {self}"))
-            self._timer.start()
+            self._timer = TimeoutScheduler().schedule(self._timeout, self._expire)
         self.get_insert_data(**updates)
 
     @property
     def sql_data(self):
         return f"{self}", self._data
 
+    @property
+    def future(self) -> Future:
+        """
+        Completion of unit write; Resolved with write result, TimeoutError if timeout expired before
+        """
+        return self._future
+
+    def add_done_callback(self, callback):
+        """
+        Callback invoked with unit once write completed (Immediately if already completed)
+        """
+        self._future.add_done_callback(lambda _: callback(self))
+
+    def wait(self, timeout=None):
+        return self._future.result(timeout)
+
     @property
     def result(self):
-        while not self.result_ready:
-            sleep(0.05)
-        return self._result
+        return self._future.result()
 
     @result.setter
     def result(self, value):
         if self._timer:
             self._timer.cancel()
-        self._result = value
-        self._result_ready = True
+        try:
+            self._future.set_result(value)
+        except InvalidStateError:
+            logger.debug(f"Result of {type(self).__name__} arrived after timeout expired")
 
     @property
     def result_ready(self):
-        return self._result_ready
+        return self._future.done()
+
+
+class ColumnarDataUnit(DataUnit):
+    def __init__(self, table: db.Table, columns: Mapping[str, Sequence] = None, constants: Mapping[str, Any] = None,
+                 **kwargs):
+        """
+        Data unit holding rows as columns (lists, array buffers, etc.) plus values common for all rows
+        Rows zipped from columns at write time; No per row template/dict conversion
+        :param columns: column name -> values sequence (All columns same length)
+        :param constants: column name -> value for all rows (HOST_REF, etc.); Foreign keys updates stored here
+        """
+        super().__init__(table, **kwargs)
+        self._columns = {}
+        self._constants = dict(constants or {})
+        self.set_columns(**(columns or {}))
+
+    def set_columns(self, **columns: Sequence):
+        unknown = [c for c in columns.keys() if c not in self._table.columns]
+        assert len(unknown) == 0, f"Columns {', '.join(unknown)} not exist in table '{self._table.name}'"
+        assert len(set(len(v) for v in columns.values())) <= 1, "Columns length not match"
+        self._columns = dict(columns)
 
-    def __del__(self):
-        if self._timer is not None:
-            self._timer.cancel()
+    def get_insert_data(self, **updates):
+        self._constants.update(self._update_foreign_fields(self._table, **updates))
+
+    def __len__(self):
+        return len(next(iter(self._columns.values()))) if len(self._columns) > 0 else 0
+
+    @property
+    def rows(self) -> List[Tuple]:
+        if len(self) == 0:
+            return []
+        return list(zip(*(self._columns[c] if c in self._columns else repeat(self._constants.get(c))
+                          for c in self._table.columns)))
+
+    @property
+    def sql_data(self):
+        return f"{self}", self.rows
+
+
+def wait_data_units(units: Iterable[DataUnit], timeout=None, return_when=ALL_COMPLETED):
+    """
+    Wait for several data units completion without polling
+    :param units: data units enqueued by DataHandlerService.add_data_unit
+    :param timeout: seconds (Wait forever if omitted)
+    :param return_when: ALL_COMPLETED | FIRST_COMPLETED | FIRST_EXCEPTION (See concurrent.futures.wait)
+    :return: done, not_done lists of data units
+    """
+    units = {unit.future: unit for unit in units}
+    done, not_done = wait(units.keys(), timeout, return_when)
+    return [units[f] for f in done], [units[f] for f in not_done]
 
 
 class DataRowUnitWithOutput(DataUnit):
     def __init__(self, table, *data, **kwargs):
-        super().__init__(table, *data)
+        super().__init__(table, *data, **kwargs)
         self._output = kwargs.get('output', None)
         assert self._output, "Output not provided"
+        self._storage = dict(storage=kwargs.get('storage', OutputStorage.Lines),
+                             dictionary=kwargs.get('dictionary', None))
 
     def __call__(self, **updates):
-        output_ref = CacheLines().upload(self._output)
+        output_ref = CacheLines().upload(self._output, **self._storage)
         for i in range(0, len(self._data)):
             _template = DotDict(self._data[i]._asdict())
             _template.update({'OUTPUT_REF': output_ref})
@@ -129,7 +319,8 @@ def data_factory(table, *data, **kwargs) -> DataUnit:
 class TableSchemaService:
     def __init__(self):
         self._tables = DotDict()
-        for builtin_table in (db.TraceHost(), db.TimeLine(), db.Points(), db.LinesCache(), db.LinesCacheMap()):
+        for builtin_table in (db.TraceHost(), db.TimeLine(), db.Points(), db.LinesCache(), db.LinesCacheMap(),
+                              db.OutputDigest(), db.OutputDictionary(), db.OutputBlocks(), db.Partitions()):
             self.register_table(builtin_table)
 
     @property
@@ -158,14 +349,404 @@ class PlugInService(dict, Mapping[AnyStr, plugin_runner_abstract]):
         logger.info(_registered_plugins)
 
 
+class WriterStatistics:
+    BATCH_SIZE_BOUNDS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+    QUEUE_DEPTH_BOUNDS = (0, 10, 100, 1000, 10000, 100000)
+    LATENCY_BOUNDS_MS = (0.5, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 5000)
+
+    def __init__(self):
+        """
+        Writer throughput & latency counters; Updated by writer thread only (No locking on hot path)
+        """
+        self._started = monotonic()
+        self._tables = {}
+        self._batches = 0
+        self._failed_batches = 0
+        self._batch_size = Histogram(*self.BATCH_SIZE_BOUNDS)
+        self._queue_depth = Histogram(*self.QUEUE_DEPTH_BOUNDS)
+        self._queue_wait = Histogram(*self.LATENCY_BOUNDS_MS)
+        self._commit_latency = Histogram(*self.LATENCY_BOUNDS_MS)
+
+    def add_batch(self, statements: List[Tuple[DataUnit, str, Any]], queue_depth, started, committed, failed=False):
+        """
+        :param statements: batch items (data unit, sql, rows)
+        :param queue_depth: queue size on batch dequeue
+        :param started: batch write start (monotonic)
+        :param committed: batch commit end (monotonic)
+        :param failed: batch transaction failed (Fallback to per item write)
+        """
+        self._batches += 1
+        self._failed_batches += 1 if failed else 0
+        self._batch_size.add(len(statements))
+        self._queue_depth.add(queue_depth)
+        self._commit_latency.add((committed - started) * 1000)
+        for item, _, rows in statements:
+            counters = self._tables.get(item.table.name)
+            if counters is None:
+                counters = self._tables[item.table.name] = [0, 0]
+            counters[0] += 1
+            counters[1] += len(rows)
+            if item.enqueued_at is not None:
+                self._queue_wait.add((started - item.enqueued_at) * 1000)
+
+    @property
+    def statistics(self):
+        uptime = monotonic() - self._started
+        return dict(uptime=round(uptime, 3), batches=self._batches, failed_batches=self._failed_batches,
+                    tables={name: dict(units=units, rows=rows, rows_per_sec=round(rows / uptime, 1) if uptime else 0)
+                            for name, (units, rows) in sorted(self._tables.items())},
+                    batch_size=self._batch_size.statistics, queue_depth=self._queue_depth.statistics,
+                    queue_wait_ms=self._queue_wait.statistics, commit_latency_ms=self._commit_latency.statistics)
+
+
+class DBPartitions:
+    ALIAS = 'part'
+    PRUNE_ALIAS = 'prune'
+
+    def __init__(self, db_: sql_engine.SQL_DB, interval=None, size_limit=None, margin=DEFAULT_PARTITION_MARGIN):
+        """
+        Plugin tables written into partition files rolled over per time window or size limit
+        Dimension tables (TraceHost, TimeLine, Points, outputs cache) & partitions catalog kept in main DB
+        Current partition attached to writer connection under single alias; Unqualified plugin table names resolved in it
+        :param db_: main DB
+        :param interval: partition time window (sec.) [Optional]
+        :param size_limit: partition file size limit (bytes) [Optional]
+        :param margin: period marks widened by margin (sec.) on read; Cover data arrived after period mark
+        """
+        self._db = db_
+        self._interval = float(interval) if interval else None
+        self._size_limit = int(size_limit) if size_limit else None
+        self._margin = timedelta(seconds=margin)
+        self._tables: List[db.Table] = []
+        self._current: Tuple[int, str, datetime] = None
+        self._pruned = set()
+
+    @property
+    def catalog(self) -> db.Table:
+        return TableSchemaService().tables.Partitions
+
+    @property
+    def current(self):
+        return self._current
+
+    def _file_prefix(self):
+        return os.path.splitext(self._db.db_file)[0]
+
+    def _path(self, file_name):
+        return os.path.join(os.path.dirname(self._db.db_file), file_name)
+
+    def open(self, tables: Iterable[db.Table]):
+        """
+        Attach last open partition (cumulative DB) or create first one
+        :param tables: plugin tables created within each partition
+        """
+        self._tables = list(tables)
+        current = self._db.execute(self.catalog.queries.select_current.sql)
+        if len(current) == 0:
+            self._remove_stale_files()
+            self._create(datetime.now())
+        else:
+            part_id, file_name, start = current[0]
+            self._attach(part_id, file_name, datetime.strptime(start, DB_DATETIME_FORMAT))
+
+    def _remove_stale_files(self):
+        for path in glob.glob(f"{self._file_prefix()}.part*.db*"):
+            try:
+                os.remove(path)
+            except OSError as e:
+                logger.warn(f"Cannot remove stale partition file '{path}': {e}")
+
+    def _create(self, start: datetime):
+        part_id = self._db.execute(self.catalog.queries.next_id.sql)[0][0]
+        file_name = f"{os.path.basename(self._file_prefix())}.part{part_id:04d}.db"
+        self._db.execute(insert_sql(self.catalog.name, self.catalog.columns),
+                         *(part_id, file_name, start.strftime(DB_DATETIME_FORMAT), None))
+        self._attach(part_id, file_name, start)
+
+    def _attach(self, part_id, file_name, start: datetime):
+        path = self._path(file_name)
+        self._db.execute(f"ATTACH DATABASE ? AS {self.ALIAS}", path)
+        self._db.execute(f"PRAGMA {self.ALIAS}.journal_mode=WAL")
+        for table in self._tables:
+            self._db.execute(sql_engine.create_table_sql(f"{self.ALIAS}.{table.name}", table.fields,
+                                                         table.foreign_keys))
+            for index in table.indexes:
+                self._db.execute(sql_engine.create_index_sql(table.name, index, self.ALIAS))
+        self._current = (part_id, path, start)
+        logger.info(f"Partition '{file_name}' attached (Start: {start.strftime(DB_DATETIME_FORMAT)})")
+
+    @property
+    def rollover_due(self):
+        if self._current is None:
+            return False
+        _, path, start = self._current
+        if self._interval and (datetime.now() - start).total_seconds() >= self._interval:
+            return True
+        if self._size_limit:
+            return sum(os.path.getsize(p) for p in (path, f"{path}-wal") if os.path.exists(p)) >= self._size_limit
+        return False
+
+    def rollover(self):
+        """
+        Close current partition & continue in new one; Called by writer between transactions
+        """
+        part_id, path, _ = self._current
+        now = datetime.now()
+        with self._db.lock:
+            self._db.execute(f"DETACH DATABASE {self.ALIAS}")
+            sql, params = update_sql(self.catalog.name, dict(End=now.strftime(DB_DATETIME_FORMAT)), PART_ID=part_id)
+            self._db.execute(sql, *params)
+            logger.info(f"Partition '{os.path.basename(path)}' closed")
+            self._create(now)
+
+    def prune(self, table: db.Table, cutoff: datetime):
+        """
+        Prune table rows older than cutoff within closed partitions (Current one pruned by writer connection)
+        Partitions closed before cutoff visited once; Partition file removed once all its tables empty
+        """
+        current_id = self._current[0] if self._current else None
+        with self._db.lock:
+            for part_id, file_name in self.select(end_mark=cutoff.strftime(DB_DATETIME_FORMAT)):
+                if part_id == current_id or (table.name, part_id) in self._pruned:
+                    continue
+                path = self._path(file_name)
+                self._db.execute(f"ATTACH DATABASE ? AS {self.PRUNE_ALIAS}", path)
+                try:
+                    self._db.execute(f"DELETE FROM {self.PRUNE_ALIAS}.{table.name} WHERE TL_REF IN "
+                                     f"(SELECT TL_ID FROM main.TimeLine WHERE TimeStamp < ?)",
+                                     cutoff.strftime(DB_DATETIME_FORMAT))
+                    end = self._db.execute(f"SELECT End FROM {self.catalog.name} WHERE PART_ID = ?", part_id)[0][0]
+                    if end < (cutoff - self._margin).strftime(DB_DATETIME_FORMAT):
+                        self._pruned.add((table.name, part_id))
+                    empty = not any(self._db.execute(f"SELECT EXISTS (SELECT 1 FROM {self.PRUNE_ALIAS}.{t.name})")[0][0]
+                                    for t in self._tables)
+                finally:
+                    self._db.execute(f"DETACH DATABASE {self.PRUNE_ALIAS}")
+                if empty:
+                    self._remove(part_id, path)
+
+    def _remove(self, part_id, path):
+        self._db.execute(self.catalog.queries.delete.sql, part_id)
+        for p in (path, f"{path}-wal", f"{path}-shm"):
+            try:
+                if os.path.exists(p):
+                    os.remove(p)
+            except OSError as e:
+                logger.warn(f"Cannot remove pruned partition file '{p}': {e}")
+        logger.info(f"Partition '{os.path.basename(path)}' removed (All data pruned)")
+
+    def _mark(self, mark, shift: timedelta, default):
+        if not mark:
+            return default
+        try:
+            return (datetime.strptime(mark, DB_DATETIME_FORMAT) + shift).strftime(DB_DATETIME_FORMAT)
+        except ValueError:
+            return mark
+
+    def select(self, start_mark=None, end_mark=None) -> List[Tuple[int, str]]:
+        """
+        Partitions touched by period
+        :return: list of (PART_ID, FileName)
+        """
+        return self._db.query(self.catalog.queries.select_range.sql,
+                              self._mark(end_mark, self._margin, '9999'),
+                              self._mark(start_mark, -self._margin, ''))
+
+    def _attach_reader(self, conn: sqlite3.Connection, alias, file_name):
+        conn.execute(f"ATTACH DATABASE ? AS {alias}", (f"file:{self._path(file_name)}?mode=ro",))
+        return [name for name, in conn.execute(f"SELECT name FROM {alias}.sqlite_master WHERE type = 'table'")]
+
+    @contextmanager
+    def reader(self, start_mark=None, end_mark=None):
+        """
+        Read only connection to main DB with partitions touched by period attached
+        Plugin tables served by temporary views (UNION ALL over attached partitions)
+        Partitions beyond SQLite attach limit copied into temporary tables
+        """
+        partitions = self.select(start_mark, end_mark)
+        attached, spilled = partitions[:SQLITE_MAX_ATTACHED - 1], partitions[SQLITE_MAX_ATTACHED - 1:]
+        conn = sqlite3.connect(f"file:{self._db.db_file}?mode=ro", uri=True, check_same_thread=False,
+                               isolation_level=None)
+        try:
+            views = {}
+            for part_id, file_name in attached:
+                alias = f"p{part_id}"
+                for name in self._attach_reader(conn, alias, file_name):
+                    views.setdefault(name, []).append(f"{alias}.{name}")
+            if len(spilled) > 0:
+                logger.warn(f"{len(partitions)} partitions within period {start_mark} - {end_mark}; "
+                            f"{len(spilled)} copied into temporary tables (Consider longer partition interval)")
+            for part_id, file_name in spilled:
+                for name in self._attach_reader(conn, 'spill', file_name):
+                    spill_table = f"temp.spill_{name}"
+                    if spill_table in views.setdefault(name, []):
+                        conn.execute(f"INSERT INTO {spill_table} SELECT * FROM spill.{name}")
+                    else:
+                        conn.execute(f"CREATE TABLE {spill_table} AS SELECT * FROM spill.{name}")
+                        views[name].append(spill_table)
+                conn.execute("DETACH DATABASE spill")
+            for name, sources in views.items():
+                conn.execute(f"CREATE TEMP VIEW {name} AS " +
+                             ' UNION ALL '.join(f"SELECT * FROM {source}" for source in sources))
+            logger.debug(f"Partitions attached for period {start_mark} - {end_mark}: "
+                         f"{', '.join(f for _, f in partitions)}")
+            yield conn
+        finally:
+            conn.close()
+
+
+def _floor_bucket(timestamp: datetime, resolution) -> datetime:
+    return ROLLUP_EPOCH + timedelta(seconds=int((timestamp - ROLLUP_EPOCH).total_seconds()) // resolution * resolution)
+
+
+class DataRollup:
+    def __init__(self, resolutions: Iterable[int], retention=None, interval=DEFAULT_ROLLUP_INTERVAL,
+                 lag=DEFAULT_ROLLUP_LAG):
+        """
+        Incremental Min/Avg/Max rollups of plugin tables (See db.RollupTable) per resolution
+        :param resolutions: bucket lengths (sec.)
+        :param retention: raw rows older than retention (sec.) pruned once rolled up [Optional]
+        :param interval: rollup cycle period (sec.)
+        :param lag: buckets closed only when newer data older than lag arrived (Late data tolerance)
+        """
+        self._resolutions = sorted({int(r) for r in resolutions})
+        assert len(self._resolutions) > 0, "Rollup resolutions not provided"
+        self._retention = timedelta(seconds=float(retention)) if retention else None
+        self._interval = float(interval)
+        self._lag = timedelta(seconds=float(lag))
+        self._watermarks = {}
+        self._lock = RLock()
+
+    @property
+    def resolutions(self):
+        return self._resolutions
+
+    @property
+    def interval(self):
+        return self._interval
+
+    @staticmethod
+    def tables() -> List[db.RollupTable]:
+        return [t for t in TableSchemaService().tables.values() if isinstance(t, db.RollupTable)]
+
+    def _watermark(self, table: db.RollupTable, resolution):
+        """
+        Start of first bucket not rolled up yet (None if source table empty)
+        """
+        watermark = self._watermarks.get((table.name, resolution))
+        if watermark is None:
+            last_bucket = DataHandlerService().execute(table.queries.last_bucket.sql, resolution)[0][0]
+            if last_bucket:
+                watermark = datetime.strptime(last_bucket, DB_DATETIME_FORMAT) + timedelta(seconds=resolution)
+            else:
+                first_sample = self._read(table.queries.first_sample.sql)[0][0]
+                if first_sample is None:
+                    return None
+                watermark = _floor_bucket(datetime.strptime(first_sample, DB_DATETIME_FORMAT), resolution)
+            self._watermarks[(table.name, resolution)] = watermark
+        return watermark
+
+    def run(self):
+        """
+        Rollup cycle: aggregate closed buckets of all rollup tables; Prune raw rows past retention
+        """
+        latest = DataHandlerService().execute(TableSchemaService().tables.TimeLine.queries.select_range.sql)[0][1]
+        if latest is None:
+            return
+        latest = datetime.strptime(latest, DB_DATETIME_FORMAT)
+        with self._lock:
+            for table in self.tables():
+                for resolution in self._resolutions:
+                    since = self._watermark(table, resolution)
+                    if since is None:
+                        break
+                    until = _floor_bucket(latest - self._lag, resolution)
+                    if until <= since:
+                        continue
+                    bucket = since
+                    while bucket < until:
+                        cache_timestamp(bucket.strftime(DB_DATETIME_FORMAT))
+                        bucket += timedelta(seconds=resolution)
+                    self._aggregate(table, resolution, since, until)
+                    self._watermarks[(table.name, resolution)] = until
+                    logger.debug(f"Rollup '{table.name}' ({resolution}s): {since} - {until}")
+                rolled_up = [self._watermarks.get((table.name, r)) for r in self._resolutions]
+                if self._retention and None not in rolled_up:
+                    # Raw rows kept till rolled up by every resolution
+                    cutoff = min(latest - self._retention, *rolled_up)
+                    DataHandlerService().execute(table.queries.prune.sql, cutoff.strftime(DB_DATETIME_FORMAT))
+                    if DataHandlerService().partitions:
+                        DataHandlerService().partitions.prune(table.source, cutoff)
+
+    @staticmethod
+    def _read(sql_text, *args, start_mark=None, end_mark=None):
+        """
+        Source table read over all partitions touched by period (Writer connection see current partition only)
+        """
+        if DataHandlerService().partitions is None:
+            return DataHandlerService().execute(sql_text, *args)
+        return DataHandlerService().query_period(sql_text, *args, start_mark=start_mark, end_mark=end_mark)
+
+    def _aggregate(self, table: db.RollupTable, resolution, since: datetime, until: datetime):
+        since, until = since.strftime(DB_DATETIME_FORMAT), until.strftime(DB_DATETIME_FORMAT)
+        if DataHandlerService().partitions is None:
+            DataHandlerService().execute(table.queries.aggregate.sql, resolution, since, until)
+            return
+        rows = self._read(table.queries.buckets.sql, resolution, since, until, start_mark=since, end_mark=until)
+        if len(rows) > 0:
+            DataHandlerService().execute(insert_sql(table.name, table.columns), rows)
+
+    def source(self, table_name, start_mark=None, end_mark=None, width=DEFAULT_CHART_WIDTH):
+        """
+        Coarsest rollup still providing sample per pixel within period
+        :return: sub query shaped as source table (Rollup averages followed by raw rows not rolled up yet) & its
+                 parameters to bind or None
+        """
+        table = TableSchemaService().tables.get(f"{table_name}_rollup")
+        if not isinstance(table, db.RollupTable):
+            return None
+        first, latest = DataHandlerService().query(TableSchemaService().tables.TimeLine.queries.select_range.sql)[0]
+        if latest is None:
+            return None
+        start = datetime.strptime(start_mark or first, DB_DATETIME_FORMAT)
+        end = datetime.strptime(end_mark or latest, DB_DATETIME_FORMAT)
+        span = (end - start).total_seconds()
+        candidates = [r for r in reversed(self._resolutions) if span / r >= int(width)]
+        if len(candidates) == 0 and self._retention:
+            # Raw rows of period pruned; Finest rollup used
+            if start < datetime.strptime(latest, DB_DATETIME_FORMAT) - self._retention:
+                candidates = self._resolutions[:1]
+        for resolution in candidates:
+            with self._lock:
+                since = self._watermark(table, resolution)
+            if since is not None:
+                return table.queries.source.sql, (resolution, since.strftime(DB_DATETIME_FORMAT))
+        return None
+
+
 @Singleton
 class DataHandlerService:
     def __init__(self):
         self._threads: List[Thread] = []
-        self._queue = Queue()
-        # self._queue = collections.tsQueue()
+        self._queue = DataQueue(DEFAULT_QUEUE_SIZE)
+        self._journal: DataJournal = None
         self._event: Event = None
+        self._drain_deadline = None
         self._db: sql_engine.SQL_DB = None
+        self._gate: PriorityLock = None
+        self._partitions: DBPartitions = None
+        self._rollup: DataRollup = None
+        self._rollup_thread: Thread = None
+        self._statistics = WriterStatistics()
+        self._in_flight = deque()
+        self._batch_size = DEFAULT_BATCH_SIZE
+        self._batch_timeout = DEFAULT_BATCH_TIMEOUT
+        self._cumulative = False
+        self._line_hash = LineHash(DEFAULT_LINE_HASH)
+        self._timeline_cache = LRUCache(DEFAULT_TIMELINE_CACHE_SIZE)
+        self._timeline_lock = RLock()
+        self._dimension_cache = {}
+        self._dimension_lock = RLock()
 
     @property
     def is_active(self):
@@ -179,15 +760,116 @@ class DataHandlerService:
     def queue(self):
         if self._event.is_set():
             logger.warn(f"Stop invoked; new data cannot be enqueued")
-            return self._queue.__class__()
+            return Queue()
         return self._queue
 
-    def init(self, location=None, file_name=DEFAULT_DB_FILE, cumulative=False):
-        self._db = sql_engine.SQL_DB(location, file_name, cumulative)
+    @property
+    def queue_statistics(self):
+        return dict(size=self._queue.qsize(), max_size=self._queue.maxsize, policy=self._queue.policy.value,
+                    high_water_mark=self._queue.high_water_mark, overflow=self._queue.overflow_count,
+                    journal=len(self._journal) if self._journal else 0)
+
+    @property
+    def statistics(self):
+        """
+        Writer statistics: per table units/rows, batch sizes, queue depth & wait, commit latency; Queue state
+        """
+        return dict(queue=self.queue_statistics, **self._statistics.statistics)
+
+    def statistics_summary(self):
+        statistics = self.statistics
+        lines = ["Data handler statistics (uptime {}s; {} batches, {} failed):".format(
+            statistics['uptime'], statistics['batches'], statistics['failed_batches'])]
+        lines.append("\tQueue: {}".format(', '.join([f"{k}={v}" for k, v in statistics['queue'].items()])))
+        for name, counters in statistics['tables'].items():
+            lines.append("\tTable {}: {}".format(name, ', '.join([f"{k}={v}" for k, v in counters.items()])))
+        for name in ('batch_size', 'queue_depth', 'queue_wait_ms', 'commit_latency_ms'):
+            lines.append("\t{}: {}".format(name, ', '.join(
+                [f"{k}={v}" for k, v in statistics[name].items() if k != 'buckets'])))
+        return '\n'.join(lines)
+
+    @property
+    def batch_size(self):
+        return self._batch_size
 
-    def start(self, event=Event()):
+    @property
+    def batch_timeout(self):
+        return self._batch_timeout
+
+    def init(self, location=None, file_name=DEFAULT_DB_FILE, cumulative=False,
+             batch_size=DEFAULT_BATCH_SIZE, batch_timeout=DEFAULT_BATCH_TIMEOUT,
+             queue_size=DEFAULT_QUEUE_SIZE, overflow_policy=DEFAULT_OVERFLOW_POLICY, line_hash=DEFAULT_LINE_HASH,
+             writer_mode=DEFAULT_WRITER_MODE, partition_interval=None, partition_size=None, rollup=None,
+             raw_retention=None):
+        """
+        Initialise DB connection & writer options
+        :param location: DB folder (in memory DB if omitted)
+        :param file_name: DB file name
+        :param cumulative: Keep existing DB data if True
+        :param batch_size: Max data units written within single transaction (1 - commit per unit)
+        :param batch_timeout: Time budget (sec.) for collecting data units into single transaction
+        :param queue_size: Max data units pending in queue (0 - unlimited)
+        :param overflow_policy: block - producer waits; drop_oldest - oldest unit lost; spill - unit written to journal
+        :param line_hash: md5 - TEXT line hash; int64 - compact INTEGER line hash (existing cumulative DB migrated)
+        :param writer_mode: thread - write within current process; process - dedicated writer process
+        :param partition_interval: plugin data rolled over to new partition file per time window (sec.) [Optional]
+        :param partition_size: plugin data rolled over to new partition file on size limit (MB) [Optional]
+        :param rollup: resolutions (sec.) plugin data rolled up in background (i.e. [60, 600]) [Optional]
+        :param raw_retention: raw plugin data older than retention (sec.) pruned once rolled up [Optional]
+        """
+        if isinstance(self._db, sql_engine.WriterProcessDB):
+            self._db.close()
+        if WriterMode(writer_mode) == WriterMode.Process and location:
+            self._db = sql_engine.WriterProcessDB(location, file_name, cumulative)
+        else:
+            if WriterMode(writer_mode) == WriterMode.Process:
+                logger.warn("Writer process not available for in memory DB; Writer thread used")
+            self._db = sql_engine.SQL_DB(location, file_name, cumulative)
+        self._gate = PriorityLock(self._db.lock)
+        self._partitions = None
+        if partition_interval or partition_size:
+            if location:
+                self._partitions = DBPartitions(self._db, partition_interval,
+                                                float(partition_size) * 1024 * 1024 if partition_size else None)
+            else:
+                logger.warn("Partitions not available for in memory DB; Single DB used")
+        self._rollup = DataRollup(rollup, raw_retention) if rollup else None
+        self._cumulative = cumulative
+        self._timeline_cache.clear()
+        self._dimension_cache.clear()
+        self._line_hash = LineHash(line_hash)
+        TableSchemaService().register_table(db.LinesCache(self._line_hash.field_type))
+        CacheLines().reset(self._line_hash)
+        self._batch_size = max(int(batch_size), 1)
+        self._batch_timeout = float(batch_timeout)
+        self._journal = DataJournal(self._journal_path())
+        if self._journal.exists and not cumulative:
+            logger.warn(f"Journal '{self._journal.path}' of previous run discarded (Not cumulative DB)")
+            self._journal.discard()
+        self._statistics = WriterStatistics()
+        self._queue = DataQueue(int(queue_size), OverflowPolicy(overflow_policy), self._on_overflow)
+
+    def _journal_path(self):
+        if self._db.db_file == sql_engine.DEFAULT_DB_FILE:
+            return os.path.join(tempfile.gettempdir(), f"{self.__class__.__name__}_{os.getpid()}{JOURNAL_EXT}")
+        return f"{os.path.splitext(self._db.db_file)[0]}{JOURNAL_EXT}"
+
+    def _on_overflow(self, item: DataUnit):
+        if self._queue.policy == OverflowPolicy.Spill:
+            self._journal.append(*item.sql_data)
+            logger.debug(f"Queue full; Item '{type(item).__name__}' spilled to journal")
+        else:
+            logger.warn(f"Queue full; Item '{type(item).__name__}' dropped")
+        item.result = None
+
+    def start(self, event=None):
+        if self._cumulative:
+            self._migrate_lines_cache()
+            self._migrate_dimension_references()
         # if self._db.is_new:
         for name, table in TableSchemaService().tables.items():
+            if self._partitions and isinstance(table, db.PlugInTable):
+                continue
             try:
                 assert not self._db.table_exist(table.name)
                 self._db.execute(sql_engine.create_table_sql(table.name, table.fields, table.foreign_keys))
@@ -196,22 +878,150 @@ class DataHandlerService:
             except Exception as e:
                 logger.error(f"Cannot create table '{name}' -> Error: {e}")
                 raise
-        self._event = event
+            for index in table.indexes:
+                try:
+                    self._db.execute(sql_engine.create_index_sql(table.name, index))
+                except Exception as e:
+                    logger.error(f"Cannot create index '{index.name(table.name)}' -> Error: {e}")
+                    raise
+        if self._partitions:
+            self._partitions.open(t for t in TableSchemaService().tables.values() if isinstance(t, db.PlugInTable))
+        if self._cumulative:
+            self._replay_journal()
+            self._seed_timeline_cache()
+        self._event = event or Event()
+        self._drain_deadline = None
+        atexit.unregister(self._spill_queue)
+        atexit.register(self._spill_queue)
 
         dh = Thread(name='DataHandler', target=self._data_handler, daemon=True)
         dh.start()
         self._threads.append(dh)
+        if self._rollup:
+            self._rollup_thread = Thread(name='DataRollup', target=self._rollup_handler, daemon=True)
+            self._rollup_thread.start()
+
+    def _migrate_lines_cache(self):
+        """
+        Re-key existing LinesCache if it created with other line hash; LINE_ID kept so LinesCacheMap stay valid
+        """
+        table = TableSchemaService().tables.LinesCache
+        columns = {r[1]: r[2] for r in self._db.execute(f"PRAGMA table_info({table.name})")}
+        if len(columns) == 0 or columns.get('HashTag') == self._line_hash.field_type.value:
+            return
+        logger.info(f"Migrate table '{table.name}' HashTag: {columns.get('HashTag')} -> "
+                    f"{self._line_hash.field_type.value} ({self._line_hash.value})")
+        rows, used_keys = [], set()
+        for line_id, line in self._db.execute(f"SELECT LINE_ID, Line FROM {table.name}"):
+            key = self._line_hash(line)
+            while self._line_hash.verified and key in used_keys:
+                key = self._line_hash.next_key(key)
+            used_keys.add(key)
+            rows.append((line_id, key, line))
+        migration_table = f"{table.name}_migration"
+        self._db.execute(f"DROP TABLE IF EXISTS {migration_table}")
+        self._db.execute_batch([
+            (sql_engine.create_table_sql(migration_table, table.fields, table.foreign_keys), None),
+            (insert_sql(migration_table, table.columns), rows),
+            (f"DROP TABLE {table.name}", None),
+            (f"ALTER TABLE {migration_table} RENAME TO {table.name}", None)])
+        logger.info(f"Table '{table.name}' migrated: {len(rows)} lines")
+
+    def _migrate_dimension_references(self):
+        """
+        Intern inline values of existing tables into dimension table & replace them by reference
+        (See Table.dimension_references)
+        """
+        for table in TableSchemaService().tables.values():
+            for ref_field, dimension in table.dimension_references.items():
+                columns = [r[1] for r in self._db.execute(f"PRAGMA table_info({table.name})")]
+                value_field = dimension.value_field.name
+                if ref_field in columns or value_field not in columns:
+                    continue
+                logger.info(f"Migrate table '{table.name}' {value_field} -> {ref_field} ({dimension.name})")
+                migration_table = f"{table.name}_migration"
+                values = ', '.join(f"d.{dimension.id_field}" if c == ref_field else f"t.{c}" if c in columns
+                                   else 'NULL' for c in table.columns)
+                self._db.execute(f"DROP TABLE IF EXISTS {migration_table}")
+                self._db.execute_batch([
+                    (sql_engine.create_table_sql(dimension.name, dimension.fields, dimension.foreign_keys), None),
+                    (f"INSERT OR IGNORE INTO {dimension.name} ({value_field}) SELECT DISTINCT {value_field} "
+                     f"FROM {table.name} WHERE {value_field} IS NOT NULL", None),
+                    (sql_engine.create_table_sql(migration_table, table.fields, table.foreign_keys), None),
+                    (f"INSERT INTO {migration_table} SELECT {values} FROM {table.name} t "
+                     f"LEFT JOIN {dimension.name} d ON t.{value_field} = d.{value_field}", None),
+                    (f"DROP TABLE {table.name}", None),
+                    (f"ALTER TABLE {migration_table} RENAME TO {table.name}", None)])
+                logger.info(f"Table '{table.name}' migrated")
+
+    def _seed_timeline_cache(self):
+        table = TableSchemaService().tables.TimeLine
+        self._timeline_cache.update(
+            self._db.execute(table.queries.select_latest.sql, DEFAULT_TIMELINE_CACHE_SIZE)[::-1])
+        logger.debug(f"TimeLine cache seeded with {len(self._timeline_cache)} entries")
+
+    @property
+    def timeline_cache(self):
+        return self._timeline_cache
 
-    def stop(self, timeout=5):
+    @property
+    def timeline_lock(self):
+        return self._timeline_lock
+
+    def dimension_cache(self, table_name) -> LRUCache:
+        return self._dimension_cache.setdefault(table_name, LRUCache(DEFAULT_DIMENSION_CACHE_SIZE))
+
+    @property
+    def dimension_lock(self):
+        return self._dimension_lock
+
+    def stop(self, timeout=DEFAULT_DRAIN_TIMEOUT):
+        """
+        Drain queued data till deadline; Items left written into journal next to DB (Replayed on cumulative init)
+        :param timeout: drain deadline (sec.)
+        """
+        self._drain_deadline = monotonic() + float(timeout)
         if self._event:
             self._event.set()
+        self._queue.close()
         while len(self._threads) > 0:
             th = self._threads.pop(0)
             try:
-                th.join(timeout)
-                logger.debug(f"Thread '{th.name}' gracefully stopped")
+                th.join(max(self._drain_deadline - monotonic(), 0))
+                if th.is_alive():
+                    logger.warn(f"Thread '{th.name}' not drained queue till deadline ({timeout}s)")
+                else:
+                    logger.debug(f"Thread '{th.name}' gracefully stopped")
             except Exception as e:
                 logger.error(f"Thread '{th.name}' gracefully stop failed; Error raised: {e}")
+        self._spill_queue()
+        atexit.unregister(self._spill_queue)
+        if self._rollup_thread:
+            self._rollup_thread.join(max(self._drain_deadline - monotonic(), 0))
+            self._rollup_thread = None
+        logger.info(self.statistics_summary())
+        logger.info("TimeLine cache statistics: {}".format(
+            ', '.join([f"{k}={v}" for k, v in self._timeline_cache.statistics.items()])))
+        logger.info("Output cache statistics: {}".format(
+            ', '.join([f"{k}={v}" for k, v in CacheLines().statistics.items()])))
+
+    def _spill_queue(self):
+        """
+        Move items left in queue into journal (On stop deadline & interpreter exit)
+        """
+        items = []
+        while True:
+            try:
+                items.append(self._queue.get(block=False))
+            except Empty:
+                break
+        entries = [item.sql_data for item in items]
+        count = self._journal.extend(entry for entry in entries if len(entry[1]) > 0) if len(items) > 0 else 0
+        for item in items:
+            item.result = None
+        if count > 0:
+            logger.warn(f"{count} queued items not written till stop deadline; Kept in journal '{self._journal.path}'")
+        return count
 
     def execute(self, sql_text, *rows):
         try:
@@ -222,6 +1032,85 @@ class DataHandlerService:
             logger.error("DB execute error: {}\n{}\n{}".format(e, sql_text, '\n\t'.join([f"{r}" for r in rows])))
             raise
 
+    def priority(self):
+        """
+        Control & metadata writes section (TraceHost, Points, TimeLine); Served ahead of queued bulk units
+        Statements within section not interleaved with other writers (i.e. insert & its last row id)
+        """
+        return self._gate.priority()
+
+    def execute_priority(self, sql_text, *rows):
+        """
+        Execute control write ahead of bulk units (See priority)
+        """
+        with self.priority():
+            return self.execute(sql_text, *rows)
+
+    def query(self, sql_text, *args):
+        """
+        Read only query served by read connections pool; Not blocked by writer
+        """
+        try:
+            return self._db.query(sql_text, *args)
+        except Exception as e:
+            logger.error("DB query error: {}\n{}\n{}".format(e, sql_text, ', '.join([f"{a}" for a in args])))
+            raise
+
+    def iterate(self, sql_text, *args):
+        """
+        Read only query streamed row by row (See SQL_DB.iterate)
+        """
+        try:
+            yield from self._db.iterate(sql_text, *args)
+        except Exception as e:
+            logger.error("DB query error: {}\n{}\n{}".format(e, sql_text, ', '.join([f"{a}" for a in args])))
+            raise
+
+    @property
+    def partitions(self) -> DBPartitions:
+        return self._partitions
+
+    @property
+    def rollup(self) -> DataRollup:
+        return self._rollup
+
+    def rollup_source(self, table_name, start_mark=None, end_mark=None, width=DEFAULT_CHART_WIDTH):
+        """
+        Rollup sub query & its parameters replacing plugin table in chart query (See DataRollup.source);
+        None - raw data used
+        """
+        if self._rollup is None or table_name is None:
+            return None
+        return self._rollup.source(table_name, start_mark, end_mark, width)
+
+    def query_period(self, sql_text, *args, start_mark=None, end_mark=None):
+        """
+        Read only query over plugin data within period; Only partitions touched by period marks attached
+        Served by read connections pool if partitions not used
+        """
+        if self._partitions is None:
+            return self.query(sql_text, *args)
+        try:
+            with self._partitions.reader(start_mark, end_mark) as conn:
+                return conn.execute(sql_text, args).fetchall()
+        except Exception as e:
+            logger.error("DB query error: {}\n{}\n{}".format(e, sql_text, ', '.join([f"{a}" for a in args])))
+            raise
+
+    def iterate_period(self, sql_text, *args, start_mark=None, end_mark=None):
+        """
+        Read only query over plugin data within period streamed row by row (See query_period)
+        """
+        if self._partitions is None:
+            yield from self.iterate(sql_text, *args)
+            return
+        try:
+            with self._partitions.reader(start_mark, end_mark) as conn:
+                yield from conn.execute(sql_text, args)
+        except Exception as e:
+            logger.error("DB query error: {}\n{}\n{}".format(e, sql_text, ', '.join([f"{a}" for a in args])))
+            raise
+
     @property
     def get_last_row_id(self):
         return self._db.get_last_row_id
@@ -234,47 +1123,213 @@ class DataHandlerService:
             last_tl_id = cache_timestamp(item.timestamp)
             item(TL_ID=last_tl_id)
             logger.debug(f"Item updated: {item.sql_data}")
-        self.queue.put(item)
+        item.enqueued_at = monotonic()
+        if self._event is not None and self._event.is_set():
+            self._journal.append(*item.sql_data)
+            item.result = None
+            logger.warn(f"Stop invoked; Item '{type(item).__name__}' kept in journal '{self._journal.path}'")
+            return
+        try:
+            self.queue.put(item)
+        except Full as e:
+            logger.warn(f"Item '{type(item).__name__}' cannot be enqueued: {e}")
+            item.result = None
+            return
         logger.debug(f"Item enqueued: '{item}' (Current queue size {self.queue.qsize()})")
         # sleep(0.01)
 
     # FIXME: Handle stdout should be moved in separate thread task; It should bw async with main data handler
 
+    def _dequeue_batch(self, timeout=None):
+        batch = [self._queue.get(timeout=timeout)]
+        deadline = monotonic() + self._batch_timeout
+        while len(batch) < self._batch_size:
+            remaining = deadline - monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except Empty:
+                break
+        logger.debug(f"Deque batch of {len(batch)} items (Current queue size {self._queue.qsize()})")
+        return batch
+
+    def _write_batch(self, batch: List[DataUnit]):
+        statements = []
+        for item in batch:
+            insert_sql_str, rows = item.sql_data
+            if len(rows) == 0:
+                logger.warn(f"Empty data unit arrived: {type(item).__name__}")
+                item.result = None
+                continue
+            statements.append((item, insert_sql_str, rows))
+        if len(statements) == 0:
+            return
+        queue_depth, started = self._queue.qsize(), monotonic()
+        with self._gate.bulk():
+            future = self._db.execute_batch_async([(sql_str, rows) for _, sql_str, rows in statements])
+        future.add_done_callback(lambda f: self._resolve_batch(statements, f))
+        self._in_flight.append((statements, future, queue_depth, started))
+        self._complete_batches(DEFAULT_PIPELINE_DEPTH)
+
+    @staticmethod
+    def _resolve_batch(statements, future: Future):
+        """
+        Resolve data units once batch written (Invoked by writer process receiver; Failed batch left to writer)
+        """
+        future.committed = monotonic()
+        if future.exception() is not None:
+            return
+        for (item, sql_str, rows), result in zip(statements, future.result()):
+            item.result = result
+            logger.debug("Insert item: {}\n\t{}\n\t{}".format(type(item).__name__, sql_str,
+                                                              '\n\t'.join([str(r) for r in rows])))
+
+    def _complete_batches(self, depth=0):
+        """
+        Account batches written & fallback failed ones to per item write
+        :param depth: batches left in flight (Oldest awaited while more pending)
+        """
+        while len(self._in_flight) > 0:
+            statements, future, queue_depth, started = self._in_flight[0]
+            if len(self._in_flight) <= depth and not future.done():
+                break
+            self._in_flight.popleft()
+            e = future.exception()
+            if e is not None:
+                logger.warn(f"Batch of {len(statements)} items failed ({e}); Fallback to per item write")
+                for item, sql_str, rows in statements:
+                    self._write_item(item, sql_str, rows)
+            self._statistics.add_batch(statements, queue_depth, started, getattr(future, 'committed', monotonic()),
+                                       failed=e is not None)
+
+    def _write_item(self, item: DataUnit, insert_sql_str, rows):
+        try:
+            with self._gate.bulk():
+                item.result = self.execute(insert_sql_str, rows)
+        except Exception as e:
+            item.result = None
+            logger.error(f"Unexpected error occurred on {type(item).__name__}: {e}")
+        else:
+            logger.debug(f"Item {type(item).__name__} successfully handled")
+
+    def _replay_chunk(self, chunk):
+        """
+        Write journal entries chunk within single transaction; On failure entries retried one by one,
+        failed ones moved to journal dead letter file
+        :return: entries count failed
+        """
+        try:
+            with self._gate.bulk():
+                self._db.execute_batch(chunk)
+            return 0
+        except Exception as e:
+            logger.warn(f"Journal chunk replay failed: {e}; Entries retried one by one")
+        failed = 0
+        for entry in chunk:
+            try:
+                with self._gate.bulk():
+                    self._db.execute_batch([entry])
+            except Exception as e:
+                failed += 1
+                self._journal.dead_letter(entry)
+                logger.error(f"Journal entry moved to '{self._journal.dead_letter_path}': {e}\n{entry[0]}")
+        return failed
+
+    def _replay_journal(self, limit=None):
+        """
+        :param limit: replay at most limit entries (Rest replayed on next call) [Optional]
+        """
+        if not self._journal.exists:
+            return
+        chunk, total, failed = [], 0, 0
+        try:
+            with closing(self._journal.replay()) as entries:
+                for entry in entries:
+                    chunk.append(entry)
+                    if len(chunk) >= self._batch_size:
+                        failed += self._replay_chunk(chunk)
+                        self._journal.checkpoint()
+                        total += len(chunk)
+                        chunk = []
+                        if limit is not None and total >= limit:
+                            break
+            if len(chunk) > 0:
+                failed += self._replay_chunk(chunk)
+                total += len(chunk)
+            self._journal.checkpoint()
+        except Exception as e:
+            f, l = get_error_info()
+            logger.error(f"Journal replay failed after {total} entries: {e}; File: {f}:{l}")
+        else:
+            (logger.info if limit is None else logger.debug)(
+                f"Journal replayed: {total} entries{f' ({failed} failed)' if failed else ''}")
+
+    @property
+    def _replay_allowed(self):
+        """
+        Journal replayed between batches while queue not full (Spilled data not kept till writer idle)
+        """
+        return self._queue.maxsize == 0 or self._queue.qsize() < self._queue.maxsize
+
+    @property
+    def _drain_expired(self):
+        return self._drain_deadline is not None and monotonic() >= self._drain_deadline
+
+    def _rollup_handler(self):
+        while True:
+            stopped = self._event.wait(self._rollup.interval)
+            try:
+                self._rollup.run()
+            except Exception as e:
+                f, l = get_error_info()
+                logger.error(f"Rollup cycle failed: {e}; File: {f}:{l}")
+            if stopped:
+                break
+
     def _data_handler(self):
         logger.debug(f"{self.__class__.__name__} Started with event {id(self._event)}")
         while True:
-            if self.queue.empty():
-                if self._event.is_set():
-                    break
-                else:
-                    continue
-            item = None
+            batch = []
             try:
-                item = self.queue.get()
-                logger.debug(f"Deque item: '{item}' (Current queue size {self.queue.qsize()})")
-                insert_sql_str, rows = item.sql_data
-                assert len(rows) > 0, "Empty data unit arrived"
-                result = self.execute(insert_sql_str, rows) if rows else self.execute(insert_sql_str)
-                item.result = result
-                logger.debug("Insert item: {}\n\t{}\n\t{}".format(type(item).__name__, insert_sql_str,
-                                                                  '\n\t'.join([str(r) for r in rows])))
-            except AssertionError as e:
-                logger.warn(f"{e}")
+                batch = self._dequeue_batch(DEFAULT_IDLE_TIMEOUT)
+                if self._partitions and self._partitions.rollover_due:
+                    self._partitions.rollover()
+                self._write_batch(batch)
+                if self._replay_allowed and not self._drain_expired:
+                    self._replay_journal(self._batch_size)
+            except Empty:
+                self._complete_batches()
+                if not self._drain_expired:
+                    self._replay_journal()
+                if self._event.is_set() or self._queue.closed:
+                    break
             except Exception as e:
                 f, l = get_error_info()
-                logger.error(f"Unexpected error occurred on {type(item).__name__}: {e}; File: {f}:{l}")
-            else:
-                logger.debug(f"Item {type(item).__name__} successfully handled")
+                logger.error(f"Unexpected error occurred on batch of {len(batch)} items: {e}; File: {f}:{l}")
+            if self._drain_expired:
+                break
+        self._complete_batches()
         logger.debug(f"Background task stopped invoked")
 
 
 @Singleton
 class CacheLines:
-    DEFAULT_MAX_WORKERS = 4
+    DEFAULT_CHUNK_SIZE = 500
+    DEFAULT_CACHE_SIZE = 100000
+    DEFAULT_DIGEST_CACHE_SIZE = 1000
+    DEFAULT_BLOCK_SIZE = 64 * 1024
 
     def __init__(self):
         self._output_ref = None
         self._lock = RLock()
+        self._lines_cache = LRUCache(self.DEFAULT_CACHE_SIZE)
+        self._digest_cache = LRUCache(self.DEFAULT_DIGEST_CACHE_SIZE)
+        self._dictionaries = {}
+        self._line_hash = LineHash(DEFAULT_LINE_HASH)
+        self._uploads = 0
+        self._reused = 0
+        self._collisions = 0
 
     @property
     def output_ref(self):
@@ -285,81 +1340,277 @@ class CacheLines:
         with self._lock:
             self._output_ref = value
 
-    def get_sql(self, tag):
-        if self.output_ref:
-            return f"""SELECT OUTPUT_REF, ORDER_ID, LINE_REF
-                                      FROM LinesCacheMap 
-                                      JOIN LinesCache ON LinesCache.LINE_ID = LinesCacheMap.LINE_REF
-                                      WHERE LinesCache.HashTag = '{tag}' AND OUTPUT_REF = {self.output_ref}"""
-        else:
-            return f"""SELECT OUTPUT_REF, ORDER_ID, LINE_REF
-                                                  FROM LinesCacheMap 
-                                                  JOIN LinesCache ON LinesCache.LINE_ID = LinesCacheMap.LINE_REF
-                                                  WHERE LinesCache.HashTag = '{tag}' """
+    @property
+    def statistics(self):
+        return dict(outputs=self._uploads, reused=self._reused,
+                    dedup_ratio=round(self._reused / self._uploads, 3) if self._uploads else 0.0,
+                    lines_cache_hit_ratio=round(self._lines_cache.hit_ratio, 3), collisions=self._collisions)
+
+    def reset(self, line_hash: LineHash = LineHash.MD5):
+        with self._lock:
+            self._output_ref = None
+            self._line_hash = LineHash(line_hash)
+            self._lines_cache.clear()
+            self._digest_cache.clear()
+            self._dictionaries.clear()
+            self._uploads = self._reused = self._collisions = 0
+
+    def _get_output_by_digest(self, digest):
+        output_ref = self._digest_cache.get(digest)
+        if output_ref is None:
+            entry = DataHandlerService().execute(TableSchemaService().tables.OutputDigest.queries.select_output.sql,
+                                                 digest)
+            if len(entry) > 0:
+                output_ref = entry[0][0]
+                self._digest_cache.put(digest, output_ref)
+        return output_ref
 
     @staticmethod
-    def cache_line(line_data):
-        order_id, line = line_data
-        output_ref = None
-        is_output_required = True
-        try:
-            hash_tag = hashlib.md5(line.encode('utf-8')).hexdigest()
-            entry = DataHandlerService().execute(f"SELECT LINE_ID FROM LinesCache WHERE HashTag == '{hash_tag}'")
+    def _chunks(items: List, chunk_size):
+        for i in range(0, len(items), chunk_size):
+            yield items[i:i + chunk_size]
+
+    def _select_line_ids(self, keys: List, chunk_size):
+        fields = 'HashTag, LINE_ID, Line' if self._line_hash.verified else 'HashTag, LINE_ID'
+        for chunk in self._chunks(keys, chunk_size):
+            # Pad IN list to power of 2 length; Limited set of statements texts reused by sqlite statements cache
+            chunk = chunk + chunk[-1:] * ((1 << (len(chunk) - 1).bit_length()) - len(chunk))
+            yield from DataHandlerService().execute(
+                f"SELECT {fields} FROM LinesCache WHERE HashTag IN ({','.join(['?'] * len(chunk))})", *chunk)
+
+    def _match_line_ids(self, keys: dict, rows, line_ids: dict, collided: List):
+        for key, line_id, *stored in rows:
+            line = keys.pop(key)
+            if len(stored) > 0 and stored[0] != line:
+                collided.append(line)
+            else:
+                line_ids[line] = line_id
+
+    def _probe_line_id(self, line):
+        """
+        Resolve line which hash already taken by other line; Next free key used (Linear probing)
+        """
+        self._collisions += 1
+        table = TableSchemaService().tables.LinesCache
+        key = self._line_hash(line)
+        while True:
+            entry = DataHandlerService().execute(table.queries.select_line.sql, key)
             if len(entry) == 0:
-                DataHandlerService().execute(insert_sql('LinesCache', ['LINE_ID', 'HashTag', 'Line']),
-                                             *(None, hash_tag, line))
-                line_ref = DataHandlerService().get_last_row_id
+                DataHandlerService().execute(insert_sql(table.name, table.columns, 'IGNORE'), None, key, line)
+                entry = DataHandlerService().execute(table.queries.select_line.sql, key)
+            if entry[0][1] == line:
+                logger.debug(f"Hash collision resolved for line '{line}' with key {key}")
+                return entry[0][0]
+            key = self._line_hash.next_key(key)
+
+    def _resolve_line_ids(self, lines: List[str], chunk_size):
+        """
+        Resolve LINE_ID for each unique line; Lines missing in DB inserted by single executemany
+        :param lines: unique lines
+        :return: line -> LINE_ID
+        """
+        line_ids, unknown = {}, []
+        for line in lines:
+            line_id = self._lines_cache.get(line)
+            if line_id is None:
+                unknown.append(line)
             else:
-                line_ref = entry[0][0]
+                line_ids[line] = line_id
+        if len(unknown) > 0:
+            keys, collided = {}, []
+            for line in unknown:
+                key = self._line_hash(line)
+                if key in keys:
+                    collided.append(line)
+                else:
+                    keys[key] = line
+            self._match_line_ids(keys, self._select_line_ids(list(keys), chunk_size), line_ids, collided)
+            if len(keys) > 0:
+                table = TableSchemaService().tables.LinesCache
+                DataHandlerService().execute(insert_sql(table.name, table.columns, 'IGNORE'),
+                                             [(None, k, line) for k, line in keys.items()])
+                self._match_line_ids(keys, self._select_line_ids(list(keys), chunk_size), line_ids, collided)
+            for line in collided:
+                line_ids[line] = self._probe_line_id(line)
+            self._lines_cache.update((line, line_ids[line]) for line in unknown)
+        return line_ids
+
+    def _get_dictionary(self, name, lines: List[str]):
+        """
+        Get zlib dictionary by name; Dictionary created from first output tail (zlib window size) if not exist
+        :return: DICT_ID, dictionary bytes
+        """
+        entry = self._dictionaries.get(name)
+        if entry is not None:
+            return entry
+        table = TableSchemaService().tables.OutputDictionary
+        with self._lock:
+            entry = DataHandlerService().execute(table.queries.select_dictionary.sql, name)
+            if len(entry) == 0:
+                sample = ''.join(f"{line}\n" for line in lines).encode('utf-8')[-ZLIB_DICTIONARY_SIZE:]
+                DataHandlerService().execute(insert_sql(table.name, table.columns, 'IGNORE'), None, name, sample)
+                entry = DataHandlerService().execute(table.queries.select_dictionary.sql, name)
+            self._dictionaries[name] = entry[0]
+        return entry[0]
 
-            if is_output_required:
-                entry1 = DataHandlerService().execute(
-                    f"SELECT ORDER_ID FROM LinesCacheMap WHERE LINE_REF == {line_ref}")
-                if len(entry1) != 0:
-                    output_ref = entry1[0][0]
-                    if output_ref != order_id:
-                        is_output_required = False
+    @staticmethod
+    def _text_blocks(lines: List[str], block_size):
+        block, size = [], 0
+        for line in lines:
+            block.append(f"{line}\n")
+            size += len(block[-1])
+            if size >= block_size:
+                yield ''.join(block).encode('utf-8')
+                block, size = [], 0
+        if len(block) > 0:
+            yield ''.join(block).encode('utf-8')
+
+    def _compress_blocks(self, lines: List[str], storage: OutputStorage, dictionary=None):
+        dict_ref, zdict = self._get_dictionary(dictionary, lines) if dictionary else (None, None)
+        for block_id, block in enumerate(self._text_blocks(lines, self.DEFAULT_BLOCK_SIZE)):
+            yield block_id, storage.value, dict_ref, storage.compress(block, zdict)
+
+    def _next_output_ref(self):
+        tables = TableSchemaService().tables
+        refs = [DataHandlerService().execute(t.queries.last_output_id.sql)[0][0]
+                for t in (tables.LinesCacheMap, tables.OutputBlocks)]
+        refs = [r for r in refs if r is not None]
+        return max(refs) + 1 if len(refs) > 0 else 0
+
+    def upload(self, output, chunk_size: int = DEFAULT_CHUNK_SIZE, storage: OutputStorage = OutputStorage.Lines,
+               dictionary=None):
+        """
+        Store output and return its reference; Identical outputs stored once
+        lines - each unique line stored once into LinesCache & output lines order into LinesCacheMap
+        zlib/lzma - output stored as compressed blocks into OutputBlocks
+        :param output: text
+        :param chunk_size: max hashes resolved by single query
+        :param storage: lines | zlib | lzma
+        :param dictionary: name of zlib dictionary shared across outputs (Optional; zlib only)
+        :return: OUTPUT_REF
+        """
+        output_lines = output.splitlines()
+        if len(output_lines) == 0:
+            return None
+        self._uploads += 1
+        digest = hashlib.md5(output.encode('utf-8')).hexdigest()
+        output_ref = self._get_output_by_digest(digest)
+        if output_ref is not None:
+            self._reused += 1
+            return output_ref
+
+        storage = OutputStorage(storage)
+        if storage == OutputStorage.Lines:
+            line_ids = self._resolve_line_ids(list(dict.fromkeys(output_lines)), chunk_size)
+            table = TableSchemaService().tables.LinesCacheMap
+            rows = [(order_id, line_ids[line]) for order_id, line in enumerate(output_lines)]
+        else:
+            table = TableSchemaService().tables.OutputBlocks
+            rows = list(self._compress_blocks(output_lines, storage, dictionary))
 
-        except Exception as e:
-            f, li = get_error_info()
-            raise type(e)(f"Unexpected error: {e}; File: {f}:{li}")
-        return output_ref, order_id, line_ref
-
-    def sequence_line_cache(self, output):
-        for data_item in [(_id, line) for _id, line in enumerate(output.splitlines())]:
-            yield list(self.cache_line(data_item))
-
-    def concurrent_lines_cache(self, output, max_workers):
-        with ThreadPoolExecutor(max_workers=max_workers) as e:
-            for output_ref, order_id, line_ref in e.map(self.cache_line,
-                                                        [(_id, line) for _id, line in enumerate(output.splitlines())]):
-                yield [output_ref, order_id, line_ref]
-
-    def upload(self, output, max_workers: int = DEFAULT_MAX_WORKERS):
-        logger.debug(f"Cache invoked {'concurrently' if max_workers > 1 else 'as sequence'}")
-        lines_cache = list(self.concurrent_lines_cache(output, max_workers)
-                           if max_workers > 1 else self.sequence_line_cache(output))
-
-        if any([_ref[0] is None for _ref in lines_cache]):
-            output_data = DataHandlerService().execute(
-                TableSchemaService().tables.LinesCacheMap.queries.last_output_id.sql)
-            self.output_ref = output_data[0][0] + 1 if output_data != [(None,)] else 0
-            DataHandlerService().execute(insert_sql('LinesCacheMap', ['OUTPUT_REF', 'ORDER_ID', 'LINE_REF']),
-                                         [[self.output_ref] + lr[1:] for lr in lines_cache])
-        return self.output_ref
+        with self._lock:
+            self.output_ref = self._next_output_ref()
+            DataHandlerService().execute(insert_sql(table.name, table.columns),
+                                         [(self.output_ref, *row) for row in rows])
+            digest_table = TableSchemaService().tables.OutputDigest
+            DataHandlerService().execute(insert_sql(digest_table.name, digest_table.columns, 'IGNORE'),
+                                         digest, self.output_ref)
+            self._digest_cache.put(digest, self.output_ref)
+            return self.output_ref
+
+    def _dictionary_data(self, dict_ref, dictionaries: dict):
+        if dict_ref not in dictionaries:
+            dictionaries[dict_ref] = DataHandlerService().query(
+                'SELECT Data FROM OutputDictionary WHERE DICT_ID == ?', dict_ref)[0][0]
+        return dictionaries[dict_ref]
+
+    def _decode_rows(self, rows) -> Iterator[str]:
+        dictionaries = {}
+        for _, _, line, codec, dict_ref, data in rows:
+            if codec is None:
+                yield line
+            else:
+                zdict = self._dictionary_data(dict_ref, dictionaries) if dict_ref is not None else None
+                yield from OutputStorage(codec).decompress(data, zdict).decode('utf-8').splitlines()
+
+    def read(self, output_ref) -> Iterator[str]:
+        """
+        Rebuild output by its reference (Any storage mode) through single ordered query
+        :param output_ref: OUTPUT_REF
+        :return: generator of output lines
+        """
+        yield from self._decode_rows(DataHandlerService().iterate(
+            OUTPUT_READ_TEMPLATE.format(refs='', where='?'), output_ref, output_ref))
+
+    def read_range(self, host_id, start_mark=None, end_mark=None,
+                   tables: Iterable[db.Table] = None) -> Iterator[Tuple[int, Iterator[str]]]:
+        """
+        Rebuild all outputs referenced by plugin tables for host within period through single ordered query
+        :param host_id: TraceHost HOST_ID
+        :param start_mark: period start timestamp (Optional)
+        :param end_mark: period end timestamp (Optional)
+        :param tables: plugin tables referencing outputs (Default: all registered tables with OUTPUT_REF)
+        :return: generator of (OUTPUT_REF, generator of output lines) ordered by OUTPUT_REF
+        """
+        tables = [t for t in (tables or TableSchemaService().tables.values())
+                  if isinstance(t, db.PlugInTable) and 'OUTPUT_REF' in t.columns]
+        if len(tables) == 0:
+            return
+        period, period_args = '', []
+        if start_mark:
+            period += ' AND t.TimeStamp >= ?'
+            period_args.append(start_mark)
+        if end_mark:
+            period += ' AND t.TimeStamp <= ?'
+            period_args.append(end_mark)
+        refs = 'WITH refs AS ({})\n'.format('\nUNION\n'.join(
+            OUTPUT_REFS_TEMPLATE.format(table=t.name, period=period) for t in tables))
+        rows = DataHandlerService().iterate_period(
+            OUTPUT_READ_TEMPLATE.format(refs=refs, where='SELECT OUTPUT_REF FROM refs'),
+            *([host_id] + period_args) * len(tables), start_mark=start_mark, end_mark=end_mark)
+        for output_ref, output_rows in groupby(rows, key=lambda r: r[0]):
+            yield output_ref, self._decode_rows(output_rows)
 
 
 def cache_timestamp(timestamp):
-    table = TableSchemaService().tables.TimeLine
-    last_tl_id = DataHandlerService().execute(table.queries.select_last.sql.format(timestamp=timestamp))
-    if len(last_tl_id) == 0:
-        DataHandlerService().execute(insert_sql(table.name, table.columns), *(None, timestamp))
-        last_tl_id = DataHandlerService().get_last_row_id
-    else:
-        last_tl_id = last_tl_id[0][0]
+    cache = DataHandlerService().timeline_cache
+    last_tl_id = cache.get(timestamp)
+    if last_tl_id is not None:
+        return last_tl_id
+    with DataHandlerService().timeline_lock:
+        if timestamp in cache:
+            return cache.get(timestamp)
+        table = TableSchemaService().tables.TimeLine
+        with DataHandlerService().priority():
+            last_tl_id = DataHandlerService().execute(table.queries.select_last.sql, timestamp)
+            if len(last_tl_id) == 0:
+                DataHandlerService().execute(insert_sql(table.name, table.columns), *(None, timestamp))
+                last_tl_id = DataHandlerService().get_last_row_id
+            else:
+                last_tl_id = last_tl_id[0][0]
+        cache.put(timestamp, last_tl_id)
     return last_tl_id
 
 
+def cache_dimension(table: db.DimensionTable, value):
+    cache = DataHandlerService().dimension_cache(table.name)
+    value_id = cache.get(value)
+    if value_id is not None:
+        return value_id
+    with DataHandlerService().dimension_lock:
+        if value in cache:
+            return cache.get(value)
+        with DataHandlerService().priority():
+            value_id = DataHandlerService().execute(table.queries.select_id.sql, value)
+            if len(value_id) == 0:
+                DataHandlerService().execute(insert_sql(table.name, table.columns), *(None, value))
+                value_id = DataHandlerService().get_last_row_id
+            else:
+                value_id = value_id[0][0]
+        cache.put(value, value_id)
+    return value_id
+
+
 class SQLiteHandler(logging.StreamHandler):
     """
     Thread-safe logging handler for SQLite.
@@ -373,11 +1624,20 @@ class SQLiteHandler(logging.StreamHandler):
 __all__ = [
     'DB_DATETIME_FORMAT',
     'DataHandlerService',
+    'DBPartitions',
+    'DataRollup',
+    'WriterStatistics',
     'TableSchemaService',
     'ModulesRegistryService',
     'RegistryModule',
     'PlugInService',
     'CacheLines',
+    'LineHash',
+    'WriterMode',
+    'OutputStorage',
+    'output_storage_options',
     'DataUnit',
+    'ColumnarDataUnit',
+    'wait_data_units',
     'DataRowUnitWithOutput'
 ]
\ No newline at end of file
@@ -34,6 +34,23 @@ class RemoteMonitorLibrary(ConnectionKeywords, BIKeywords):
         
         == Keywords & Usage ==
         - log_to_db     : logger will store logs into db (table: log; Will cause db file size size growing)
+        - batch_size    : max data units written to db within single transaction (Default: 200; 1 - commit per unit)
+        - batch_timeout : time budget for collecting data units into single transaction (Default: 0.1s)
+        - queue_size    : max data units pending for write (Default: 10000; 0 - unlimited)
+        - overflow_policy : block | drop_oldest | spill - behaviour on full queue (Default: block)
+        |                   spill - data units written to journal file next to db & loaded when writer idle
+        - line_hash     : md5 | int64 - output lines identity in LinesCache (Default: md5)
+        |                 int64 - compact INTEGER hash (smaller db, faster lookup); existing cumulative db migrated
+        - writer_mode   : thread | process - db writer within robot process or in dedicated process (Default: thread)
+        |                 process - SQLite writes not compete with plugins parsing for python GIL
+        - partition_interval : plugins data rolled over to new db partition file per time window (i.e. 1d, 6h; Default: off)
+        - partition_size     : plugins data rolled over to new db partition file on size limit in MB (Default: off)
+        |                      TraceHost, TimeLine, periods & outputs kept in main db file;
+        |                      `Generate Module Statistics` read only partitions touched by period
+        - rollup        : comma separated resolutions plugins data rolled up in background (i.e. 1m,10m; Default: off)
+        |                 min/avg/max per resolution kept in '<table>_rollup' tables;
+        |                 charts use coarsest resolution still filling chart width
+        - raw_retention : raw plugins data older than retention pruned once rolled up (i.e. 1h; Default: keep all)
         
         {}
 
@@ -20,11 +20,9 @@ from RemoteMonitorLibrary.utils.sql_engine import DB_DATETIME_FORMAT
 
 def _get_period_marks(period, module_id):
     points = services.TableSchemaService().tables.Points
-    start = services.DataHandlerService().execute(
-        points.queries.select_state('Start', module_id, period))
+    start = services.DataHandlerService().query(points.queries.select_state('Start'), module_id, period)
     start = None if start == [] else start[0][0]
-    end = services.DataHandlerService().execute(
-        points.queries.select_state('End', module_id, period))
+    end = services.DataHandlerService().query(points.queries.select_state('End'), module_id, period)
     end = datetime.now().strftime(DB_DATETIME_FORMAT) if end == [] else end[0][0]
     return dict(start_mark=start, end_mark=end)
 
@@ -33,6 +31,12 @@ class BIKeywords:
     __doc__ = """=== Statistics, measurement, analise keywords ===
     `Generate Module Statistics`
     
+    `Get Output`
+    
+    `Get Outputs`
+    
+    `Get Data Handler Statistics`
+    
     Evaluate statistic trend - TBD
     """
 
@@ -46,7 +50,8 @@ class BIKeywords:
         self._image_path = os.path.normpath(os.path.join(self._output_dir, self._log_path, self._images))
 
     def get_keyword_names(self):
-        return [self.generate_module_statistics.__name__]
+        return [self.generate_module_statistics.__name__, self.get_output.__name__, self.get_outputs.__name__,
+                self.get_data_handler_statistics.__name__]
 
     @staticmethod
     def _create_chart_title(*args, **options):
@@ -56,7 +61,8 @@ class BIKeywords:
         return re.sub(r'\s+|@|:', '_', _str).replace('__', '_')
 
     @keyword("Generate Module Statistics")
-    def generate_module_statistics(self, period=None, plugin_name=None, alias=None, **options):
+    def generate_module_statistics(self, period=None, plugin_name=None, alias=None,
+                                   width=services.DEFAULT_CHART_WIDTH, **options):
         """
         Generate Chart for present monitor data in visual style
 
@@ -64,6 +70,7 @@ class BIKeywords:
         - period:
         - plugin:
         - alias:
+        - width: chart width in pixels; Coarsest rollup still filling it used if rollup enabled (Default: 640)
         - options:
         :Return - html link to chart file
 
@@ -89,10 +96,14 @@ class BIKeywords:
                     marks.update(**plugin.kwargs_info)
 
                     try:
-                        sql_query = chart.compose_sql_query(host_name=plugin.host_alias, **marks)
+                        source, source_params = services.DataHandlerService().rollup_source(
+                            chart.source_table, marks.get('start_mark'), marks.get('end_mark'), width) or (None, ())
+                        sql_query = chart.compose_sql_query(host_name=plugin.host_alias, source=source, **marks)
                         logger.debug(
                             "{}{}\n{}".format(plugin.type, f'_{period}' if period is not None else '', sql_query))
-                        sql_data = services.DataHandlerService().execute(sql_query)
+                        sql_data = services.DataHandlerService().query_period(
+                            sql_query, *source_params, start_mark=marks.get('start_mark'),
+                            end_mark=marks.get('end_mark'))
                         for picture_name, file_path in generate_charts(chart, sql_data, self._image_path,
                                                                        prefix=chart_title):
                             relative_image_path = os.path.relpath(file_path, os.path.normpath(
@@ -108,3 +119,49 @@ class BIKeywords:
             html_link_text = f"Chart for <a href=\"{html_link_path}\">'{chart_title}'</a>"
             logger.warn(html_link_text, html=True)
             return html_link_text
+
+    @keyword("Get Output")
+    def get_output(self, output_ref):
+        """
+        Rebuild command output stored in DB by its reference
+
+        Arguments:
+        - output_ref: OUTPUT_REF value of monitor table row (TimeMeasurement, sshlibrary_monitor, etc.)
+        :Return - output text
+        """
+        return '\n'.join(services.CacheLines().read(int(output_ref)))
+
+    @keyword("Get Outputs")
+    def get_outputs(self, alias=None, period=None, plugin_name=None, **options):
+        """
+        Rebuild all command outputs stored in DB for host within period
+
+        Arguments:
+        - alias: connection alias (Current connection if omitted)
+        - period: period name marked by `Start period`/`Stop period` (All data if omitted)
+        - plugin_name: plugin type; Outputs of its tables only (All plugins if omitted)
+        - options: plugin filter (See `Generate Module Statistics`)
+        :Return - dictionary of OUTPUT_REF: output text
+        """
+        module = HostRegistryCache().get_connection(alias)
+        tables = None
+        if plugin_name:
+            tables = [t for plugin in module.get_plugin(plugin_name, **options) for t in plugin.affiliated_tables()]
+        marks = _get_period_marks(period, module.host_id) if period else {}
+        return {output_ref: '\n'.join(lines) for output_ref, lines in
+                services.CacheLines().read_range(module.host_id, tables=tables, **marks)}
+
+    @keyword("Get Data Handler Statistics")
+    def get_data_handler_statistics(self):
+        """
+        DB writer throughput & latency statistics collected since library init
+
+        Return dictionary:
+        - queue: current queue size, high water mark, overflow & journal counters
+        - uptime, batches, failed_batches
+        - tables: per table units, rows & rows_per_sec
+        - batch_size, queue_depth, queue_wait_ms, commit_latency_ms: histograms (count, mean, max, p50, p95, p99, buckets)
+
+        Note: Summary written into log file on top suite end & on `Terminate all monitors`
+        """
+        return services.DataHandlerService().statistics
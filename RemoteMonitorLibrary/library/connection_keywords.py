@@ -89,6 +89,18 @@ class ConnectionKeywords:
         self.location, self.file_name, self.cumulative = \
             rel_location, file_name, is_truthy(options.get('cumulative', False))
         self._log_to_db = options.get('log_to_db', False)
+        self._batch_size = int(options.get('batch_size', services.DEFAULT_BATCH_SIZE))
+        self._batch_timeout = timestr_to_secs(options.get('batch_timeout', services.DEFAULT_BATCH_TIMEOUT))
+        self._queue_size = int(options.get('queue_size', services.DEFAULT_QUEUE_SIZE))
+        self._overflow_policy = options.get('overflow_policy', services.DEFAULT_OVERFLOW_POLICY)
+        self._line_hash = options.get('line_hash', services.DEFAULT_LINE_HASH)
+        self._writer_mode = options.get('writer_mode', services.DEFAULT_WRITER_MODE)
+        self._partition_interval = timestr_to_secs(options['partition_interval']) \
+            if options.get('partition_interval') else None
+        self._partition_size = float(options['partition_size']) if options.get('partition_size') else None
+        self._rollup = [timestr_to_secs(r) for r in str(options['rollup']).split(',')] \
+            if options.get('rollup') else None
+        self._raw_retention = timestr_to_secs(options['raw_retention']) if options.get('raw_retention') else None
         self.ROBOT_LIBRARY_LISTENER = AutoSignPeriodsListener()
 
         suite_start_kw = self._normalise_auto_mark(options.get('start_suite', None), 'start_period')
@@ -116,7 +128,10 @@ class ConnectionKeywords:
     def _init(self):
         output_location = BuiltIn().get_variable_value('${OUTPUT_DIR}')
         services.DataHandlerService().init(os.path.join(output_location, self.location), self.file_name,
-                                           self.cumulative)
+                                           self.cumulative, self._batch_size, self._batch_timeout,
+                                           self._queue_size, self._overflow_policy, self._line_hash,
+                                           self._writer_mode, self._partition_interval, self._partition_size,
+                                           self._rollup, self._raw_retention)
 
         level = BuiltIn().get_variable_value('${LOG LEVEL}')
         logger.setLevel(level)
@@ -143,6 +158,7 @@ class ConnectionKeywords:
             self.resume_monitor.__name__,
             self.add_to_plugin.__name__,
             self.remove_from_plugin.__name__,
+            self.flush_monitor_plugin.__name__,
             self.set_mark.__name__,
             self.wait.__name__,
             self.register_kw.__name__,
@@ -306,6 +322,24 @@ class ConnectionKeywords:
         for plugin in plugins:
             plugin.upgrade_plugin(*args, **kwargs)
 
+    @keyword("Flush monitor plugin")
+    def flush_monitor_plugin(self, plugin_name, *args, **kwargs):
+        """
+        Flush monitor plugin - ingest data collected on host but not stored yet (i.e. aTop deferred mode)
+
+        Arguments:
+        - plugin_name:
+        - alias:
+        - args: Plugin related unnamed arguments
+        - kwargs: Plugin related named arguments
+        """
+        alias = kwargs.pop('alias', None)
+        monitor: services.RegistryModule = self._modules.get_connection(alias)
+        plugins = monitor.get_plugin(plugin_name)
+        assert len(plugins) > 0, f"Plugin '{plugin_name}{f' ({alias})' if alias else ''}' not started"
+        for plugin in plugins:
+            plugin.flush_plugin(*args, **kwargs)
+
     @keyword("Remove from Plugin")
     def remove_from_plugin(self, plugin_name, *args, **kwargs):
         """
@@ -334,16 +368,19 @@ class ConnectionKeywords:
         Arguments:
         - period_name: Name of period to be started
         - alias: Connection alias
+
+        Note: Period start time taken on keyword call; Mark written ahead of queued monitor data
         """
-        self._start_period(period_name, alias)
+        self._start_period(period_name, alias, datetime.now())
 
-    def _start_period(self, period_name=None, alias=None):
+    def _start_period(self, period_name=None, alias=None, timestamp: datetime = None):
+        timestamp = timestamp or datetime.now()
         module: services.RegistryModule = self._modules.get_connection(alias)
         table = services.TableSchemaService().tables.Points
-        services.DataHandlerService().execute(insert_sql(table.name, table.columns),
-                                              module.host_id, period_name or module.alias,
-                                              datetime.now().strftime(DB_DATETIME_FORMAT),
-                                              None)
+        services.DataHandlerService().execute_priority(insert_sql(table.name, table.columns),
+                                                       module.host_id, period_name or module.alias,
+                                                       timestamp.strftime(DB_DATETIME_FORMAT),
+                                                       None)
 
     @keyword("Stop period")
     def stop_period(self, period_name=None, alias=None):
@@ -353,16 +390,19 @@ class ConnectionKeywords:
         Arguments:
         - period_name: Name of period to be stopped
         - alias: Connection alias
+
+        Note: Period end time taken on keyword call; Mark written ahead of queued monitor data
         """
-        self._stop_period(period_name, alias)
+        self._stop_period(period_name, alias, datetime.now())
 
-    def _stop_period(self, period_name=None, alias=None):
+    def _stop_period(self, period_name=None, alias=None, timestamp: datetime = None):
+        timestamp = timestamp or datetime.now()
         module: services.RegistryModule = self._modules.get_connection(alias)
         table = services.TableSchemaService().tables.Points
         point_name = rf"{period_name or module.alias}"
-        services.DataHandlerService().execute(update_sql(table.name, 'End',
-                                                         HOST_REF=module.host_id, PointName=point_name),
-                                              datetime.now().strftime(DB_DATETIME_FORMAT))
+        sql, params = update_sql(table.name, dict(End=timestamp.strftime(DB_DATETIME_FORMAT)),
+                                 HOST_REF=module.host_id, PointName=point_name)
+        services.DataHandlerService().execute_priority(sql, *params)
 
     @keyword("Wait")
     def wait(self, timeout, reason=None, reminder='1h'):
@@ -392,11 +432,12 @@ class ConnectionKeywords:
 
     @keyword("Set mark")
     def set_mark(self, mark_name, alias=None):
+        timestamp = datetime.now()
         module: services.RegistryModule = self._modules.get_connection(alias)
         table = services.TableSchemaService().tables.Points
-        services.DataHandlerService().execute(update_sql(table.name, 'Mark',
-                                                         HOST_REF=module.host_id, PointName=mark_name),
-                                              datetime.now().strftime(DB_DATETIME_FORMAT))
+        sql, params = update_sql(table.name, dict(Mark=timestamp.strftime(DB_DATETIME_FORMAT)),
+                                 HOST_REF=module.host_id, PointName=mark_name)
+        services.DataHandlerService().execute_priority(sql, *params)
 
     @keyword("Get Current RML Errors")
     def get_current_errors(self):
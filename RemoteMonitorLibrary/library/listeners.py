@@ -1,6 +1,7 @@
 from enum import Enum
 from typing import Dict, List
 
+from RemoteMonitorLibrary.api import services
 from RemoteMonitorLibrary.utils.logger_helper import logger
 from robot.errors import HandlerExecutionFailed
 from robot.libraries.BuiltIn import BuiltIn
@@ -69,6 +70,9 @@ class AutoSignPeriodsListener:
     def end_suite(self, suite, data):
         for cb in self._get_hooks_for(AllowedHooks.end_suite):
             cb()
+        if suite.parent is None:
+            if services.DataHandlerService().is_active:
+                logger.info(services.DataHandlerService().statistics_summary())
 
     def start_test(self, test: TestCase, data):
         for cb in self._get_hooks_for(AllowedHooks.start_test):
@@ -1,3 +1,4 @@
+import re
 import warnings
 from abc import ABC, abstractmethod
 from datetime import datetime
@@ -38,8 +39,19 @@ class ChartAbstract(ABC):
     def get_sql_query(self) -> str:
         raise NotImplementedError()
 
+    @property
+    def source_table(self) -> str:
+        """
+        Plugin table chart query reads from; Replaced by rollup sub query (kwarg 'source') if provided
+        """
+        return None
+
     def compose_sql_query(self, host_name, **kwargs) -> str:
         _sql = self.get_sql_query.format(host_name=host_name)
+        _source = kwargs.get('source', None)
+        if _source and self.source_table:
+            _sql = re.sub(rf"\bFROM\s+{self.source_table}\b", lambda m: f"FROM ({_source})", _sql, count=1,
+                          flags=re.IGNORECASE)
         _start = kwargs.get('start_mark', None)
         if _start:
             _sql += f" AND \"{_start}\" <= t.TimeStamp"
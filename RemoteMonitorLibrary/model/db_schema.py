@@ -11,6 +11,7 @@ class FieldType(Enum):
     Int = 'INTEGER'
     Text = 'TEXT'
     Real = 'REAL'
+    Blob = 'BLOB'
 
 
 class PrimaryKeys:
@@ -60,20 +61,61 @@ class Field:
         return f"{self.name} {self.type.value}{self.not_null}{self.unique}{self.primary_key}"
 
 
+class Index:
+    def __init__(self, *fields, unique=False):
+        """
+        Index definition for table
+        :param fields: Indexed field names (Composite index if several provided)
+        :param unique: Create unique index
+        """
+        assert len(fields) > 0, "Index fields not provided"
+        self._fields = tuple(fields)
+        self._unique = unique
+
+    @property
+    def fields(self) -> Tuple:
+        return self._fields
+
+    @property
+    def unique(self):
+        return self._unique
+
+    def name(self, table_name):
+        return f"idx_{table_name}_{'_'.join(self.fields)}"
+
+    def covers(self, *fields):
+        return self.fields[:len(fields)] == tuple(fields)
+
+    def __str__(self):
+        return f"({', '.join(self.fields)})"
+
+    def __eq__(self, other):
+        return isinstance(other, Index) and self.fields == other.fields
+
+    def __hash__(self):
+        return hash(self.fields)
+
+
 class Query:
-    def __init__(self, name: str, sql: str):
+    def __init__(self, name: str, sql: str, index: Index = None):
         """
         Query assigned for Table
         :param name: query name string
         :param sql: SQL statement in python format (Mandatory variables)
+        :param index: Index required for query (Optional; created with table)
         """
         self._name = name
         self._sql = sql
+        self._index = index
 
     @property
     def name(self):
         return self._name
 
+    @property
+    def index(self):
+        return self._index
+
     @property
     def sql(self):
         return self._sql
@@ -121,21 +163,33 @@ class ForeignKey:
 
 class Table(object):
     def __init__(self, name=None, fields: Iterable[Field] = [], queries: Iterable[Query] = [],
-                 foreign_keys: List[ForeignKey] = []):
+                 foreign_keys: List[ForeignKey] = [], indexes: Iterable[Index] = []):
         self._name = name or self.__class__.__name__
+        self._template = None
         self._fields = tuple()
         for f in fields:
             self.add_field(f)
         self._foreign_keys = tuple()
         for fk in foreign_keys:
             self.add_foreign_key(fk)
+        self._indexes = tuple()
+        for index in indexes:
+            self.add_index(index)
         self._queries: DotDict[str, Query] = DotDict()
         for query in queries or []:
             self._queries[query.name] = query
+            if query.index:
+                self.add_index(query.index)
+        self._dimension_references = {}
 
     @property
     def template(self):
-        return namedtuple(self.name, (f.name for f in self.fields))
+        """
+        Row type (namedtuple) compiled once per fields set
+        """
+        if self._template is None:
+            self._template = namedtuple(self.name, (f.name for f in self.fields))
+        return self._template
 
     @property
     def fields(self) -> Tuple:
@@ -144,6 +198,7 @@ class Table(object):
     def add_field(self, field: Field):
         assert field not in self.fields, f"Field '{field}' already exist"
         self._fields = tuple(list(self.fields) + [field])
+        self._template = None
 
     @property
     def columns(self) -> List[AnyStr]:
@@ -168,4 +223,31 @@ class Table(object):
         assert fk not in self.fields, f"Foreign Key '{fk}' already exist"
         self._foreign_keys = tuple(list(self._foreign_keys) + [fk])
 
+    @property
+    def dimension_references(self) -> dict:
+        """
+        Field name -> dimension table its values interned into (Replaced inline value field of same name as
+        dimension value field in earlier schema)
+        """
+        return self._dimension_references
+
+    def add_dimension_reference(self, field_name, dimension):
+        self.add_field(Field(field_name, FieldType.Int))
+        self._dimension_references[field_name] = dimension
+
+    def add_index(self, index: Index):
+        if index not in self._indexes:
+            self._indexes = tuple(list(self._indexes) + [index])
+
+    @property
+    def indexes(self) -> Tuple:
+        """
+        Declared indexes following by auto derived ones for foreign key own fields (if not covered by declared)
+        """
+        _indexes = list(self._indexes)
+        for fk in self.foreign_keys:
+            if not any(i.covers(fk.own_field) for i in _indexes):
+                _indexes.append(Index(fk.own_field))
+        return tuple(_indexes)
+
 
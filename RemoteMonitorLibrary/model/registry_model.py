@@ -53,10 +53,12 @@ class RegistryModule(metaclass=ABCMeta):
         self._configuration.update({'event': Event()})
         table = services.TableSchemaService().tables.TraceHost
         try:
-            services.DataHandlerService().execute(insert_sql(table.name, table.columns), *(None, self.alias))
-            self._host_id = services.DataHandlerService().get_last_row_id
+            with services.DataHandlerService().priority():
+                services.DataHandlerService().execute(insert_sql(table.name, table.columns), *(None, self.alias))
+                self._host_id = services.DataHandlerService().get_last_row_id
         except IntegrityError:
-            host_id = services.DataHandlerService().execute(select_sql(table.name, 'HOST_ID', HostName=self.alias))
+            sql, params = select_sql(table.name, 'HOST_ID', HostName=self.alias)
+            host_id = services.DataHandlerService().execute_priority(sql, *params)
             assert host_id, f"Cannot occur host id for alias '{self.alias}'"
             self._host_id = host_id[0][0]
 
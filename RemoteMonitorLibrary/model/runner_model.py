@@ -444,6 +444,9 @@ class plugin_integration_abstract(object):
     def downgrade_plugin(self, *args, **kwargs):
         logger.warn(f"PlugIn '{self.__class__.__name__}' doesn't have downgradable items")
 
+    def flush_plugin(self, *args, **kwargs):
+        logger.warn(f"PlugIn '{self.__class__.__name__}' doesn't have deferred data to flush")
+
     @property
     def id(self):
         return f"{self.__class__.__name__}_{id(self)}"
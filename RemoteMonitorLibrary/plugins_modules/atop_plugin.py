@@ -1,16 +1,24 @@
 import json
+import os
 import re
-from collections import namedtuple, OrderedDict
-from datetime import datetime
+from array import array
+from collections import namedtuple, deque
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from enum import Enum
+from functools import lru_cache
+from multiprocessing import get_context
 from typing import Iterable, Tuple, List, Any
 
 from SSHLibrary import SSHLibrary
-from robot.utils import timestr_to_secs
+from robot.utils import timestr_to_secs, is_truthy
 
 from RemoteMonitorLibrary import plugins_modules
-from RemoteMonitorLibrary.api import model, tools, db, plugins, services
+from RemoteMonitorLibrary.api import model, db, plugins, services
 from RemoteMonitorLibrary.utils import Size, get_error_info, Singleton
 from RemoteMonitorLibrary.utils import logger
+from RemoteMonitorLibrary.utils.sql_engine import DB_DATETIME_FORMAT
 
 __doc__ = """
 == aTop plugin overview == 
@@ -23,9 +31,13 @@ Remote Monitor starting by command
 
 | sudo atop -w ~/atop_temp/atop.dat <interval>
 
-Reading atop statistics made with command
+Reading atop statistics made with command per poll; Window start from last sample already ingested
 
-| sudo atop -r ~/atop_temp/atop.dat -b  -b `date +%Y%m%d%H%M` 
+| sudo atop -r ~/atop_temp/atop.dat -b <last sample time> -e `date -d '+1 min' +%Y%m%d%H%M` 
+
+Hosts accepting time of day only (Debian: hh:mm) read without end bound; Window restarted from 00:00 once day changed
+
+| sudo atop -r ~/atop_temp/atop.dat -b <last sample time or 00:00> 
 
 !!! Pay attention: Ubuntu & CentOS supported only for now !!! 
 
@@ -36,18 +48,31 @@ Not named:
     
 Named:
 - interval: can be define from keyword `Start monitor plugin` as key-value pair (Default: 1s) 
+- mode: batch - screen output (atop -b) parsed per distro layout (Default); 
+        parseable - atop parseable labels (atop -P CPU,cpu,MEM,SWP,DSK,NET,PRG,PRC,PRM,PRD) parsed same way 
+        on every distro; Process labels of monitored processes only transferred from host 
+- deferred: atop raw file read from host on `Flush monitor plugin` keyword & plugin stop only (Default: no);
+        Read in time slices one by one while previous slices parsed by local process pool;
+        Data stored with sample time (instead of ingestion time) 
+- chunk: deferred mode slice length (Default: 1h)
+- workers: deferred mode process pool size (Default: CPU count; Parse within library process if less than 2)
 
 Note: Support robot time format string (1s, 05m, etc.)
 
 """
 
 
+class atop_datamap(db.DimensionTable):
+    def __init__(self):
+        super().__init__('atop_datamap', 'MAP_ID', model.Field('DataMap', unique=True))
+
+
 class atop_system_level(db.PlugInTable):
     def __init__(self):
         super().__init__(name='atop_system_level')
         self.add_time_reference()
         self.add_field(model.Field('Type'))
-        self.add_field(model.Field('DataMap'))
+        self.add_dimension_reference('MAP_REF', atop_datamap())
         self.add_field(model.Field('Col1', model.FieldType.Real))
         self.add_field(model.Field('Col2', model.FieldType.Real))
         self.add_field(model.Field('Col3', model.FieldType.Real))
@@ -105,6 +130,10 @@ class ProcessMonitorRegistry(dict):
 
 
 class aTopProcessLevelChart(plugins.ChartAbstract):
+    @property
+    def source_table(self) -> str:
+        return 'atop_process_level'
+
     @property
     def get_sql_query(self) -> str:
         return f"""SELECT t.TimeStamp, p.SYSCPU as SYSCPU, p.USRCPU, p.VGROW, p.RDDSK, p.WRDSK, p.CPU, p.CMD
@@ -143,7 +172,7 @@ class aTopSystemLevelChart(plugins.ChartAbstract):
         return self._sections
 
     def y_axes(self, data: [Iterable[Any]]) -> Iterable[Any]:
-        return [i for i in json.loads([y[0] for y in data][0]) if i not in ['no', 'SUB_ID']]
+        return [i for i in _column_names([y[0] for y in data][0]) if i not in ['no', 'SUB_ID']]
 
     def data_area(self, data: [Iterable[Iterable]]) -> [Iterable[Iterable]]:
         return data
@@ -152,11 +181,16 @@ class aTopSystemLevelChart(plugins.ChartAbstract):
     def file_name(self) -> str:
         return "{name}.png"
 
+    @property
+    def source_table(self) -> str:
+        return 'atop_system_level'
+
     @property
     def get_sql_query(self) -> str:
-        return """select top.SUB_ID as SUB_ID, top.DataMap as Map, t.TimeStamp as Time, top.Col1 as Col1, 
+        return """select top.SUB_ID as SUB_ID, m.DataMap as Map, t.TimeStamp as Time, top.Col1 as Col1, 
                 top.Col2 as Col2, top.Col3 as Col3, top.Col4 as Col4, top.Col5 as Col5
                 from atop_system_level top
+                JOIN atop_datamap m ON top.MAP_REF = m.MAP_ID
                 JOIN TraceHost h ON top.HOST_REF = h.HOST_ID
                 JOIN TimeLine t ON top.TL_REF = t.TL_ID 
                 WHERE h.HostName = '{host_name}' """
@@ -181,6 +215,191 @@ class aTopSystemLevelChart(plugins.ChartAbstract):
         return result
 
 
+SYSTEM_LINE_REGEX = re.compile(r'(.+)\|(.+)\|(.+)\|(.+)\|(.+)\|(.+)\|')
+SYSTEM_ROW_MAP = namedtuple('ROW', ('Col1', 'Col2', 'Col3', 'Col4', 'Col5', 'SUB_ID'))
+
+
+@lru_cache(maxsize=None)
+def _column_map(columns: Tuple[str, ...]) -> str:
+    return json.dumps(SYSTEM_ROW_MAP(*columns), indent=True)
+
+
+@lru_cache(maxsize=None)
+def _column_names(data_map: str) -> Tuple[str, ...]:
+    return tuple(json.loads(data_map))
+
+
+@lru_cache(maxsize=4096)
+def _time_value(value: str):
+    return aTopParser.try_time_string_to_secs(value)
+
+
+@lru_cache(maxsize=4096)
+def _size_value(value: str):
+    return Size(value).set_format('M').number
+
+
+def _percent_value(value: str):
+    return value.replace('%', '')
+
+
+def _raw_value(value: str):
+    return value
+
+
+class SystemLineSpec:
+    def __init__(self, maxsplit, value=_raw_value, sub_id=None):
+        """
+        Parsing rule of aTop system level line type ('<key> <value>' cells)
+        :param maxsplit: cell split limit; key & value expected
+        :param value: cell value converter
+        :param sub_id: static SUB_ID (Default: line type)
+        """
+        self._maxsplit = maxsplit
+        self._value = value
+        self._sub_id = sub_id
+
+    def __call__(self, type_, data_):
+        """
+        :return: type, SUB_ID, cells mapping
+        """
+        value = self._value
+        pattern = {}
+        for cell in data_:
+            k, v = cell.split(None, self._maxsplit)
+            pattern[k] = value(v)
+        return type_, self._sub_id or type_, pattern
+
+
+class CoreLineSpec(SystemLineSpec):
+    def __call__(self, type_, data_):
+        type_, sub_id, pattern = super().__call__(type_, data_)
+        for k, v in pattern.items():
+            if k.startswith('cpu'):
+                _cpu_str, _wait = v.split(None, 1)
+                pattern.pop(k)
+                pattern.update({'wait': _wait})
+                sub_id = k.replace('cpu', 'cpu_').upper()
+                break
+        return 'CPU', sub_id, pattern
+
+
+class DeviceLineSpec(SystemLineSpec):
+    def __call__(self, type_, data_):
+        sub_id, pattern = type_, {}
+        for cell in data_:
+            item = cell.split()
+            if len(item) == 1 or item[1] == '----':
+                pattern.update({'source': '-1'})
+                sub_id = f"{type_}_{item[0]}"
+            else:
+                pattern.update({item[0]: item[1].replace('%', '')})
+        return type_, sub_id, pattern
+
+
+SYSTEM_LINE_SPECS = {
+    'PRC': SystemLineSpec(2, _time_value),
+    'PAG': SystemLineSpec(2, _time_value),
+    'CPU': SystemLineSpec(1, _percent_value, 'CPU_All'),
+    'cpu': CoreLineSpec(1, _percent_value),
+    'CPL': SystemLineSpec(1),
+    'MEM': SystemLineSpec(1, _size_value),
+    'SWP': SystemLineSpec(1, _size_value),
+    'LVM': DeviceLineSpec(None),
+    'DSK': DeviceLineSpec(None),
+    'NET': DeviceLineSpec(None)
+}
+
+
+class aTopMode(Enum):
+    Batch = 'batch'
+    Parseable = 'parseable'
+
+
+ATOP_TIME_FORMAT = '%Y/%m/%d %H:%M:%S'
+PARSEABLE_SYSTEM_LABELS = ('CPU', 'cpu', 'MEM', 'SWP', 'DSK', 'NET')
+PARSEABLE_PROCESS_LABELS = ('PRG', 'PRC', 'PRM', 'PRD')
+PARSEABLE_PROCESS_REGEX = re.compile(r'(\d+) \((.*?)\) (\S) ?(.*)')
+SECTOR_SIZE = 512
+PARSEABLE_REMOTE_FILTER = "| grep -E '{process_filter}' | awk 'NF==1||$4\" \"$5>\"{after}\"'"
+
+
+def _percents(ticks, scale=1):
+    """
+    CPU ticks (sys, user, nice, idle, wait, irq, softirq, steal) to percents of single core (aTop batch view)
+    """
+    total = sum(ticks) / scale
+    if total == 0:
+        raise ValueError('No CPU ticks in interval')
+    sys_, user, _nice, idle, wait, irq, softirq, _steal = [round(t * 100 / total) for t in ticks]
+    return dict(sys=sys_, user=user, irq=irq + softirq, idle=idle, wait=wait)
+
+
+def _megabytes(count, unit=1):
+    return round(int(count) * unit / 1024 / 1024, 1)
+
+
+def _parseable_cpu(interval, fields):
+    yield 'CPU', 'CPU_All', _percents([int(f) for f in fields[2:10]], int(fields[1]))
+
+
+def _parseable_core(interval, fields):
+    yield 'CPU', f"CPU_{int(fields[1]):03d}", _percents([int(f) for f in fields[2:10]])
+
+
+def _parseable_memory(interval, fields):
+    page = int(fields[0])
+    yield 'MEM', 'MEM', {k: _megabytes(v, page) for k, v in zip(('tot', 'free', 'cache', 'buff', 'slab'), fields[1:6])}
+
+
+def _parseable_swap(interval, fields):
+    page = int(fields[0])
+    yield 'SWP', 'SWP', {k: _megabytes(v, page)
+                         for k, v in zip(('tot', 'free', 'swcac', 'vmcom', 'vmlim'), fields[1:6])}
+
+
+def _parseable_disk(interval, fields):
+    name, io_ms, reads, _read_sectors, writes, write_sectors = fields[:6]
+    interval = max(interval, 1)
+    yield 'DSK', f"DSK_{name}", {'source': -1, 'busy': round(int(io_ms) / interval / 10), 'read': int(reads),
+                                 'write': int(writes),
+                                 'MBw/s': round(_megabytes(write_sectors, SECTOR_SIZE) / interval, 1)}
+
+
+def _parseable_network(interval, fields):
+    if fields[0] == 'upper':
+        tcpi, tcpo, udpi, udpo, ipi, ipo, deliv, ipfrw = [int(f) for f in fields[1:9]]
+        yield 'NET', 'NET_transport', dict(source=-1, tcpi=tcpi, tcpo=tcpo, udpi=udpi, udpo=udpo)
+        yield 'NET', 'NET_network', dict(source=-1, ipi=ipi, ipo=ipo, ipfrw=ipfrw, deliv=deliv)
+    else:
+        name, pcki, bytes_in, pcko, bytes_out = fields[:5]
+        interval = max(interval, 1)
+        yield 'NET', f"NET_{name}", dict(source=-1, pcki=int(pcki), pcko=int(pcko),
+                                         si=round(int(bytes_in) * 8 / 1000 / interval),
+                                         so=round(int(bytes_out) * 8 / 1000 / interval))
+
+
+PARSEABLE_SYSTEM_SPECS = {
+    'CPU': _parseable_cpu,
+    'cpu': _parseable_core,
+    'MEM': _parseable_memory,
+    'SWP': _parseable_swap,
+    'DSK': _parseable_disk,
+    'NET': _parseable_network
+}
+
+
+def parseable_filter(*processes):
+    """
+    Remote output filter (grep -E): system labels & labels of processes matching (substring) names only
+    """
+    pattern = r"^(SEP|RESET)$|^({}) ".format('|'.join(PARSEABLE_SYSTEM_LABELS))
+    if len(processes) > 0:
+        pattern += r"|^PR[GCMD] [^ ]+ [0-9]+ [^ ]+ [^ ]+ [0-9]+ [0-9]+ \([^)]*({})".format(
+            '|'.join(re.sub(r'[^\w\-]', '.', p) for p in processes))
+    return pattern
+
+
 class aTopSystem_DataUnit(services.DataUnit):
     def __init__(self, table, host_id, *lines, **kwargs):
         super().__init__(table, **kwargs)
@@ -188,56 +407,21 @@ class aTopSystem_DataUnit(services.DataUnit):
         self._host_id = host_id
 
     @staticmethod
-    def _generate_atop_system_level(input_text, columns_template, *defaults):
-        header_regex = re.compile(r'(.+)\|(.+)\|(.+)\|(.+)\|(.+)\|(.+)\|')
+    def _generate_atop_system_level(input_text, columns_template, *defaults, data_map=_raw_value):
+        """
+        :param data_map: column map (JSON) to stored value converter (i.e. interned into atop_datamap)
+        """
         res = []
-        row_mapping = namedtuple('ROW', ('Col1', 'Col2', 'Col3', 'Col4', 'Col5', 'SUB_ID'))
-        for line in header_regex.findall(input_text):
+        for line in SYSTEM_LINE_REGEX.findall(input_text):
             try:
                 type_, data_ = aTopParser._normalize_line(*line)
-                sub_id = type_
-                pattern = OrderedDict()
-                if type_ in ('PRC', 'PAG'):
-                    pattern.update(
-                        **{k: aTopParser.try_time_string_to_secs(v) for k, v in
-                           [re.split(r'\s+', s.strip(), 2) for s in data_]})
-                elif type_ in ['CPU', 'cpu']:
-                    pattern.update(
-                        **{k: v.replace('%', '') for k, v in [re.split(r'\s+', s.strip(), 1) for s in data_]})
-                    if type_ == 'cpu':
-                        for k, v in pattern.items():
-                            if k.startswith('cpu'):
-                                _cpu_str, _wait = re.split(r'\s+', v, 1)
-                                pattern.pop(k)
-                                pattern.update({'wait': _wait})
-                                sub_id = k.replace('cpu', 'cpu_').upper()
-                                break
-                        type_ = 'CPU'
-                    else:
-                        sub_id = 'CPU_All'
-                elif type_ == 'CPL':
-                    pattern.update(
-                        **{k: v for k, v in [re.split(r'\s+', s.strip(), 1) for s in data_]})
-                elif type_ in ['MEM', 'SWP']:
-                    pattern.update(
-                        **{k: v for k, v in [re.split(r'\s+', s.strip(), 1) for s in data_]})
-                    for k in pattern.keys():
-                        pattern[k] = Size(pattern[k]).set_format('M').number
-                elif type_ in ['LVM', 'DSK', 'NET']:
-                    items = [re.split(r'\s+', s.strip()) for s in data_]
-                    for item in items:
-                        if len(item) == 1 or item[1] == '----':
-                            pattern.update({'source': '-1'})
-                            sub_id = f"{type_}_{item[0]}"
-                        elif len(item) >= 2:
-                            pattern.update({item[0]: item[1].replace('%', '')})
-                        else:
-                            pattern.update({item[0]: re.sub(r'[\sKbpms%]+', '', item[1])})
-                else:
+                spec = SYSTEM_LINE_SPECS.get(type_, None)
+                if spec is None:
                     raise ValueError(f"Unknown line type: {' '.join(line)}")
+                type_, sub_id, pattern = spec(type_, data_)
                 pattern.update(SUB_ID=sub_id)
-                res.append(columns_template(
-                    *[*defaults, type_, json.dumps(row_mapping(*pattern.keys()), indent=True), *pattern.values()]))
+                res.append(columns_template(*defaults, type_, data_map(_column_map(tuple(pattern.keys()))),
+                                            *pattern.values()))
             except ValueError as e:
                 logger.error(f"aTop parse error: {e}")
             except Exception as e:
@@ -246,14 +430,22 @@ class aTopSystem_DataUnit(services.DataUnit):
                 raise
         return res
 
+    def generate_rows(self, data_map=_raw_value):
+        return self._generate_atop_system_level('\n'.join(self._lines), self.table.template, self._host_id, None,
+                                                data_map=data_map)
+
     def __call__(self, **updates) -> Tuple[str, Iterable[Iterable]]:
-        self._data = self._generate_atop_system_level('\n'.join(self._lines), self.table.template, self._host_id, None)
+        data_map_table = services.TableSchemaService().tables.atop_datamap
+        self._data = self.generate_rows(lambda m: services.cache_dimension(data_map_table, m))
         return super().__call__(**updates)
 
 
-class aTopProcesses_Debian_DataUnit(services.DataUnit):
+class aTopProcesses_Debian_DataUnit(services.ColumnarDataUnit):
+    COLUMNS = ('PID', 'SYSCPU', 'USRCPU', 'VGROW', 'RGROW', 'RDDSK', 'WRDSK', 'CPU', 'CMD')
+    NUMERIC_COLUMNS = ('SYSCPU', 'USRCPU', 'VGROW', 'RGROW', 'RDDSK', 'WRDSK')
+
     def __init__(self, table, host_id, *lines, **kwargs):
-        super().__init__(table, **kwargs)
+        super().__init__(table, constants=dict(HOST_REF=host_id), **kwargs)
         self._lines = lines
         self._host_id = host_id
         self._processes_id = kwargs.get('processes_id', {})
@@ -291,47 +483,96 @@ class aTopProcesses_Debian_DataUnit(services.DataUnit):
             return size_
         return Size(size_).set_format(rate).number
 
-    def generate_atop_process_level(self, lines, *defaults):
+    def _process_values(self, cells):
+        return (cells[0],
+                timestr_to_secs(cells[1], 2),
+                timestr_to_secs(cells[2], 2),
+                self._format_size(cells[3]),
+                self._format_size(cells[4]),
+                self._format_size(cells[5]),
+                self._format_size(cells[6]),
+                cells[-2].replace('%', ''),
+                self._normalise_process_name(f"{cells[-1]}_{cells[0]}"))
+
+    def generate_atop_process_level(self, lines):
+        columns = [array('d') if c in self.NUMERIC_COLUMNS else [] for c in self.COLUMNS]
         for cells in self._filter_controlled_processes(*lines):
-            process_name = self._normalise_process_name(f"{cells[-1]}_{cells[0]}")
-            yield self.table.template(*(list(defaults) +
-                                        [cells[0],
-                                         timestr_to_secs(cells[1], 2),
-                                         timestr_to_secs(cells[2], 2),
-                                         self._format_size(cells[3]),
-                                         self._format_size(cells[4]),
-                                         self._format_size(cells[5]),
-                                         self._format_size(cells[6]),
-                                         cells[-2].replace('%', ''),
-                                         process_name
-                                         ]
-                                        )
-                                      )
+            for column, value in zip(columns, self._process_values(cells)):
+                column.append(value)
+        return dict(zip(self.COLUMNS, columns))
+
+    def generate_columns(self):
+        return self.generate_atop_process_level(self._lines)
 
     def __call__(self, **updates) -> Tuple[str, Iterable[Iterable]]:
-        self._data = list(
-            self.generate_atop_process_level(self._lines, self._host_id, None)
-        )
+        self.set_columns(**self.generate_columns())
         return super().__call__(**updates)
 
 
 class aTopProcesses_Fedora_DataUnit(aTopProcesses_Debian_DataUnit):
-    def generate_atop_process_level(self, lines, *defaults):
-        for cells in self._filter_controlled_processes(*lines):
-            process_name = self._normalise_process_name(f"{cells[-1]}_{cells[0]}")
-            yield self.table.template(*(list(defaults) +
-                                        [cells[0],
-                                         timestr_to_secs(cells[1], 2),
-                                         timestr_to_secs(cells[2], 2),
-                                         Size(cells[4]).set_format('M').number if cells[4] != '-' else 0,
-                                         Size(cells[5]).set_format('M').number if cells[5] != '-' else 0,
-                                         Size(cells[6]).set_format('M').number if cells[6] != '-' else 0,
-                                         Size(cells[7]).set_format('M').number if cells[7] != '-' else 0,
-                                         cells[-2].replace('%', ''),
-                                         process_name
-                                         ]
-                                        )
-                                      )
+    def _process_values(self, cells):
+        return (cells[0],
+                timestr_to_secs(cells[1], 2),
+                timestr_to_secs(cells[2], 2),
+                Size(cells[4]).set_format('M').number if cells[4] != '-' else 0,
+                Size(cells[5]).set_format('M').number if cells[5] != '-' else 0,
+                Size(cells[6]).set_format('M').number if cells[6] != '-' else 0,
+                Size(cells[7]).set_format('M').number if cells[7] != '-' else 0,
+                cells[-2].replace('%', ''),
+                self._normalise_process_name(f"{cells[-1]}_{cells[0]}"))
+
+
+class aTopSystem_Parseable_DataUnit(aTopSystem_DataUnit):
+    def __init__(self, table, host_id, *entries, **kwargs):
+        """
+        :param entries: aTop parseable system lines split to (label, interval, fields)
+        """
+        super().__init__(table, host_id, *entries, **kwargs)
+
+    @staticmethod
+    def _generate_parseable_system_level(entries, columns_template, *defaults, data_map=_raw_value):
+        res = []
+        for label, interval, fields in entries:
+            try:
+                for type_, sub_id, pattern in PARSEABLE_SYSTEM_SPECS[label](interval, fields):
+                    pattern.update(SUB_ID=sub_id)
+                    res.append(columns_template(*defaults, type_, data_map(_column_map(tuple(pattern.keys()))),
+                                                *pattern.values()))
+            except (ValueError, IndexError) as e:
+                logger.error(f"aTop parse error: {e}; Line: {label} {' '.join(fields)}")
+        return res
+
+    def generate_rows(self, data_map=_raw_value):
+        return self._generate_parseable_system_level(self._lines, self.table.template, self._host_id, None,
+                                                     data_map=data_map)
+
+
+class aTopProcesses_Parseable_DataUnit(aTopProcesses_Debian_DataUnit):
+    def __init__(self, table, host_id, *records, **kwargs):
+        """
+        :param records: aTop parseable process labels per PID; (PID, name, interval, {label: fields})
+        """
+        super().__init__(table, host_id, *records, **kwargs)
+
+    def _filter_controlled_processes(self, *records):
+        for record in records:
+            if self.is_process_monitored(record[1]):
+                yield record
+
+    def _process_values(self, record):
+        pid, name, interval, labels = record
+        hertz, utime, stime = [int(f) for f in labels.get('PRC', ('1', '0', '0'))[:3]]
+        vgrow, rgrow = [int(f) for f in labels.get('PRM', ('0',) * 6)[4:6]]
+        read_sectors, write_sectors = [int(f) for f in labels.get('PRD', ('n', 'n', '0', '0', '0', '0'))[3:6:2]]
+        return (pid,
+                stime / hertz,
+                utime / hertz,
+                vgrow / 1024,
+                rgrow / 1024,
+                _megabytes(read_sectors, SECTOR_SIZE),
+                _megabytes(write_sectors, SECTOR_SIZE),
+                round((utime + stime) * 100 / hertz / max(interval, 1)),
+                self._normalise_process_name(f"{name}_{pid}"))
 
 
 def process_data_unit_factory(os_family):
@@ -345,9 +586,29 @@ def process_data_unit_factory(os_family):
 class aTopParser(plugins.Parser):
     def __init__(self, plugin_id, **kwargs):
         self._data_unit_class = kwargs.pop('data_unit')
+        self._sample_timestamps = kwargs.pop('sample_timestamps', False)
         plugins.Parser.__init__(self, **kwargs)
         self.id = plugin_id
-        self._ts_cache = tools.CacheList(int(600 / timestr_to_secs(kwargs.get('interval', '1x'))))
+        self._last_sample: datetime = None
+
+    @property
+    def last_sample(self) -> datetime:
+        """
+        Time (host local) of last sample ingested; Next read window start from it
+        """
+        return self._last_sample
+
+    def _is_new_sample(self, sample_time: datetime) -> bool:
+        if self._last_sample is not None and sample_time <= self._last_sample:
+            return False
+        self._last_sample = sample_time
+        return True
+
+    def _unit_options(self, sample_time: datetime):
+        """
+        Data units stamped by sample time (host local) instead of ingestion time if requested (deferred mode)
+        """
+        return dict(datetime=sample_time.strftime(DB_DATETIME_FORMAT)) if self._sample_timestamps else {}
 
     @staticmethod
     def try_time_string_to_secs(time_str):
@@ -380,20 +641,268 @@ class aTopParser(plugins.Parser):
             for atop_portion in [e.strip() for e in stdout.split('ATOP') if e.strip() != '']:
                 lines = atop_portion.splitlines()
                 f_line = lines.pop(0)
-                ts = '_'.join(re.split(r'\s+', f_line)[2:4]) + f".{datetime.now().strftime('%S')}"
+                sample_time = datetime.strptime(' '.join(re.split(r'\s+', f_line)[2:4]), ATOP_TIME_FORMAT)
+                if not self._is_new_sample(sample_time):
+                    continue
                 system_portion, process_portion = '\n'.join(lines).split('PID', 1)
                 process_portion = 'PID\t' + process_portion
-                if ts not in self._ts_cache:
-                    self._ts_cache.append(ts)
-                    du_system = aTopSystem_DataUnit(self.table['system'], self.host_id,
-                                                    *system_portion.splitlines())
-                    self.data_handler(du_system)
-                    if ProcessMonitorRegistry().is_active:
-                        du_process = self._data_unit_class(self.table['process'], self.host_id,
-                                                           *process_portion.splitlines()[1:],
-                                                           processes_id=self.id)
-                        self.data_handler(du_process)
+                du_system = aTopSystem_DataUnit(self.table['system'], self.host_id, *system_portion.splitlines(),
+                                                **self._unit_options(sample_time))
+                self.data_handler(du_system)
+                if ProcessMonitorRegistry().is_active:
+                    du_process = self._data_unit_class(self.table['process'], self.host_id,
+                                                       *process_portion.splitlines()[1:],
+                                                       processes_id=self.id, **self._unit_options(sample_time))
+                    self.data_handler(du_process)
+
+        except Exception as e:
+            f, li = get_error_info()
+            logger.error(
+                f"{self.__class__.__name__}: Unexpected error: {type(e).__name__}: {e}; File: {f}:{li}")
+        else:
+            return True
+        return False
+
+
+class aTopParseableParser(aTopParser):
+    def _emit(self, sample_time, system_entries, processes):
+        sample_time = datetime.strptime(sample_time, ATOP_TIME_FORMAT)
+        if not self._is_new_sample(sample_time):
+            return
+        self.data_handler(aTopSystem_Parseable_DataUnit(self.table['system'], self.host_id, *system_entries,
+                                                        **self._unit_options(sample_time)))
+        if ProcessMonitorRegistry().is_active and len(processes) > 0:
+            self.data_handler(self._data_unit_class(self.table['process'], self.host_id, *processes.values(),
+                                                    processes_id=self.id, **self._unit_options(sample_time)))
+
+    def __call__(self, output) -> bool:
+        try:
+            stdout = output.get('stdout')
+            stderr = output.get('stderr')
+            rc = output.get('rc')
+            assert rc == 0, f"Last {self.__class__.__name__} ended with rc: {rc}\n{stderr}"
+            sample_time, since_boot, system_entries, processes = None, False, [], {}
+            for line in stdout.splitlines():
+                if line == 'SEP':
+                    if sample_time is not None and not since_boot:
+                        self._emit(sample_time, system_entries, processes)
+                    sample_time, since_boot, system_entries, processes = None, False, [], {}
+                    continue
+                if line == 'RESET':
+                    since_boot = True
+                    continue
+                cells = line.split(None, 6)
+                if len(cells) < 7:
+                    continue
+                label, _host, _epoch, date_, time_, interval, data_ = cells
+                sample_time = f"{date_} {time_}"
+                if label in PARSEABLE_SYSTEM_SPECS:
+                    system_entries.append((label, int(interval), data_.split()))
+                elif label in PARSEABLE_PROCESS_LABELS:
+                    match = PARSEABLE_PROCESS_REGEX.match(data_)
+                    if match is None:
+                        continue
+                    pid, name, _state, fields = match.groups()
+                    processes.setdefault(pid, (int(pid), name, int(interval), {}))[-1][label] = fields.split()
+            if sample_time is not None and not since_boot:
+                self._emit(sample_time, system_entries, processes)
+        except Exception as e:
+            f, li = get_error_info()
+            logger.error(
+                f"{self.__class__.__name__}: Unexpected error: {type(e).__name__}: {e}; File: {f}:{li}")
+        else:
+            return True
+        return False
+
+
+def monitored_processes(plugin_id):
+    return [name for name, info in ProcessMonitorRegistry()[plugin_id].items() if info.get('active', False)]
+
+
+class aTopReadWindow(plugins.Variable):
+    def __init__(self, parser: aTopParser, date_format):
+        """
+        Read window of atop raw file rendered per poll: from last sample ingested by parser up to now
+        Remote filter of parseable output (processes currently monitored & samples not ingested yet) as well
+        Host time format without date (hh:mm): window not bounded by end (-e earlier than -b over midnight) and
+        restarted from midnight once day changed on host
+        :param date_format: atop -b/-e time format supported on host
+        """
+        super().__init__()
+        self._parser = parser
+        self._date_format = date_format
+        self._dated = '%d' in date_format
+
+    def __call__(self, output):
+        pass
+
+    @property
+    def result(self):
+        last_sample = self._parser.last_sample
+        if last_sample is None:
+            begin = f"`date +{self._date_format}`"
+        elif self._dated:
+            begin = last_sample.strftime(self._date_format)
+        else:
+            begin = f"`[ $(date +%Y%m%d) = {last_sample.strftime('%Y%m%d')} ] && " \
+                    f"echo {last_sample.strftime(self._date_format)} || " \
+                    f"echo {datetime.combine(last_sample, datetime.min.time()).strftime(self._date_format)}`"
+        return {'begin': begin,
+                'window': f"-b {begin} -e `date -d '+1 min' +{self._date_format}`" if self._dated else f"-b {begin}",
+                'after': last_sample.strftime(ATOP_TIME_FORMAT) if last_sample else '0',
+                'process_filter': parseable_filter(*monitored_processes(self._parser.id))}
+
+
+class aTopSliceWindow(plugins.Variable):
+    def __init__(self, plugin_id, date_format):
+        """
+        Read window of atop raw file slice (deferred mode); Bounds set by flush per slice
+        Host time format without date (hh:mm): slice read from begin till file end (-e cannot bound it over
+        midnight, nor tell day on multi day capture); Samples outside slice dropped by reader (See bounds)
+        :param date_format: atop -b/-e time format supported on host
+        """
+        super().__init__()
+        self._plugin_id = plugin_id
+        self._date_format = date_format
+        self._dated = '%d' in date_format
+        self._begin: datetime = None
+        self._end: datetime = None
+
+    def set(self, begin: datetime, end: datetime):
+        self._begin, self._end = begin, end
+
+    @staticmethod
+    def split(begin: datetime, till: datetime, chunk: timedelta) -> Iterable[Tuple[datetime, datetime]]:
+        """
+        Slices of chunk length from begin covering till; Slice never cross midnight
+        """
+        while begin <= till:
+            end = min(begin + chunk, datetime.combine(begin.date() + timedelta(days=1), datetime.min.time()))
+            yield begin, end
+            begin = end
+
+    @property
+    def bounds(self) -> Tuple[str, str]:
+        """
+        Slice samples period [begin, end) in DB format
+        """
+        return self._begin.strftime(DB_DATETIME_FORMAT), self._end.strftime(DB_DATETIME_FORMAT)
+
+    def __call__(self, output):
+        pass
 
+    @property
+    def result(self):
+        begin = self._begin.strftime(self._date_format)
+        return {'begin': begin,
+                'window': f"-b {begin} -e {self._end.strftime(self._date_format)}" if self._dated else f"-b {begin}",
+                'after': '0',
+                'process_filter': parseable_filter(*monitored_processes(self._plugin_id))}
+
+
+def _parse_atop_slice(mode: aTopMode, os_family, plugin_id, host_id, stdout):
+    units = []
+    parser_options = dict(host_id=host_id, table={'system': atop_system_level(), 'process': atop_process_level()},
+                          data_handler=units.append, sample_timestamps=True)
+    if mode == aTopMode.Parseable:
+        parser = aTopParseableParser(plugin_id, data_unit=aTopProcesses_Parseable_DataUnit, **parser_options)
+    else:
+        parser = aTopParser(plugin_id, data_unit=process_data_unit_factory(os_family), **parser_options)
+    parser(dict(stdout=stdout, rc=0))
+    return [(unit.timestamp, 'system', [tuple(row) for row in unit.generate_rows()])
+            if isinstance(unit, aTopSystem_DataUnit) else (unit.timestamp, 'process', unit.generate_columns())
+            for unit in units]
+
+
+def parse_atop_slice(mode, os_family, plugin_id, host_id, processes, stdout):
+    """
+    Process pool worker: parse atop output slice to plain (picklable) samples
+    :param mode: aTopMode value
+    :param processes: process names monitored by plugin (Registry not shared with pool processes)
+    :return: list of (sample timestamp, 'system' | 'process', rows (DataMap raw) | columns)
+    """
+    registry = ProcessMonitorRegistry()
+    registry[plugin_id].clear()
+    for name in processes:
+        registry.activate(plugin_id, name)
+    return _parse_atop_slice(aTopMode(mode), os_family, plugin_id, host_id, stdout)
+
+
+class aTopDeferredReader(plugins.Parser):
+    def __init__(self, plugin_id, mode: aTopMode, os_family, window: aTopSliceWindow = None, **kwargs):
+        """
+        Reader of atop raw file slices (deferred mode)
+        Slices parsed by local process pool while next one read from host; Samples ingested in slice order
+        Samples already ingested skipped (slice bounds overlap within minute)
+        :param window: slice window read; Samples outside its bounds at read time dropped [Optional]
+        """
+        plugins.Parser.__init__(self, **kwargs)
+        self.id = plugin_id
+        self._mode = mode
+        self._os_family = os_family
+        self._window = window
+        self._workers = 0
+        self._pool: ProcessPoolExecutor = None
+        self._pending = deque()
+        self._last_sample = {}
+
+    @contextmanager
+    def session(self, workers):
+        """
+        Flush session; Pending slices ingested on exit
+        :param workers: process pool size (Parse in place if less than 2)
+        """
+        self._workers = int(workers)
+        if self._workers > 1:
+            self._pool = ProcessPoolExecutor(self._workers, mp_context=get_context('spawn'))
+        try:
+            yield self
+            while len(self._pending) > 0:
+                self._ingest_pending()
+        finally:
+            self._pending.clear()
+            if self._pool is not None:
+                self._pool.shutdown()
+                self._pool = None
+
+    def _ingest_pending(self):
+        future, bounds = self._pending.popleft()
+        self._ingest(future.result(), bounds)
+
+    def _ingest(self, samples, bounds: Tuple[str, str] = None):
+        system_table, process_table = self.table['system'], self.table['process']
+        data_map_table = services.TableSchemaService().tables.atop_datamap
+        for timestamp, kind, payload in samples:
+            if bounds and not bounds[0] <= timestamp < bounds[1]:
+                continue
+            if timestamp <= self._last_sample.get(kind, ''):
+                continue
+            self._last_sample[kind] = timestamp
+            if kind == 'system':
+                rows = [system_table.template(*row) for row in payload]
+                self.data_handler(services.DataUnit(system_table, *[
+                    row._replace(MAP_REF=services.cache_dimension(data_map_table, row.MAP_REF)) for row in rows],
+                                                    datetime=timestamp))
+            else:
+                self.data_handler(services.ColumnarDataUnit(process_table, columns=payload,
+                                                            constants=dict(HOST_REF=self.host_id),
+                                                            datetime=timestamp))
+
+    def __call__(self, output) -> bool:
+        try:
+            stdout = output.get('stdout')
+            stderr = output.get('stderr')
+            rc = output.get('rc')
+            assert rc == 0, f"Last {self.__class__.__name__} ended with rc: {rc}\n{stderr}"
+            bounds = self._window.bounds if self._window else None
+            if self._pool is None:
+                self._ingest(_parse_atop_slice(self._mode, self._os_family, self.id, self.host_id, stdout), bounds)
+            else:
+                self._pending.append((self._pool.submit(parse_atop_slice, self._mode.value, self._os_family,
+                                                        self.id, self.host_id, monitored_processes(self.id), stdout),
+                                      bounds))
+                while len(self._pending) > self._workers:
+                    self._ingest_pending()
         except Exception as e:
             f, li = get_error_info()
             logger.error(
@@ -421,6 +930,10 @@ class aTop(plugins.SSH_PlugInAPI):
                 self._os_name = self._get_os_name(ssh)
 
             self._name = f"{self.name}-{self._os_name}"
+            self._deferred = is_truthy(self.options.get('deferred', False))
+            self._chunk = timestr_to_secs(self.options.get('chunk', '1h'))
+            self._workers = int(self.options.get('workers', os.cpu_count() or 1))
+            self._flush_from: datetime = None
 
             self.set_commands(plugins.FlowCommands.Setup,
                               plugins.SSHLibraryCommand(SSHLibrary.execute_command, 'killall -9 atop',
@@ -433,27 +946,51 @@ class aTop(plugins.SSH_PlugInAPI):
                                                         sudo_password=self.sudo_password_expected),
                               plugins.SSHLibraryCommand(SSHLibrary.start_command,
                                                         "{nohup} atop -a -w {folder}/{file} {interval} &".format(
-                                                            nohup='' if self.persistent else 'nohup',
+                                                            nohup='' if self.persistent and not self.deferred
+                                                            else 'nohup',
                                                             folder=self.folder,
                                                             file=self.file,
                                                             interval=int(self.interval)),
                                                         sudo=self.sudo_expected,
                                                         sudo_password=self.sudo_password_expected))
 
-            self.set_commands(plugins.FlowCommands.Command,
-                              plugins.SSHLibraryCommand(
-                                  SSHLibrary.execute_command,
-                                  f"atop -a -r {self.folder}/{self.file} -b `date +{self.OS_DATE_FORMAT[self.os_name]}`",
-                                  sudo=True, sudo_password=True, return_rc=True, return_stderr=True,
-                                  parser=aTopParser(self.id,
-                                                    host_id=self.host_id,
-                                                    table={
-                                                        'system': self.affiliated_tables()[0],
-                                                        'process': self.affiliated_tables()[1]
-                                                    },
-                                                    data_handler=self._data_handler, counter=self.iteration_counter,
-                                                    interval=self.parameters.interval,
-                                                    data_unit=process_data_unit_factory(self._os_name))))
+            self._mode = aTopMode(self.options.get('mode', aTopMode.Batch.value))
+            parser_options = dict(host_id=self.host_id,
+                                  table={
+                                      'system': self.affiliated_tables()[0],
+                                      'process': self.affiliated_tables()[1]
+                                  },
+                                  data_handler=self._data_handler, counter=self.iteration_counter,
+                                  interval=self.parameters.interval)
+            if self._mode == aTopMode.Parseable:
+                labels = ','.join(PARSEABLE_SYSTEM_LABELS + PARSEABLE_PROCESS_LABELS)
+                command = f"atop -a -r {self.folder}/{self.file} -P {labels} {{window}} " \
+                          f"{PARSEABLE_REMOTE_FILTER}"
+            else:
+                command = f"atop -a -r {self.folder}/{self.file} {{window}}"
+            if self.deferred:
+                self._slice_window = aTopSliceWindow(self.id, self.OS_DATE_FORMAT[self.os_name])
+                self._reader = aTopDeferredReader(self.id, self._mode, self._os_name, window=self._slice_window,
+                                                  **parser_options)
+                self._flush_command = plugins.SSHLibraryCommand(SSHLibrary.execute_command, command,
+                                                                sudo=True, sudo_password=True, return_rc=True,
+                                                                return_stderr=True,
+                                                                variable_getter=self._slice_window,
+                                                                parser=self._reader)
+            else:
+                if self._mode == aTopMode.Parseable:
+                    parser = aTopParseableParser(self.id, data_unit=aTopProcesses_Parseable_DataUnit,
+                                                 **parser_options)
+                else:
+                    parser = aTopParser(self.id, data_unit=process_data_unit_factory(self._os_name),
+                                        **parser_options)
+                command = plugins.SSHLibraryCommand(SSHLibrary.execute_command, command,
+                                                    sudo=True, sudo_password=True, return_rc=True,
+                                                    return_stderr=True,
+                                                    variable_getter=aTopReadWindow(parser,
+                                                                                   self.OS_DATE_FORMAT[self.os_name]),
+                                                    parser=parser)
+                self.set_commands(plugins.FlowCommands.Command, command)
 
             self.set_commands(plugins.FlowCommands.Teardown,
                               plugins.SSHLibraryCommand(SSHLibrary.execute_command, 'killall -9 atop',
@@ -466,6 +1003,69 @@ class aTop(plugins.SSH_PlugInAPI):
     def os_name(self):
         return self._os_name
 
+    @property
+    def mode(self) -> aTopMode:
+        return self._mode
+
+    @property
+    def deferred(self):
+        return self._deferred
+
+    @property
+    def is_alive(self):
+        if self.deferred:
+            return self._flush_from is not None
+        return super().is_alive
+
+    @staticmethod
+    def _get_remote_time(ssh_client: SSHLibrary) -> datetime:
+        out, err, rc = ssh_client.execute_command("date +%Y%m%d%H%M", return_rc=True, return_stderr=True)
+        assert rc == 0, f"Cannot occur host time: {err}"
+        return datetime.strptime(out.strip(), '%Y%m%d%H%M')
+
+    def start(self):
+        if not self.deferred:
+            return super().start()
+        assert not self.parameters.event.isSet(), f"Start blocked by external request"
+        with self.on_connection() as ssh:
+            self._run_command(ssh, self.flow_type.Setup)
+            self._flush_from = self._get_remote_time(ssh)
+            logger.info(f"Host {self}: Setup completed; Data ingested on flush only", also_console=True)
+
+    def stop(self, timeout=None):
+        if not self.deferred:
+            return super().stop(timeout)
+        self.flush_plugin()
+        with self.on_connection() as ssh:
+            self._run_command(ssh, self.flow_type.Teardown)
+            logger.info(f"Host {self}: Teardown completed", also_console=True)
+        self._flush_from = None
+
+    def flush_plugin(self, *args, **kwargs):
+        """
+        Flush aTop plugin (deferred mode): read atop raw file collected since last flush in time slices;
+        Slices split at midnight & parsed by local process pool
+
+        Arguments:
+        - chunk:    slice length (Default: plugin 'chunk' option)
+        - workers:  process pool size (Default: plugin 'workers' option)
+        """
+        if not self.deferred:
+            return super().flush_plugin(*args, **kwargs)
+        if self._flush_from is None:
+            logger.warn(f"PlugIn '{self}' not started; Nothing to flush")
+            return
+        chunk = timedelta(seconds=timestr_to_secs(kwargs.get('chunk', self._chunk)))
+        workers = int(kwargs.get('workers', self._workers))
+        with self.on_connection() as ssh:
+            till = self._get_remote_time(ssh)
+            with self._reader.session(workers):
+                for begin, end in aTopSliceWindow.split(self._flush_from, till, chunk):
+                    self._slice_window.set(begin, end)
+                    self._flush_command(ssh, **self.parameters)
+            self._flush_from = till
+            logger.info(f"Host {self}: Flush completed (till {till.strftime(DB_DATETIME_FORMAT)})")
+
     def _get_os_name(self, ssh_client: SSHLibrary):
         out, err, rc = ssh_client.execute_command("cat /etc/os-release|grep -E '^ID_LIKE='|awk -F'=' '{print$2}'",
                                                   return_rc=True, return_stderr=True)
@@ -515,7 +1115,9 @@ class aTop(plugins.SSH_PlugInAPI):
 
     @staticmethod
     def affiliated_tables() -> Iterable[model.Table]:
-        return atop_system_level(), atop_process_level()
+        return atop_system_level(), atop_process_level(), \
+            db.RollupTable(atop_system_level(), 'Type', 'MAP_REF', 'SUB_ID'), \
+            db.RollupTable(atop_process_level(), 'PID', 'CMD'), atop_datamap()
 
     @staticmethod
     def affiliated_charts() -> Iterable[plugins.ChartAbstract]:
@@ -23,6 +23,8 @@ __doc__ = """
     - tolerance:  int; Count of errors allowed before test will be terminated (Default: 0)
                         
                         -1 - errors will be ignored, just logged 
+    - output_storage: lines | zlib | lzma; Output stored as deduplicated lines or compressed blocks (Default: lines)
+    - output_dictionary: bool; Compress outputs with dictionary shared across plugin outputs (zlib only)
     
     *   Support several values separated by '|'
     **  Support several values separated by '|' or '&' for OR and AND accordingly
@@ -58,6 +60,7 @@ class UserCommandParser(Parser):
         super().__init__(table=services.TableSchemaService().tables.sshlibrary_monitor, **kwargs)
         self._tolerance = self.options.get('tolerance')
         self._tolerance_counter = 0
+        self._output_storage = services.output_storage_options(self.options.get('name'), **self.options)
 
     def __call__(self, output: dict) -> bool:
         out = output.get('stdout', None)
@@ -94,7 +97,7 @@ class UserCommandParser(Parser):
         else:
             st = 'Pass'
             msg = 'Output:\n\t{}'.format('\n\t'.join(total_output.splitlines()))
-        output_ref = services.CacheLines().upload(msg)
+        output_ref = services.CacheLines().upload(msg, **self._output_storage)
         du = services.data_factory(self.table,
                                    self.table.template(self.host_id, None, self.options.get('command'), rc, st,
                                                        output_ref))
@@ -52,6 +52,8 @@ __doc__ = """
     - return_stdout: bool -> if true output store to cache in DB
     - sudo: True if sudo required, False if omitted (Optional)
     - sudo_password: True if password required for sudo, False if omitted (Optional)
+    - output_storage: lines | zlib | lzma; stdout stored as deduplicated lines or compressed blocks (Default: lines)
+    - output_dictionary: bool; Compress outputs with dictionary shared across command outputs (zlib only)
 
       On plugin start sudo and sudo_password will be replace with sudo password provided for connection module
 
@@ -143,6 +145,10 @@ class TimeChart(ChartAbstract):
     def file_name(self) -> str:
         return "{name}.png"
 
+    @property
+    def source_table(self) -> str:
+        return self._table.name
+
     @property
     def get_sql_query(self) -> str:
         return """
@@ -182,6 +188,10 @@ class TimeChart(ChartAbstract):
 
 
 class TimeParser(Parser):
+    def __init__(self, **parameters):
+        super().__init__(**parameters)
+        self._output_storage = services.output_storage_options(self.options.get('Command'), **self.options)
+
     def __call__(self, outputs, datetime=None) -> bool:
         command_out = outputs.get('stdout', None)
         time_output = outputs.get('stderr', None)
@@ -201,7 +211,8 @@ class TimeParser(Parser):
             logger.info(f"Command: {row_dict.get('Command')} [Rc: {row_dict.get('Rc')}]")
 
             row = self.table.template(self.host_id, None, *tuple(list(row_dict.values()) + [-1]))
-            du = services.DataUnit(self.table, row, output=command_out, datetime=datetime)
+            du = services.data_factory(self.table, row, output=command_out, datetime=datetime,
+                                       **self._output_storage)
             # du = self.data_handler(self.table, row, output=command_out, datetime=datetime)
 
             self.data_handler(du)
@@ -294,12 +305,14 @@ class Time(SSH_PlugInAPI):
         if self.options.get('rc', None) is not None:
             assert self.options.get('return_rc'), "For verify RC argument 'return_rc' must be provided"
 
+        output_storage = {k: self.options.get(k) for k in ('output_storage', 'output_dictionary')}
         if self.persistent:
             self.set_commands(FlowCommands.Command,
                               TimeStartCommand(self._command, **self.options),
                               TimeReadOutput(parser=TimeParser(host_id=self.host_id,
                                                                table=self.affiliated_tables()[0],
-                                                               data_handler=self.data_handler, Command=self.name),
+                                                               data_handler=self.data_handler, Command=self.name,
+                                                               **output_storage),
                                              **self.options))
         else:
             time_write_script = TIME_BG_SCRIPT.format(
@@ -371,7 +384,8 @@ class Time(SSH_PlugInAPI):
                                                 parser=TimeCachedParser(host_id=self.host_id,
                                                                         table=self.affiliated_tables()[0],
                                                                         data_handler=self.data_handler,
-                                                                        Command=self.name)))
+                                                                        Command=self.name,
+                                                                        **output_storage)))
 
     @property
     def kwargs_info(self) -> dict:
@@ -397,7 +411,7 @@ class Time(SSH_PlugInAPI):
 
     @staticmethod
     def affiliated_tables() -> Iterable[model.Table]:
-        return TimeMeasurement(),
+        return TimeMeasurement(), db.RollupTable(TimeMeasurement(), 'Command')
 
     @staticmethod
     def affiliated_charts() -> Iterable[ChartAbstract]:
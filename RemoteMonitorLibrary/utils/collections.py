@@ -1,12 +1,14 @@
-from threading import RLock
-from typing import Any
+from bisect import bisect_left
+from collections import OrderedDict
+from contextlib import contextmanager
+from enum import Enum
+from queue import Queue, Empty, Full
+from threading import RLock, Condition
+from time import monotonic
+from typing import Any, Callable
 from RemoteMonitorLibrary.utils.logger_helper import logger
 
 
-class Empty(Exception):
-    pass
-
-
 class tsQueue(list):
     def __init__(self, get_limit=10):
         self._get_limit = get_limit
@@ -52,3 +54,244 @@ class CacheList(list):
             while len(self) >= self._max_size:
                 self.pop(0)
             super().append(item)
+
+
+class OverflowPolicy(Enum):
+    Block = 'block'
+    DropOldest = 'drop_oldest'
+    Spill = 'spill'
+
+
+class DataQueue(Queue):
+    """
+    Bounded blocking queue with configurable overflow policy:
+    - block:        producer waits till free slot available
+    - drop_oldest:  oldest item removed from queue & passed to overflow handler
+    - spill:        new item passed to overflow handler (f.e. journal on disk) instead of enqueue
+
+    Queue closing wake up all waiting consumers & producers
+    """
+    def __init__(self, maxsize=0, policy: OverflowPolicy = OverflowPolicy.Block,
+                 overflow_handler: Callable[[Any], None] = None):
+        super().__init__(maxsize)
+        self._policy = OverflowPolicy(policy)
+        assert self._policy == OverflowPolicy.Block or overflow_handler, \
+            f"Overflow handler required for policy '{self._policy.value}'"
+        self._overflow_handler = overflow_handler
+        self._closed = False
+        self._high_water_mark = 0
+        self._overflow_count = 0
+
+    @property
+    def policy(self):
+        return self._policy
+
+    @property
+    def high_water_mark(self):
+        return self._high_water_mark
+
+    @property
+    def overflow_count(self):
+        return self._overflow_count
+
+    @property
+    def closed(self):
+        return self._closed
+
+    def close(self):
+        with self.mutex:
+            self._closed = True
+            self.not_empty.notify_all()
+            self.not_full.notify_all()
+
+    def _put(self, item):
+        super()._put(item)
+        if self._qsize() > self._high_water_mark:
+            self._high_water_mark = self._qsize()
+
+    def put(self, item, block=True, timeout=None):
+        overflow_item = None
+        with self.not_full:
+            if self._closed:
+                raise Full("Queue closed")
+            if 0 < self.maxsize <= self._qsize():
+                if self._policy == OverflowPolicy.Block:
+                    end_ts = None if timeout is None else monotonic() + timeout
+                    while self._qsize() >= self.maxsize and not self._closed:
+                        remaining = None if end_ts is None else end_ts - monotonic()
+                        if not block or (remaining is not None and remaining <= 0):
+                            raise Full
+                        self.not_full.wait(remaining)
+                    if self._closed:
+                        raise Full("Queue closed")
+                else:
+                    self._overflow_count += 1
+                    if self._policy == OverflowPolicy.DropOldest:
+                        overflow_item = self._get()
+                    else:
+                        overflow_item, item = item, None
+            if item is not None:
+                self._put(item)
+                self.unfinished_tasks += 1
+                self.not_empty.notify()
+        if overflow_item is not None:
+            self._overflow_handler(overflow_item)
+
+    def get(self, block=True, timeout=None):
+        with self.not_empty:
+            end_ts = None if timeout is None else monotonic() + timeout
+            while not self._qsize():
+                if self._closed or not block:
+                    raise Empty
+                remaining = None if end_ts is None else end_ts - monotonic()
+                if remaining is not None and remaining <= 0:
+                    raise Empty
+                self.not_empty.wait(remaining)
+            item = self._get()
+            self.not_full.notify()
+            return item
+
+
+class LRUCache:
+    def __init__(self, max_size=1000):
+        """
+        Bounded thread-safe key-value cache; least recently used entries evicted first
+        :param max_size: max entries count
+        """
+        self._max_size = max_size
+        self._data = OrderedDict()
+        self._lock = RLock()
+        self._hits = 0
+        self._misses = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            try:
+                value = self._data[key]
+            except KeyError:
+                self._misses += 1
+                return default
+            self._data.move_to_end(key)
+            self._hits += 1
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self._max_size:
+                self._data.popitem(last=False)
+
+    def update(self, items):
+        for key, value in items:
+            self.put(key, value)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._hits = self._misses = 0
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def __len__(self):
+        return len(self._data)
+
+    @property
+    def hit_ratio(self):
+        total = self._hits + self._misses
+        return self._hits / total if total else 0.0
+
+    @property
+    def statistics(self):
+        return dict(size=len(self), max_size=self._max_size, hits=self._hits, misses=self._misses,
+                    hit_ratio=round(self.hit_ratio, 3))
+
+
+class Histogram:
+    def __init__(self, *bounds):
+        """
+        Fixed buckets histogram; Constant cost per value, no samples kept
+        :param bounds: buckets upper bounds (inclusive); Values above last bound counted in overflow bucket
+        """
+        assert len(bounds) > 0, "Histogram bounds not provided"
+        self._bounds = tuple(sorted(bounds))
+        self._counts = [0] * (len(self._bounds) + 1)
+        self._count = 0
+        self._total = 0.0
+        self._max = 0.0
+
+    def add(self, value):
+        self._counts[bisect_left(self._bounds, value)] += 1
+        self._count += 1
+        self._total += value
+        if value > self._max:
+            self._max = value
+
+    def __len__(self):
+        return self._count
+
+    @property
+    def mean(self):
+        return self._total / self._count if self._count else 0.0
+
+    def percentile(self, percent):
+        """
+        Upper bound of bucket percentile value fall into (Max value for overflow bucket)
+        """
+        if self._count == 0:
+            return 0.0
+        rank, accumulated = self._count * percent / 100, 0
+        for bound, count in zip(self._bounds, self._counts):
+            accumulated += count
+            if accumulated >= rank:
+                return min(bound, self._max)
+        return self._max
+
+    @property
+    def buckets(self):
+        labels = [f"<={b}" for b in self._bounds] + [f">{self._bounds[-1]}"]
+        return {label: count for label, count in zip(labels, self._counts) if count}
+
+    @property
+    def statistics(self):
+        return dict(count=self._count, mean=round(self.mean, 3), max=round(self._max, 3),
+                    p50=round(self.percentile(50), 3), p95=round(self.percentile(95), 3),
+                    p99=round(self.percentile(99), 3), buckets=self.buckets)
+
+
+class PriorityLock:
+    def __init__(self, lock: RLock = None):
+        """
+        Lock wrapper granting priority holders access ahead of bulk holders
+        Bulk holder waits while priority holders pending; Priority holder waits for current bulk holder only
+        :param lock: guarded lock (New RLock if omitted)
+        """
+        self._lock = lock or RLock()
+        self._condition = Condition()
+        self._pending = 0
+
+    @property
+    def pending(self):
+        return self._pending
+
+    @contextmanager
+    def priority(self):
+        with self._condition:
+            self._pending += 1
+        try:
+            with self._lock:
+                yield
+        finally:
+            with self._condition:
+                self._pending -= 1
+                if self._pending == 0:
+                    self._condition.notify_all()
+
+    @contextmanager
+    def bulk(self):
+        with self._condition:
+            while self._pending > 0:
+                self._condition.wait()
+        with self._lock:
+            yield
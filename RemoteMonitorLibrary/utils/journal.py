@@ -0,0 +1,141 @@
+import os
+import pickle
+from threading import RLock
+from typing import Iterator, Tuple, Any
+
+from RemoteMonitorLibrary.utils.logger_helper import logger
+
+JOURNAL_EXT = '.journal'
+
+
+class DataJournal:
+    def __init__(self, path):
+        """
+        Append only on-disk journal for SQL statements not written into DB yet
+        :param path: journal file path
+        """
+        self._path = path
+        self._lock = RLock()
+        self._count = 0
+        self._read_offset = 0
+
+    @property
+    def path(self):
+        return self._path
+
+    @property
+    def _replay_path(self):
+        return f"{self._path}.replay"
+
+    @property
+    def _offset_path(self):
+        return f"{self._replay_path}.offset"
+
+    @property
+    def dead_letter_path(self):
+        """
+        Entries failed on replay; Kept for inspection (Same format as journal)
+        """
+        return f"{self._path}.dead"
+
+    def __len__(self):
+        return self._count
+
+    @property
+    def exists(self):
+        return any(os.path.exists(p) and os.path.getsize(p) > 0 for p in (self._path, self._replay_path))
+
+    def append(self, sql: str, rows):
+        with self._lock:
+            with open(self._path, 'ab') as writer:
+                pickle.dump((sql, rows), writer, protocol=pickle.HIGHEST_PROTOCOL)
+            self._count += 1
+
+    def extend(self, entries: Iterator[Tuple[str, Any]]):
+        """
+        Append several (sql, rows) entries within single file write session
+        :return: entries count appended
+        """
+        count = 0
+        with self._lock:
+            with open(self._path, 'ab') as writer:
+                for sql, rows in entries:
+                    pickle.dump((sql, rows), writer, protocol=pickle.HIGHEST_PROTOCOL)
+                    count += 1
+            self._count += count
+        return count
+
+    def discard(self):
+        """
+        Remove journal with all pending entries
+        """
+        with self._lock:
+            for path in (self._path, self._replay_path, self._offset_path):
+                if os.path.exists(path):
+                    os.remove(path)
+            self._count = 0
+
+    def dead_letter(self, entry: Tuple[str, Any]):
+        with self._lock:
+            with open(self.dead_letter_path, 'ab') as writer:
+                pickle.dump(entry, writer, protocol=pickle.HIGHEST_PROTOCOL)
+
+    def _saved_offset(self):
+        try:
+            with open(self._offset_path) as reader:
+                return int(reader.read().strip() or 0)
+        except (OSError, ValueError):
+            return 0
+
+    def replay(self) -> Iterator[Tuple[str, Any]]:
+        """
+        Yield journal entries (sql, rows) in order of appending; Replay resumed from last checkpoint
+        Consumer call checkpoint once entries yielded so far committed; Entries appended during replay kept for next one
+        """
+        with self._lock:
+            if not os.path.exists(self._replay_path):
+                if not os.path.exists(self._path):
+                    return
+                os.replace(self._path, self._replay_path)
+                self._count = 0
+                if os.path.exists(self._offset_path):
+                    os.remove(self._offset_path)
+        with open(self._replay_path, 'rb') as reader:
+            reader.seek(self._saved_offset())
+            self._read_offset = reader.tell()
+            while True:
+                try:
+                    entry = pickle.load(reader)
+                except EOFError:
+                    break
+                except Exception as e:
+                    logger.warn(f"Journal '{self._replay_path}' truncated entry moved to "
+                                f"'{self.dead_letter_path}': {e}")
+                    reader.seek(self._read_offset)
+                    with open(self.dead_letter_path, 'ab') as writer:
+                        writer.write(reader.read())
+                    self._read_offset = reader.tell()
+                    break
+                self._read_offset = reader.tell()
+                yield entry
+
+    def checkpoint(self):
+        """
+        Entries yielded by replay so far committed; Replay file removed once all its entries committed
+        """
+        with self._lock:
+            if not os.path.exists(self._replay_path):
+                return
+            if self._read_offset >= os.path.getsize(self._replay_path):
+                os.remove(self._replay_path)
+                if os.path.exists(self._offset_path):
+                    os.remove(self._offset_path)
+                return
+            with open(self._offset_path, 'w') as writer:
+                writer.write(f"{self._read_offset}")
+
+
+__all__ = [
+    'DataJournal',
+    'JOURNAL_EXT'
+]
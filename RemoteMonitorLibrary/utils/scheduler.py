@@ -0,0 +1,93 @@
+import heapq
+from itertools import count
+from threading import Condition, Thread
+from time import monotonic
+from typing import Callable
+
+from RemoteMonitorLibrary.utils.singleton import Singleton
+from RemoteMonitorLibrary.utils.sys_utils import get_error_info
+from RemoteMonitorLibrary.utils.logger_helper import logger
+
+
+class ScheduledCall:
+    def __init__(self, deadline, callback: Callable, *args):
+        self.deadline = deadline
+        self._callback = callback
+        self._args = args
+
+    @property
+    def cancelled(self):
+        return self._callback is None
+
+    def cancel(self):
+        """
+        Cancel pending call; Callback & arguments released immediately
+        """
+        self._callback, self._args = None, ()
+
+    def __call__(self):
+        callback, args = self._callback, self._args
+        self.cancel()
+        if callback is not None:
+            callback(*args)
+
+
+@Singleton
+class TimeoutScheduler:
+    def __init__(self):
+        """
+        Single thread serving all delayed calls (timeouts) ordered by deadline
+        Thread started on first schedule
+        """
+        self._condition = Condition()
+        self._heap = []
+        self._sequence = count()
+        self._thread: Thread = None
+
+    def __len__(self):
+        with self._condition:
+            return len([e for e in self._heap if not e[-1].cancelled])
+
+    def schedule(self, delay, callback: Callable, *args) -> ScheduledCall:
+        """
+        Schedule callback(*args) after delay
+        :param delay: seconds
+        :return: handle allow cancel call
+        """
+        call = ScheduledCall(monotonic() + float(delay), callback, *args)
+        with self._condition:
+            heapq.heappush(self._heap, (call.deadline, next(self._sequence), call))
+            if self._heap[0][-1] is call:
+                self._condition.notify()
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = Thread(name=self.__class__.__name__, target=self._run, daemon=True)
+                self._thread.start()
+        return call
+
+    def _next_due(self):
+        with self._condition:
+            while True:
+                while len(self._heap) > 0 and self._heap[0][-1].cancelled:
+                    heapq.heappop(self._heap)
+                if len(self._heap) == 0:
+                    self._condition.wait()
+                    continue
+                remaining = self._heap[0][0] - monotonic()
+                if remaining <= 0:
+                    return heapq.heappop(self._heap)[-1]
+                self._condition.wait(remaining)
+
+    def _run(self):
+        while True:
+            call = self._next_due()
+            try:
+                call()
+            except Exception as e:
+                f, l = get_error_info()
+                logger.error(f"Scheduled call failed: {e}; File: {f}:{l}")
+
+
+__all__ = [
+    'TimeoutScheduler',
+    'ScheduledCall'
+]
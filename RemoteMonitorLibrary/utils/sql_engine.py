@@ -1,28 +1,134 @@
+import atexit
 import logging
+import multiprocessing
 import os
 import sqlite3
-from threading import RLock
-from typing import List
+from concurrent.futures import Future
+from contextlib import contextmanager
+from itertools import count
+from queue import Queue, Empty
+from threading import RLock, Thread, local
+from typing import List, Callable, Mapping, Any, Tuple
 
 DEFAULT_DB_FILE = ":memory:"
+DEFAULT_READ_POOL_SIZE = 3
+DEFAULT_STATEMENT_CACHE_SIZE = 256
 DB_DATETIME_FORMAT = "%Y-%m-%d %H:%M:%S"
 CREATE_TABLE_TEMPLATE = """CREATE TABLE IF NOT EXISTS {name} ({columns} {foreign_keys})"""
 SELECT_TABLE = "SELECT {fields} FROM {table}"
 SELECT_TABLE_WHERE = "SELECT {fields} FROM {table} WHERE {expression}"
-INSERT_TABLE_TEMPLATE = "INSERT INTO {table} VALUES ({values})"
+INSERT_TABLE_TEMPLATE = "INSERT {conflict}INTO {table} VALUES ({values})"
 UPDATE_TABLE_TEMPLATE = "UPDATE {table}\nSET {columns}\nWHERE {where}"
 FOREIGN_KEY_TEMPLATE = "FOREIGN KEY({local_field}) REFERENCES {foreign_table}({foreign_field})"
+CREATE_INDEX_TEMPLATE = "CREATE {unique}INDEX IF NOT EXISTS {name} ON {table} ({fields})"
+
+
+class StatementCache:
+    def __init__(self):
+        """
+        SQL text rendered once per table & statement shape
+        Stable statement text let sqlite reuse compiled statements (sqlite3 cached_statements)
+        """
+        self._statements = {}
+        self._lock = RLock()
+        self._hits = 0
+        self._misses = 0
+
+    def get(self, table_name, key, render: Callable[[], str]):
+        try:
+            sql = self._statements[table_name][key]
+        except KeyError:
+            with self._lock:
+                self._misses += 1
+                sql = self._statements.setdefault(table_name, {}).setdefault(key, render())
+        else:
+            self._hits += 1
+        return sql
+
+    def invalidate(self, table_name=None):
+        with self._lock:
+            if table_name is None:
+                self._statements.clear()
+            else:
+                self._statements.pop(table_name, None)
+
+    @property
+    def statistics(self):
+        return dict(tables=len(self._statements), statements=sum(len(s) for s in self._statements.values()),
+                    hits=self._hits, misses=self._misses)
+
+
+statement_cache = StatementCache()
+
+
+class ReadConnectionPool:
+    def __init__(self, db_path, size=DEFAULT_READ_POOL_SIZE):
+        """
+        Pool of read only connections; Connections opened on demand up to pool size
+        :param db_path: DB file path
+        :param size: max connections count
+        """
+        self._db_path = db_path
+        self._size = size
+        self._lock = RLock()
+        self._opened = []
+        self._idle = Queue()
+
+    def _open(self):
+        return sqlite3.connect(f"file:{self._db_path}?mode=ro", uri=True, check_same_thread=False,
+                               cached_statements=DEFAULT_STATEMENT_CACHE_SIZE)
+
+    def _connect(self):
+        conn = self._open()
+        self._opened.append(conn)
+        return conn
+
+    @contextmanager
+    def connection(self):
+        try:
+            conn = self._idle.get_nowait()
+        except Empty:
+            with self._lock:
+                conn = self._connect() if len(self._opened) < self._size else None
+            if conn is None:
+                conn = self._idle.get()
+        try:
+            yield conn
+        finally:
+            self._idle.put(conn)
+
+    @contextmanager
+    def stream(self):
+        """
+        Dedicated read only connection (Out of pool) for streamed query; Closed on exit
+        Slow or abandoned iterators never hold pooled connections
+        """
+        conn = self._open()
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    def close(self):
+        with self._lock:
+            while len(self._opened) > 0:
+                self._opened.pop().close()
+            self._idle = Queue()
 
 
 class SQL_DB:
-    def __init__(self, location=None, file_name=None, cumulative=False, logger=logging):
+    def __init__(self, location=None, file_name=None, cumulative=False, logger=logging,
+                 read_pool_size=DEFAULT_READ_POOL_SIZE):
         self._logger = logger
         self._lock = RLock()
         self._db_path = DEFAULT_DB_FILE
         self._conn = None
         self._cursor = None
         self._is_new = False
+        self._read_pool: ReadConnectionPool = None
         self._init_db_connection(location, file_name, cumulative)
+        if self._db_path != DEFAULT_DB_FILE and read_pool_size > 0:
+            self._read_pool = ReadConnectionPool(self._db_path, read_pool_size)
         self._table_cache = []
 
     def table_exist(self, name):
@@ -53,7 +159,12 @@ class SQL_DB:
                 if self._clear_db(self._db_path):
                     self.is_new = True
 
-        self._conn = sqlite3.connect(self._db_path, check_same_thread=False)
+        self._conn = sqlite3.connect(self._db_path, check_same_thread=False,
+                                     cached_statements=DEFAULT_STATEMENT_CACHE_SIZE)
+        if self._db_path != DEFAULT_DB_FILE:
+            # WAL allow readers work concurrently with single writer
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute('PRAGMA synchronous=NORMAL')
         self._cursor = self._conn.cursor()
 
     def _clear_db(self, path):
@@ -93,6 +204,75 @@ class SQL_DB:
             _result = self._cursor.fetchall()
             return _result
 
+    def execute_batch(self, statements: List):
+        """
+        Execute several statements within single transaction (one commit for all)
+        :param statements: list of (sql, rows) pairs; rows - list for executemany, tuple for single execute
+        :return: list of per statement results (same order as statements)
+        """
+        _results = []
+        with self._lock:
+            try:
+                for sql, rows in statements:
+                    if isinstance(rows, list):
+                        self._cursor.executemany(sql, rows)
+                    elif rows:
+                        self._cursor.execute(sql, rows)
+                    else:
+                        self._cursor.execute(sql)
+                    _results.append(self._cursor.fetchall())
+                self._conn.commit()
+            except Exception:
+                self._conn.rollback()
+                raise
+            return _results
+
+    def execute_batch_async(self, statements: List) -> Future:
+        """
+        Same as execute_batch; Returned future resolved with per statement results or failure raised
+        (Resolved immediately here; Writer process pipeline batches & resolve once written)
+        """
+        future = Future()
+        try:
+            future.set_result(self.execute_batch(statements))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+    def query(self, sql: str, *args):
+        """
+        Execute read only query on separate connection (doesn't block writer)
+        In memory DB served by writer connection
+        """
+        if self._read_pool is None:
+            return self.execute(sql, *args)
+        with self._read_pool.connection() as conn:
+            return conn.execute(sql, args).fetchall()
+
+    def iterate(self, sql: str, *args):
+        """
+        Stream read only query results row by row (Not fetched at once)
+        Dedicated read connection (not pooled one) held by generator till exhausted or closed;
+        Callers not consuming all rows must close generator (i.e. contextlib.closing) to release it
+        In memory DB results fetched by writer connection
+        """
+        if self._read_pool is None:
+            yield from self.execute(sql, *args)
+            return
+        with self._read_pool.stream() as conn:
+            yield from conn.execute(sql, args)
+
+    @property
+    def lock(self):
+        """
+        Writer lock; Hold it for statements sequence must not interleave with other writers
+        """
+        return self._lock
+
+    @property
+    def statement_cache(self) -> StatementCache:
+        return statement_cache
+
     @property
     def get_last_row_id(self):
         return self._cursor.lastrowid
@@ -102,11 +282,157 @@ class SQL_DB:
         return self.execute(sql)
 
     def close(self):
+        if self._read_pool:
+            self._read_pool.close()
         self._conn.commit()
         self._conn.close()
         self._conn = None
 
 
+def _writer_process_main(conn, location, file_name, cumulative):
+    try:
+        db = SQL_DB(location, file_name, cumulative, read_pool_size=0)
+    except Exception as e:
+        conn.send((None, False, e))
+        return
+    conn.send((None, True, (db.db_file, db.is_new)))
+    while True:
+        try:
+            request_id, op, payload = conn.recv()
+        except EOFError:
+            break
+        if op == 'close':
+            break
+        try:
+            if op == 'batch':
+                result = db.execute_batch(payload)
+            else:
+                sql, args = payload
+                result = db.execute(sql, *args)
+            conn.send((request_id, True, (result, db.get_last_row_id)))
+        except Exception as e:
+            try:
+                conn.send((request_id, False, e))
+            except Exception:
+                conn.send((request_id, False, RuntimeError(f"{type(e).__name__}: {e}")))
+    db.close()
+    conn.close()
+
+
+class WriterProcessDB(SQL_DB):
+    def __init__(self, location=None, file_name=None, cumulative=False, logger=logging,
+                 read_pool_size=DEFAULT_READ_POOL_SIZE):
+        """
+        SQL_DB served by dedicated writer process; Statements & rows sent over pipe as plain tuples
+        Requests tagged by id & pipelined; Replies resolve request futures in receiver thread
+        Read only queries served in current process by read connections pool
+        """
+        assert location, "Writer process require DB file location (In memory DB not shared between processes)"
+        self._logger = logger
+        self._lock = RLock()
+        self._local = local()
+        self._table_cache = []
+        self._request_ids = count()
+        self._pending = {}
+        context = multiprocessing.get_context('spawn')
+        self._conn, child_conn = context.Pipe()
+        self._process = context.Process(name='DataWriter', target=_writer_process_main, daemon=True,
+                                        args=(child_conn, location, file_name, cumulative))
+        self._process.start()
+        child_conn.close()
+        _, success, result = self._conn.recv()
+        if not success:
+            raise result
+        self._db_path, self._is_new = result
+        self._receiver = Thread(name='DataWriterReceiver', target=self._receive, daemon=True)
+        self._receiver.start()
+        self._read_pool = ReadConnectionPool(self._db_path, read_pool_size) if read_pool_size > 0 else None
+        atexit.register(self.close)
+
+    @property
+    def pid(self):
+        return self._process.pid
+
+    @property
+    def pending(self):
+        return len(self._pending)
+
+    def _receive(self):
+        while True:
+            try:
+                request_id, success, result = self._conn.recv()
+            except (EOFError, OSError):
+                break
+            future = self._pending.pop(request_id)
+            if success:
+                result, future.last_row_id = result
+                future.set_result(result)
+            else:
+                future.set_exception(result)
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        for future in pending.values():
+            future.set_exception(ConnectionError("Writer process connection closed"))
+
+    def _submit(self, op, payload) -> Future:
+        future = Future()
+        future.last_row_id = None
+        with self._lock:
+            request_id = next(self._request_ids)
+            self._pending[request_id] = future
+            try:
+                self._conn.send((request_id, op, payload))
+            except Exception as e:
+                self._pending.pop(request_id, None)
+                future.set_exception(e)
+        return future
+
+    def _request(self, op, payload):
+        future = self._submit(op, payload)
+        result = future.result()
+        self._local.last_row_id = future.last_row_id
+        return result
+
+    @staticmethod
+    def _compact(rows):
+        if isinstance(rows, list):
+            return [r if type(r) is tuple else tuple(r) for r in rows]
+        return tuple(rows) if rows else rows
+
+    def execute(self, sql: str, *args, **kwargs):
+        if len(args) > 0 and isinstance(args[0], list):
+            args = (self._compact(args[0]),)
+        return self._request('execute', (sql, tuple(args)))
+
+    def execute_batch(self, statements: List):
+        return self.execute_batch_async(statements).result()
+
+    def execute_batch_async(self, statements: List) -> Future:
+        return self._submit('batch', [(sql, self._compact(rows)) for sql, rows in statements])
+
+    @property
+    def get_last_row_id(self):
+        return getattr(self._local, 'last_row_id', None)
+
+    def close(self):
+        if self._process is None:
+            return
+        atexit.unregister(self.close)
+        if self._read_pool:
+            self._read_pool.close()
+        with self._lock:
+            try:
+                self._conn.send((None, 'close', None))
+            except (OSError, ValueError):
+                pass
+        self._process.join(5)
+        if self._process.is_alive():
+            self._process.terminate()
+        self._receiver.join(5)
+        self._conn.close()
+        self._process = None
+
+
 def create_table_sql(name, columns: List, foreign_keys: List):
     return CREATE_TABLE_TEMPLATE.format(name=name,
                                         columns=',\n\t'.join(str(f) for f in columns),
@@ -114,30 +440,56 @@ def create_table_sql(name, columns: List, foreign_keys: List):
                                         if len(foreign_keys) > 0 else '')
 
 
-def select_sql(name, *fields, **filter_data):
-    if len(fields) == 0:
-        fields = ', '.join([f"{t}" for t in filter_data.keys()])
-    else:
-        fields = ', '.join([f"{t}" for t in fields])
-    where = ' AND '.join("{} = {}".format(f, v if str(v).isdigit() else f"'{v}'") for f, v in filter_data.items())
-    return f'SELECT {fields}\nFROM {name}\nWHERE {where}'
+def create_index_sql(table_name, index, schema=None):
+    """
+    :param schema: attached database alias index created in (Table must be in same database) [Optional]
+    """
+    return CREATE_INDEX_TEMPLATE.format(unique='UNIQUE ' if index.unique else '',
+                                        name=f"{schema}.{index.name(table_name)}" if schema else index.name(table_name),
+                                        table=table_name,
+                                        fields=', '.join(index.fields))
+
+
+def select_sql(name, *fields, **filter_data) -> Tuple[str, Tuple]:
+    """
+    Parameterized select
+    :return: SQL text (cached) with '?' placeholder per filter field & filter_data values to bind
+    """
+    fields = fields or tuple(filter_data.keys())
+    where = tuple(filter_data.keys())
+    return statement_cache.get(name, ('select', fields, where), lambda: SELECT_TABLE_WHERE.format(
+        fields=', '.join(fields), table=name, expression=' AND '.join(f"{f} = ?" for f in where))), \
+        tuple(filter_data.values())
 
 
-def insert_sql(table_name, columns):
-    return INSERT_TABLE_TEMPLATE.format(table=table_name, values=",".join(['?'] * len(columns)))
+def insert_sql(table_name, columns, on_conflict=None):
+    """
+    :param on_conflict: conflict resolution (IGNORE, REPLACE, etc.) [Optional]
+    """
+    return statement_cache.get(table_name, ('insert', len(columns), on_conflict), lambda: INSERT_TABLE_TEMPLATE.format(
+        conflict=f"OR {on_conflict} " if on_conflict else '', table=table_name, values=",".join(['?'] * len(columns))))
 
 
-def update_sql(name, *columns, **where):
-    return UPDATE_TABLE_TEMPLATE.format(table=name,
-                                        columns=",\n\t".join([f"{c} = ?" for c in columns]),
-                                        where=' AND '.join(
-                                            "{} = {}".format(f, v if str(v).isdigit() else f'"{v}"') for f, v in
-                                            where.items()))
+def update_sql(name, set_data: Mapping[str, Any], **where) -> Tuple[str, Tuple]:
+    """
+    Parameterized update
+    :param set_data: column -> new value
+    :return: SQL text (cached) with '?' placeholder per column & where field & values to bind (same order)
+    """
+    columns = tuple(set_data.keys())
+    where_fields = tuple(where.keys())
+    return statement_cache.get(name, ('update', columns, where_fields), lambda: UPDATE_TABLE_TEMPLATE.format(
+        table=name, columns=",\n\t".join([f"{c} = ?" for c in columns]),
+        where=' AND '.join(f"{f} = ?" for f in where_fields))), (*set_data.values(), *where.values())
 
 
 __all__ = [
     'SQL_DB',
+    'WriterProcessDB',
+    'StatementCache',
+    'statement_cache',
     'create_table_sql',
+    'create_index_sql',
     'insert_sql',
     'select_sql',
     'update_sql',
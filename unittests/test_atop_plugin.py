@@ -1,5 +1,12 @@
+import json
 import os
+import re
+import subprocess
+from collections import namedtuple, OrderedDict
+from datetime import datetime, timedelta
+from shutil import rmtree
 from threading import Event
+from time import perf_counter
 from unittest import TestCase
 
 from robot.utils import DotDict
@@ -8,7 +15,13 @@ from RemoteMonitorLibrary.api import plugins
 from RemoteMonitorLibrary.api.services import *
 from RemoteMonitorLibrary.model.runner_model import plugin_runner_abstract
 from RemoteMonitorLibrary import plugins_modules
-from RemoteMonitorLibrary.utils import load_modules
+from RemoteMonitorLibrary.api import db, model
+from RemoteMonitorLibrary.plugins_modules.atop_plugin import aTopSystem_DataUnit, aTopParser, atop_system_level, \
+    atop_datamap, aTopSystemLevelChart, aTop, aTopParseableParser, aTopProcesses_Parseable_DataUnit, \
+    atop_process_level, ProcessMonitorRegistry, parseable_filter, aTopParser, aTopReadWindow, \
+    aTopProcesses_Debian_DataUnit, PARSEABLE_REMOTE_FILTER, aTopDeferredReader, aTopMode, aTopSliceWindow
+from RemoteMonitorLibrary.utils import load_modules, Size
+from RemoteMonitorLibrary.utils.sql_engine import SQL_DB, create_table_sql, create_index_sql, insert_sql
 
 parameters = DotDict(host='192.168.27.141', username='vagrant', port=22, certificate=None,
                      password='vagrant', interval=10, fault_tolerance=10, alias=None,
@@ -33,3 +46,393 @@ class Test_aTop(TestCase):
 
     def test_02_non_persistent_worker(self):
         self.plugin._non_persistent_worker()
+
+
+CORPUS = os.path.join(os.path.dirname(__file__), 'data', 'atop')
+
+
+def _corpus_system_portions(name):
+    with open(os.path.join(CORPUS, f"{name}.txt")) as reader:
+        stdout = reader.read()
+    for atop_portion in [e.strip() for e in stdout.split('ATOP') if e.strip() != '']:
+        yield '\n'.join(atop_portion.splitlines()[1:]).split('PID', 1)[0]
+
+
+def _legacy_atop_system_level(input_text, columns_template, *defaults):
+    # Reference parser replaced by table driven one; Kept for benchmark only
+    header_regex = re.compile(r'(.+)\|(.+)\|(.+)\|(.+)\|(.+)\|(.+)\|')
+    res = []
+    row_mapping = namedtuple('ROW', ('Col1', 'Col2', 'Col3', 'Col4', 'Col5', 'SUB_ID'))
+    for line in header_regex.findall(input_text):
+        try:
+            type_, data_ = aTopParser._normalize_line(*line)
+            sub_id = type_
+            pattern = OrderedDict()
+            if type_ in ('PRC', 'PAG'):
+                pattern.update(**{k: aTopParser.try_time_string_to_secs(v) for k, v in
+                                  [re.split(r'\s+', s.strip(), 2) for s in data_]})
+            elif type_ in ['CPU', 'cpu']:
+                pattern.update(**{k: v.replace('%', '') for k, v in [re.split(r'\s+', s.strip(), 1) for s in data_]})
+                if type_ == 'cpu':
+                    for k, v in pattern.items():
+                        if k.startswith('cpu'):
+                            _cpu_str, _wait = re.split(r'\s+', v, 1)
+                            pattern.pop(k)
+                            pattern.update({'wait': _wait})
+                            sub_id = k.replace('cpu', 'cpu_').upper()
+                            break
+                    type_ = 'CPU'
+                else:
+                    sub_id = 'CPU_All'
+            elif type_ == 'CPL':
+                pattern.update(**{k: v for k, v in [re.split(r'\s+', s.strip(), 1) for s in data_]})
+            elif type_ in ['MEM', 'SWP']:
+                pattern.update(**{k: v for k, v in [re.split(r'\s+', s.strip(), 1) for s in data_]})
+                for k in pattern.keys():
+                    pattern[k] = Size(pattern[k]).set_format('M').number
+            elif type_ in ['LVM', 'DSK', 'NET']:
+                for item in [re.split(r'\s+', s.strip()) for s in data_]:
+                    if len(item) == 1 or item[1] == '----':
+                        pattern.update({'source': '-1'})
+                        sub_id = f"{type_}_{item[0]}"
+                    else:
+                        pattern.update({item[0]: item[1].replace('%', '')})
+            else:
+                raise ValueError(f"Unknown line type: {' '.join(line)}")
+            pattern.update(SUB_ID=sub_id)
+            res.append(columns_template(
+                *[*defaults, type_, json.dumps(row_mapping(*pattern.keys()), indent=True), *pattern.values()]))
+        except ValueError:
+            pass
+    return res
+
+
+class TestSystemLevelParser(TestCase):
+    corpus = ('ubuntu_18.04', 'centos_7')
+    _replays = 200
+
+    def test_corpus_output_unchanged(self):
+        template = atop_system_level().template
+        for name in self.corpus:
+            with open(os.path.join(CORPUS, f"{name}.expected.json")) as reader:
+                expected = json.load(reader)
+            actual = [[list(row) for row in aTopSystem_DataUnit._generate_atop_system_level(portion, template, 1, None)]
+                      for portion in _corpus_system_portions(name)]
+            self.assertEqual(actual, expected, f"Corpus '{name}' output changed")
+
+    def test_corpus_benchmark(self):
+        template = atop_system_level().template
+        portions = [p for name in self.corpus for p in _corpus_system_portions(name)] * self._replays
+        _start = perf_counter()
+        legacy = [_legacy_atop_system_level(p, template, 1, None) for p in portions]
+        legacy_time = perf_counter() - _start
+        _start = perf_counter()
+        current = [aTopSystem_DataUnit._generate_atop_system_level(p, template, 1, None) for p in portions]
+        current_time = perf_counter() - _start
+        assert current == legacy
+        print(f"aTop system level: {legacy_time / len(portions) * 1e6:.0f}us (legacy) -> "
+              f"{current_time / len(portions) * 1e6:.0f}us (table driven) per sample")
+        assert current_time < legacy_time, f"Table driven parser slower: {current_time}s vs. {legacy_time}s"
+
+
+class legacy_atop_system_level(db.PlugInTable):
+    def __init__(self):
+        super().__init__(name='atop_system_level')
+        self.add_time_reference()
+        for field in atop_system_level().fields[2:]:
+            self.add_field(model.Field('DataMap') if field.name == 'MAP_REF' else field)
+
+
+class TestDataMapDimension(TestCase):
+    _location = r'./atop_datamap'
+    _capture_interval = 30
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        rmtree(cls._location, True)
+        for table in aTop.affiliated_tables():
+            TableSchemaService().register_table(table)
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        rmtree(cls._location, True)
+
+    def test_datamap_interned(self):
+        DataHandlerService().init()
+        DataHandlerService().start(Event())
+        try:
+            table = TableSchemaService().tables.atop_system_level
+            DataHandlerService().execute(insert_sql('TraceHost', ['HOST_ID', 'HostName']), 1, 'atop')
+            units = [aTopSystem_DataUnit(table, 1, *portion.splitlines())
+                     for name in TestSystemLevelParser.corpus for portion in _corpus_system_portions(name)]
+            for unit in units:
+                DataHandlerService().add_data_unit(unit)
+            wait_data_units(units, timeout=10)
+            maps = DataHandlerService().execute('SELECT DataMap FROM atop_datamap')
+            expected = {row[3] for name in TestSystemLevelParser.corpus
+                        for sample in json.load(open(os.path.join(CORPUS, f"{name}.expected.json")))
+                        for row in sample}
+            self.assertEqual({m[0] for m in maps}, expected)
+            chart = aTopSystemLevelChart('MEM')
+            data = DataHandlerService().execute(chart.compose_sql_query(host_name='atop'))
+            [(title, _, y_axes, _)] = chart.generate_chart_data(data)
+            self.assertEqual((title, y_axes), ('MEM', ['tot', 'free', 'cache', 'buff', 'slab']))
+        finally:
+            DataHandlerService().stop()
+
+    def test_legacy_datamap_migrated(self):
+        legacy_db = SQL_DB(self._location, self._testMethodName)
+        tables = (db.TraceHost(), db.TimeLine(), legacy_atop_system_level(),
+                  db.RollupTable(legacy_atop_system_level(), 'Type', 'DataMap', 'SUB_ID'))
+        for t in tables:
+            legacy_db.execute(create_table_sql(t.name, t.fields, t.foreign_keys))
+        legacy_db.execute(insert_sql('TraceHost', ['HOST_ID', 'HostName']), 1, 'atop')
+        portions = _corpus_system_portions('ubuntu_18.04')
+        for tl_id, portion in enumerate(portions, 1):
+            legacy_db.execute(insert_sql('TimeLine', ['TL_ID', 'TimeStamp']), tl_id, f"2021-01-21 10:15:0{tl_id}")
+            legacy_db.execute(insert_sql(tables[2].name, tables[2].columns),
+                              aTopSystem_DataUnit._generate_atop_system_level(portion, tables[2].template, 1, tl_id))
+        legacy_db.execute(f"INSERT INTO {tables[3].name} (HOST_REF, TL_REF, Resolution, Type, DataMap, SUB_ID) "
+                          f"SELECT HOST_REF, TL_REF, 60, Type, DataMap, SUB_ID FROM atop_system_level")
+        rows_count = legacy_db.execute('SELECT COUNT() FROM atop_system_level')[0][0]
+        legacy_db.close()
+
+        DataHandlerService().init(self._location, self._testMethodName, True)
+        DataHandlerService().start(Event())
+        try:
+            for table_name in ('atop_system_level', 'atop_system_level_rollup'):
+                columns = [r[1] for r in DataHandlerService().execute(f"PRAGMA table_info({table_name})")]
+                assert 'MAP_REF' in columns and 'DataMap' not in columns, f"{table_name} not migrated: {columns}"
+                self.assertEqual(DataHandlerService().execute(
+                    f"SELECT COUNT() FROM {table_name} WHERE MAP_REF IS NOT NULL")[0][0], rows_count)
+            chart = aTopSystemLevelChart('MEM')
+            data = DataHandlerService().execute(chart.compose_sql_query(host_name='atop'))
+            [(title, _, y_axes, _)] = chart.generate_chart_data(data)
+            self.assertEqual((title, y_axes), ('MEM', ['tot', 'free', 'cache', 'buff', 'slab']))
+        finally:
+            DataHandlerService().stop()
+
+    def _capture_size(self, table, data_map):
+        sql_db = SQL_DB(self._location, table.__class__.__name__)
+        for t in (table, atop_datamap()):
+            sql_db.execute(create_table_sql(t.name, t.fields, t.foreign_keys))
+            for index in t.indexes:
+                sql_db.execute(create_index_sql(t.name, index))
+        template = table.template
+        portions = [p for name in TestSystemLevelParser.corpus for p in _corpus_system_portions(name)]
+        for tl_id in range(int(24 * 3600 / self._capture_interval)):
+            sql_db.execute(insert_sql(table.name, table.columns), aTopSystem_DataUnit._generate_atop_system_level(
+                portions[tl_id % len(portions)], template, 1, tl_id, data_map=data_map))
+        sql_db.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+        size = sql_db.execute('PRAGMA page_count')[0][0] * sql_db.execute('PRAGMA page_size')[0][0]
+        sql_db.close()
+        return size
+
+    def test_capture_size_reduction(self):
+        map_ids = {}
+
+        def _intern(data_map):
+            return map_ids.setdefault(data_map, len(map_ids) + 1)
+
+        legacy = self._capture_size(legacy_atop_system_level(), lambda m: m)
+        current = self._capture_size(atop_system_level(), _intern)
+        print(f"24h aTop system level capture ({self._capture_interval}s interval): "
+              f"{legacy / 1024 / 1024:.1f}MB (inline DataMap) -> {current / 1024 / 1024:.1f}MB (atop_datamap); "
+              f"{(1 - current / legacy) * 100:.0f}% reduced")
+        assert current < legacy * 0.75, f"DB size not reduced: {current} vs. {legacy}"
+
+
+class TestParseableParser(TestCase):
+    plugin_id = 'aTop-parseable'
+    corpus = 'ubuntu_18.04.parseable'
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        ProcessMonitorRegistry().activate(cls.plugin_id, 'apache2')
+        with open(os.path.join(CORPUS, f"{cls.corpus}.txt")) as reader:
+            cls.stdout = reader.read()
+
+    def _parse(self, *outputs):
+        units = []
+        parser = aTopParseableParser(self.plugin_id, host_id=1, data_handler=units.append, interval='10s',
+                                     table={'system': atop_system_level(), 'process': atop_process_level()},
+                                     data_unit=aTopProcesses_Parseable_DataUnit)
+        for stdout in outputs:
+            assert parser(dict(stdout=stdout, stderr='', rc=0))
+        return units[0::2], units[1::2]
+
+    def test_samples_parsed(self):
+        system_units, process_units = self._parse(self.stdout)
+        self.assertEqual(len(system_units), 3, "Sample since boot (RESET) not skipped")
+        rows = system_units[0]._generate_parseable_system_level(system_units[0]._lines, atop_system_level().template,
+                                                                1, None)
+        self.assertEqual([r.SUB_ID for r in rows], ['CPU_All', 'CPU_000', 'CPU_001', 'MEM', 'SWP', 'DSK_sda',
+                                                    'NET_transport', 'NET_network', 'NET_enp0s3', 'NET_lo'])
+        cpu = rows[0]
+        self.assertAlmostEqual(sum((cpu.Col1, cpu.Col2, cpu.Col3, cpu.Col4, cpu.Col5)), 200, delta=3)
+        columns = process_units[0].generate_atop_process_level(process_units[0]._lines)
+        self.assertEqual(columns['CMD'], ['apache2_904', 'apache2_905'])
+        prc = [line.split() for line in self.stdout.splitlines()
+               if line.startswith('PRC') and ' 1611224101 ' in line and ' 904 ' in line][0]
+        self.assertEqual(columns['USRCPU'][0], int(prc[10]) / 100)
+        self.assertEqual(columns['SYSCPU'][0], int(prc[11]) / 100)
+
+    def test_column_maps_match_batch_mode(self):
+        system_units, _ = self._parse(self.stdout)
+        rows = system_units[0]._generate_parseable_system_level(system_units[0]._lines, atop_system_level().template,
+                                                                1, None)
+        with open(os.path.join(CORPUS, 'ubuntu_18.04.expected.json')) as reader:
+            batch_maps = {row[-1]: row[3] for row in json.load(reader)[0]}
+        for row in rows:
+            if row.SUB_ID in ('CPU_All', 'CPU_000', 'CPU_001', 'MEM', 'SWP', 'DSK_sda', 'NET_transport',
+                              'NET_network'):
+                self.assertEqual(row.MAP_REF, batch_maps[row.SUB_ID], f"{row.SUB_ID} columns differ")
+
+    def test_repeated_samples_skipped(self):
+        system_units, process_units = self._parse(self.stdout, self.stdout)
+        self.assertEqual((len(system_units), len(process_units)), (3, 3))
+
+    def test_remote_filter_transfer(self):
+        pattern = re.compile(parseable_filter('apache2'))
+        filtered = [line for line in self.stdout.splitlines() if pattern.search(line)]
+        self.assertEqual({line.split()[7] for line in filtered if line.startswith('PR')}, {'(apache2)'})
+        self.assertEqual(len([line for line in filtered if line[:3] in ('CPU', 'cpu', 'MEM', 'SWP', 'DSK', 'NET')]),
+                         len([line for line in self.stdout.splitlines() if not line.startswith('PR')]) - 5)
+        system_units, process_units = self._parse('\n'.join(filtered))
+        self.assertEqual((len(system_units), len(process_units)), (3, 3))
+        print(f"aTop parseable transfer per sample: {len(self.stdout) // 4}B (all processes) -> "
+              f"{len(chr(10).join(filtered)) // 4}B (monitored processes only)")
+        assert len('\n'.join(filtered)) * 2 < len(self.stdout)
+
+
+class TestReadWindow(TestCase):
+    plugin_id = 'aTop-window'
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        ProcessMonitorRegistry().activate(cls.plugin_id, 'apache2')
+
+    @staticmethod
+    def _parser(parser_class, data_unit, units):
+        return parser_class(TestReadWindow.plugin_id, host_id=1, data_handler=units.append, interval='10s',
+                            table={'system': atop_system_level(), 'process': atop_process_level()},
+                            data_unit=data_unit)
+
+    def test_batch_windows_overlap(self):
+        units = []
+        parser = self._parser(aTopParser, aTopProcesses_Debian_DataUnit, units)
+        window = aTopReadWindow(parser, '%Y%m%d%H%M')
+        assert window.result['begin'].startswith('`date'), "First window not started from current time"
+        with open(os.path.join(CORPUS, 'ubuntu_18.04.txt')) as reader:
+            stdout = reader.read()
+        first_poll = stdout[:stdout.index('ATOP', stdout.index('10:15:11'))]
+        for output in (first_poll, stdout, stdout):
+            assert parser(dict(stdout=output, stderr='', rc=0))
+        self.assertEqual(len(units), 6, "Samples lost or duplicated")
+        self.assertEqual((window.result['begin'], window.result['after']), ('202101211015', '2021/01/21 10:15:21'))
+
+    def test_time_of_day_window_cross_midnight(self):
+        units = []
+        parser = self._parser(aTopParser, aTopProcesses_Debian_DataUnit, units)
+        window = aTopReadWindow(parser, '%H:%M')
+        with open(os.path.join(CORPUS, 'ubuntu_18.04.txt')) as reader:
+            stdout = reader.read()
+        samples = ['ATOP' + s for s in stdout.split('ATOP') if s.strip() != '']
+        before_midnight = samples[0].replace('2021/01/21  10:15:01', '2021/01/21  23:59:51', 1)
+        after_midnight = samples[1].replace('2021/01/21  10:15:11', '2021/01/22  00:00:01', 1)
+        assert parser(dict(stdout=before_midnight, stderr='', rc=0))
+        assert '-e' not in window.result['window'], "End bound earlier than begin over midnight"
+        begin = subprocess.run(f"echo {window.result['begin']}", shell=True, capture_output=True, text=True,
+                               check=True).stdout.strip()
+        self.assertEqual(begin, '00:00', "Window not restarted once day changed on host")
+        assert parser(dict(stdout=before_midnight + after_midnight, stderr='', rc=0))
+        self.assertEqual(len(units), 4, "Samples lost or duplicated over midnight")
+        self.assertEqual(parser.last_sample, datetime(2021, 1, 22, 0, 0, 1))
+        parser._last_sample = datetime.now().replace(hour=10, minute=15)
+        begin = subprocess.run(f"echo {window.result['begin']}", shell=True, capture_output=True, text=True,
+                               check=True).stdout.strip()
+        self.assertEqual(begin, '10:15', "Window not started from last sample within same day")
+
+    def test_parseable_remote_window(self):
+        units = []
+        parser = self._parser(aTopParseableParser, aTopProcesses_Parseable_DataUnit, units)
+        with open(os.path.join(CORPUS, 'ubuntu_18.04.parseable.txt')) as reader:
+            stdout = reader.read()
+        parser(dict(stdout=stdout[:stdout.index('SEP', stdout.index(' 10:15:01 ')) + 4], stderr='', rc=0))
+        self.assertEqual(len(units), 2)
+        window = aTopReadWindow(parser, '%Y%m%d%H%M').result
+        self.assertEqual((window['begin'], window['after']), ('202101211015', '2021/01/21 10:15:01'))
+        remote_filter = PARSEABLE_REMOTE_FILTER.format(**window)
+        transferred = subprocess.run(f"cat '{os.path.join(CORPUS, 'ubuntu_18.04.parseable.txt')}' {remote_filter}",
+                                     shell=True, capture_output=True, text=True, check=True).stdout
+        self.assertEqual(sorted({line.split()[4] for line in transferred.splitlines() if len(line.split()) > 1}),
+                         ['10:15:11', '10:15:21'], "Samples ingested already transferred again")
+        assert parser(dict(stdout=transferred, stderr='', rc=0))
+        self.assertEqual(len(units), 6, "Samples lost or duplicated")
+
+
+class TestDeferredReader(TestCase):
+    plugin_id = 'aTop-deferred'
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        ProcessMonitorRegistry().activate(cls.plugin_id, 'apache2')
+        for table in aTop.affiliated_tables():
+            TableSchemaService().register_table(table)
+        DataHandlerService().init()
+        DataHandlerService().start(Event())
+        with open(os.path.join(CORPUS, 'ubuntu_18.04.txt')) as reader:
+            stdout = reader.read()
+        samples = ['ATOP' + s for s in stdout.split('ATOP') if s.strip() != '']
+        cls.slices = [''.join(samples[:2]), ''.join(samples[1:]), stdout]
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        DataHandlerService().stop()
+
+    def _flush(self, workers, window=None, slices=None):
+        units = []
+        reader = aTopDeferredReader(self.plugin_id, aTopMode.Batch, 'debian', window=window, host_id=1,
+                                    data_handler=units.append,
+                                    table={'system': atop_system_level(), 'process': atop_process_level()})
+        with reader.session(workers):
+            for stdout in slices or self.slices:
+                assert reader(dict(stdout=stdout, stderr='', rc=0))
+        return [(type(u).__name__, u.timestamp, u.sql_data) for u in units]
+
+    def test_slices_ingested_once_in_order(self):
+        units = self._flush(0)
+        self.assertEqual([(kind, ts) for kind, ts, _ in units],
+                         [(kind, f"2021-01-21 10:15:{s}") for s in ('01', '11', '21')
+                          for kind in ('DataUnit', 'ColumnarDataUnit')], "Samples lost, duplicated or reordered")
+        with open(os.path.join(CORPUS, 'ubuntu_18.04.expected.json')) as reader:
+            expected = json.load(reader)
+        rows = [rows for kind, _, (_, rows) in units if kind == 'DataUnit']
+        self.assertEqual([[r.SUB_ID for r in sample] for sample in rows], [[r[-1] for r in s] for s in expected])
+        assert all(isinstance(r.MAP_REF, int) for sample in rows for r in sample), "DataMap not interned"
+
+    def test_pool_parse_match_in_place(self):
+        self.assertEqual(self._flush(2), self._flush(0))
+
+    def test_slice_window_cross_midnight(self):
+        flush_from, till = datetime(2021, 1, 21, 23, 30), datetime(2021, 1, 22, 0, 40)
+        slices = list(aTopSliceWindow.split(flush_from, till, timedelta(hours=1)))
+        self.assertEqual(slices, [(flush_from, datetime(2021, 1, 22)),
+                                  (datetime(2021, 1, 22), datetime(2021, 1, 22, 1, 0))])
+        for date_format, expected in (('%H:%M', ['-b 23:30', '-b 00:00']),
+                                      ('%Y%m%d%H%M', ['-b 202101212330 -e 202101220000',
+                                                      '-b 202101220000 -e 202101220100'])):
+            window = aTopSliceWindow(self.plugin_id, date_format)
+            windows = []
+            for begin, end in slices:
+                window.set(begin, end)
+                windows.append(window.result['window'])
+            self.assertEqual(windows, expected, date_format)
+
+    def test_samples_outside_slice_dropped(self):
+        # Slice read without end bound (time of day host) returns samples till file end
+        window = aTopSliceWindow(self.plugin_id, '%H:%M')
+        window.set(datetime(2021, 1, 21, 10, 15, 5), datetime(2021, 1, 21, 10, 15, 15))
+        for workers in (0, 2):
+            units = self._flush(workers, window, self.slices[-1:])
+            self.assertEqual(sorted({ts for _, ts, _ in units}), ['2021-01-21 10:15:11'])
@@ -0,0 +1,746 @@
+import os
+from datetime import datetime, timedelta
+from sqlite3 import IntegrityError
+from shutil import rmtree
+from threading import Event, Thread, active_count
+from time import sleep, process_time, perf_counter
+from types import SimpleNamespace
+from unittest import TestCase
+from unittest.mock import patch
+
+from RemoteMonitorLibrary.api import db, model
+from RemoteMonitorLibrary.api.services import DataHandlerService, TableSchemaService, DataUnit, cache_timestamp, \
+    wait_data_units, ColumnarDataUnit, WriterStatistics
+from RemoteMonitorLibrary.plugins_modules.atop_plugin import aTopProcesses_Debian_DataUnit, atop_process_level, \
+    ProcessMonitorRegistry
+from RemoteMonitorLibrary.utils.collections import DataQueue, OverflowPolicy, Full, LRUCache, Histogram, PriorityLock
+from RemoteMonitorLibrary.utils.journal import DataJournal, JOURNAL_EXT
+from RemoteMonitorLibrary.utils.scheduler import TimeoutScheduler
+from RemoteMonitorLibrary.plugins_modules.atop_plugin import aTopSystemLevelChart
+from RemoteMonitorLibrary.utils.sql_engine import insert_sql, select_sql, DB_DATETIME_FORMAT
+
+
+class BenchSample(model.Table):
+    def __init__(self):
+        super().__init__(fields=[model.Field('Name'),
+                                 model.Field('Value1', model.FieldType.Real),
+                                 model.Field('Value2', model.FieldType.Real),
+                                 model.Field('Value3', model.FieldType.Int)])
+
+
+class TestBatchWriter(TestCase):
+    _location = r'./data_handler'
+    _units_count = 2000
+    _rates = {}
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        rmtree(cls._location, True)
+        TableSchemaService().register_table(BenchSample())
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        DataHandlerService().stop()
+        rmtree(cls._location, True)
+        print("Rows/s: {}".format(', '.join([f"{k}: {v:.0f}" for k, v in cls._rates.items()])))
+
+    def _run_writer(self, batch_size):
+        event = Event()
+        DataHandlerService().init(self._location, f"{self._testMethodName}_{batch_size}", False,
+                                  batch_size=batch_size)
+        DataHandlerService().start(event)
+        table = TableSchemaService().tables.BenchSample
+        units = [DataUnit(table, (f"row_{i}", i / 3, i * 2.5, i)) for i in range(self._units_count)]
+        start_ts = datetime.now()
+        for unit in units:
+            DataHandlerService().add_data_unit(unit)
+        for unit in units:
+            assert unit.result is not None, "Unit result not set"
+        duration = (datetime.now() - start_ts).total_seconds()
+        DataHandlerService().stop()
+        count = DataHandlerService().execute('SELECT COUNT() FROM BenchSample')[0][0]
+        assert count == self._units_count, f"Data integrity error: {count} rows (Expected: {self._units_count})"
+        return self._units_count / duration
+
+    def test_batch_rows_per_sec(self):
+        self._rates['per_unit_commit'] = max(self._run_writer(1) for _ in range(3))
+        self._rates['batch_200'] = max(self._run_writer(200) for _ in range(3))
+        assert self._rates['batch_200'] > self._rates['per_unit_commit'], \
+            f"Batch writer slower then per unit commit: {self._rates}"
+
+
+class TestDataQueue(TestCase):
+    def test_block_policy(self):
+        queue = DataQueue(2)
+        queue.put(1)
+        queue.put(2)
+        with self.assertRaises(Full):
+            queue.put(3, timeout=0.1)
+        assert queue.high_water_mark == 2
+
+    def test_drop_oldest_policy(self):
+        dropped = []
+        queue = DataQueue(2, OverflowPolicy.DropOldest, dropped.append)
+        for i in range(5):
+            queue.put(i)
+        assert [queue.get(), queue.get()] == [3, 4]
+        assert dropped == [0, 1, 2] and queue.overflow_count == 3
+
+    def test_spill_policy(self):
+        spilled = []
+        queue = DataQueue(2, OverflowPolicy.Spill, spilled.append)
+        for i in range(5):
+            queue.put(i)
+        assert [queue.get(), queue.get()] == [0, 1]
+        assert spilled == [2, 3, 4] and queue.high_water_mark == 2
+
+    def test_close_wakes_consumer(self):
+        queue = DataQueue(2)
+        queue.put(1)
+        queue.close()
+        assert queue.get() == 1
+        with self.assertRaises(Exception):
+            queue.get()
+
+
+class TestWriterQueue(TestCase):
+    _location = r'./data_handler_queue'
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        rmtree(cls._location, True)
+        TableSchemaService().register_table(BenchSample())
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        DataHandlerService().stop()
+        rmtree(cls._location, True)
+
+    def test_idle_writer_not_spinning(self):
+        DataHandlerService().init(self._location, self._testMethodName, False)
+        DataHandlerService().start(Event())
+        sleep(0.2)
+        start_cpu = process_time()
+        sleep(1)
+        cpu_usage = process_time() - start_cpu
+        DataHandlerService().stop()
+        assert cpu_usage < 0.2, f"Idle writer consumed {cpu_usage}s CPU per second"
+
+    def test_spill_policy_lossless(self):
+        units_count = 2000
+        DataHandlerService().init(self._location, self._testMethodName, False, queue_size=10, overflow_policy='spill')
+        DataHandlerService().start(Event())
+        table = TableSchemaService().tables.BenchSample
+        for i in range(units_count):
+            DataHandlerService().add_data_unit(DataUnit(table, (f"row_{i}", i / 3, i * 2.5, i)))
+        statistics = DataHandlerService().queue_statistics
+        DataHandlerService().stop(timeout=30)
+        count = DataHandlerService().execute('SELECT COUNT() FROM BenchSample')[0][0]
+        print(f"Queue statistics: {statistics}")
+        assert statistics['high_water_mark'] <= 10
+        assert count == units_count, f"Data lost: {count} rows (Expected: {units_count})"
+
+    def test_spilled_data_replayed_under_load(self):
+        burst, trickle = 1000, 400
+        DataHandlerService().init(self._location, self._testMethodName, False, queue_size=10, overflow_policy='spill')
+        DataHandlerService().start(Event())
+        table = TableSchemaService().tables.BenchSample
+        try:
+            for i in range(burst):
+                DataHandlerService().add_data_unit(DataUnit(table, (f"row_{i}", i / 3, i * 2.5, i)))
+            assert DataHandlerService().queue_statistics['overflow'] > 0, "Queue not overflowed"
+            # Writer never idle for DEFAULT_IDLE_TIMEOUT while trickle
+            for i in range(burst, burst + trickle):
+                DataHandlerService().add_data_unit(DataUnit(table, (f"row_{i}", i / 3, i * 2.5, i)))
+                sleep(0.005)
+            sleep(0.5)
+            count = DataHandlerService().execute('SELECT COUNT() FROM BenchSample')[0][0]
+            assert count == burst + trickle, f"Spilled data not replayed under load: {count} rows"
+        finally:
+            DataHandlerService().stop()
+
+
+class TestTimeLineCache(TestCase):
+    _location = r'./data_handler_timeline'
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        rmtree(cls._location, True)
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        DataHandlerService().stop()
+        rmtree(cls._location, True)
+
+    def test_lru_eviction(self):
+        cache = LRUCache(2)
+        cache.put('a', 1)
+        cache.put('b', 2)
+        assert cache.get('a') == 1
+        cache.put('c', 3)
+        assert 'b' not in cache and cache.get('a') == 1 and cache.get('c') == 3
+        assert cache.get('b') is None and cache.hit_ratio == 0.75
+
+    def test_timestamp_cache(self):
+        timestamps = [f"2021-01-01 00:00:{s:02d}" for s in range(10)]
+        DataHandlerService().init(self._location, self._testMethodName, False)
+        DataHandlerService().start(Event())
+        tl_ids = {ts: cache_timestamp(ts) for ts in timestamps}
+        for _ in range(9):
+            for ts in timestamps:
+                assert cache_timestamp(ts) == tl_ids[ts]
+        assert DataHandlerService().timeline_cache.hit_ratio == 0.9, DataHandlerService().timeline_cache.statistics
+        assert DataHandlerService().execute('SELECT COUNT() FROM TimeLine')[0][0] == len(timestamps)
+        DataHandlerService().stop()
+
+        DataHandlerService().init(self._location, self._testMethodName, True)
+        DataHandlerService().start(Event())
+        for ts in timestamps:
+            assert cache_timestamp(ts) == tl_ids[ts]
+        assert DataHandlerService().timeline_cache.hit_ratio == 1, DataHandlerService().timeline_cache.statistics
+
+
+class TestDataUnitCompletion(TestCase):
+    _location = r'./data_handler_completion'
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        rmtree(cls._location, True)
+        TableSchemaService().register_table(BenchSample())
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        DataHandlerService().stop()
+        rmtree(cls._location, True)
+
+    @staticmethod
+    def _unit(i, **kwargs):
+        return DataUnit(TableSchemaService().tables.BenchSample, (f"row_{i}", i / 3, i * 2.5, i), **kwargs)
+
+    def test_batch_wait_and_callbacks(self):
+        DataHandlerService().init(self._location, self._testMethodName, False)
+        DataHandlerService().start(Event())
+        completed = []
+        units = [self._unit(i) for i in range(500)]
+        for unit in units:
+            unit.add_done_callback(completed.append)
+            DataHandlerService().add_data_unit(unit)
+        done, not_done = wait_data_units(units, timeout=10)
+        assert len(done) == len(units) and len(not_done) == 0
+        assert all(unit.result_ready and unit.result == [] for unit in units)
+        assert sorted(map(id, completed)) == sorted(map(id, units))
+        DataHandlerService().stop()
+
+    def test_shared_timeout_scheduler(self):
+        threads_count = active_count()
+        units = [self._unit(i, timeout=0.2) for i in range(200)]
+        for unit in units:
+            unit()
+        assert active_count() <= threads_count + 1, "Thread started per unit timeout"
+        units[0].result = 'written'
+        done, not_done = wait_data_units(units, timeout=5)
+        assert len(not_done) == 0
+        assert units[0].result == 'written'
+        with self.assertRaises(TimeoutError):
+            units[1].wait()
+        assert len(TimeoutScheduler()) == 0
+
+
+class TestColumnarDataUnit(TestCase):
+    _processes_count = 300
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        ProcessMonitorRegistry().activate(cls.__name__, 'apache')
+        cls._lines = [f"{1000 + i}  0.{i % 100:02d}s  1.{i % 10}0s  {i}K  12M  0K  {i % 7}K  {i % 50}%  apache2"
+                      for i in range(cls._processes_count)]
+
+    def test_rows_match_row_based_unit(self):
+        table = BenchSample()
+        values = [(f"row_{i}", i / 3, i * 2.5, i) for i in range(10)]
+        unit = ColumnarDataUnit(table, dict(zip(table.columns, zip(*values))))
+        assert unit.sql_data == DataUnit(table, *values).sql_data
+        with self.assertRaises(AssertionError):
+            ColumnarDataUnit(table, dict(Unknown=[1]))
+
+    def test_atop_process_columns(self):
+        unit = aTopProcesses_Debian_DataUnit(atop_process_level(), 7, *self._lines[:2],
+                                             processes_id=self.__class__.__name__)
+        unit(TL_ID=5)
+        assert unit.sql_data[1] == [(7, 5, '1000', 0.0, 1.0, 0.0, 12.0, 0.0, 0.0, '0', 'apache2_1000'),
+                                    (7, 5, '1001', 0.01, 1.1, 0.001, 12.0, 0.0, 0.001, '1', 'apache2_1001')]
+
+    def test_atop_process_unit_cost(self):
+        table = atop_process_level()
+        columns = aTopProcesses_Debian_DataUnit(table, 7, processes_id=self.__class__.__name__) \
+            .generate_atop_process_level(self._lines)
+        durations = {}
+        _start = perf_counter()
+        for _ in range(100):
+            unit = DataUnit(table, *[table.template(7, None, *row) for row in zip(*columns.values())])
+            unit(TL_ID=5)
+            rows = unit.sql_data[1]
+        durations['row_based'] = perf_counter() - _start
+        _start = perf_counter()
+        for _ in range(100):
+            unit = ColumnarDataUnit(table, columns, dict(HOST_REF=7))
+            unit(TL_ID=5)
+            assert unit.sql_data[1] == rows
+        durations['columnar'] = perf_counter() - _start
+        print("aTop process unit ({} rows): {}".format(
+            self._processes_count, ', '.join(f"{k}: {v * 10:.2f}ms" for k, v in durations.items())))
+        assert durations['columnar'] * 3 < durations['row_based'], durations
+
+
+class TestWriterProcess(TestCase):
+    _location = r'./data_handler_process'
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        rmtree(cls._location, True)
+        TableSchemaService().register_table(BenchSample())
+        DataHandlerService().init(cls._location, cls.__name__, False, writer_mode='process')
+        DataHandlerService().start(Event())
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        DataHandlerService().stop()
+        DataHandlerService().init()
+        rmtree(cls._location, True)
+
+    def test_units_written_by_writer_process(self):
+        writer_pid = DataHandlerService()._db.pid
+        assert writer_pid != os.getpid()
+        table = TableSchemaService().tables.BenchSample
+        units = [self._unit(table, i) for i in range(1000)]
+        for unit in units:
+            DataHandlerService().add_data_unit(unit)
+        done, not_done = wait_data_units(units, timeout=10)
+        assert len(not_done) == 0 and all(unit.result == [] for unit in units)
+        assert DataHandlerService().query('SELECT COUNT() FROM BenchSample')[0][0] == 1000
+
+    @staticmethod
+    def _unit(table, i):
+        return DataUnit(table, table.template(f"row_{i}", i / 3, i * 2.5, i))
+
+    def test_batches_pipelined(self):
+        writer = DataHandlerService()._db
+        table = TableSchemaService().tables.BenchSample
+        sql = insert_sql(table.name, table.columns)
+        futures = [writer.execute_batch_async([(sql, [(f"pipe_{b}_{i}", i, i, i) for i in range(100)])])
+                   for b in range(10)]
+        failed = writer.execute_batch_async([(sql, [('pipe_failed', 0, 0, 0)]), ('INSERT INTO Missing VALUES (1)', ())])
+        assert writer.execute('SELECT COUNT() FROM BenchSample WHERE Name LIKE ?', 'pipe_%') == [(1000,)]
+        assert all(f.done() and f.result() == [[]] for f in futures)
+        with self.assertRaises(Exception):
+            failed.result(0)
+        assert writer.pending == 0
+        writer.execute('DELETE FROM BenchSample WHERE Name LIKE ?', 'pipe_%')
+
+    def test_plugin_facing_api(self):
+        tl_id = cache_timestamp('2021-01-01 00:00:00')
+        assert cache_timestamp('2021-01-01 00:00:01') == tl_id + 1
+        table = TableSchemaService().tables.TraceHost
+        DataHandlerService().execute(insert_sql(table.name, table.columns), None, 'writer_process_host')
+        host_id = DataHandlerService().get_last_row_id
+        with self.assertRaises(IntegrityError):
+            DataHandlerService().execute(insert_sql(table.name, table.columns), None, 'writer_process_host')
+        sql, params = select_sql(table.name, 'HOST_ID', HostName='writer_process_host')
+        assert DataHandlerService().execute(sql, *params) == [(host_id,)]
+
+
+class PartitionSample(db.PlugInTable):
+    def __init__(self):
+        super().__init__('PartitionSample')
+        self.add_time_reference()
+        self.add_field(model.Field('Value', model.FieldType.Int))
+
+
+class TestDBPartitions(TestCase):
+    _location = r'./data_handler_partitions'
+    _count_sql = "SELECT COUNT() FROM PartitionSample p JOIN TimeLine t ON p.TL_REF = t.TL_ID"
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        rmtree(cls._location, True)
+        TableSchemaService().register_table(PartitionSample())
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        DataHandlerService().stop()
+        DataHandlerService().init()
+        rmtree(cls._location, True)
+
+    def tearDown(self) -> None:
+        DataHandlerService().stop()
+
+    @staticmethod
+    def _write(count):
+        table = TableSchemaService().tables.PartitionSample
+        units = [DataUnit(table, table.template(None, None, i)) for i in range(count)]
+        for unit in units:
+            DataHandlerService().add_data_unit(unit)
+        done, not_done = wait_data_units(units, timeout=10)
+        assert len(not_done) == 0
+
+    def test_size_rollover(self):
+        DataHandlerService().init(self._location, self._testMethodName, False, partition_size=0.05)
+        DataHandlerService().start(Event())
+        for _ in range(5):
+            self._write(1000)
+        partitions = DataHandlerService().partitions.select()
+        assert len(partitions) > 1, f"Partition not rolled over: {partitions}"
+        assert all(os.path.exists(os.path.join(self._location, f)) for _, f in partitions)
+        assert DataHandlerService().query("SELECT name FROM sqlite_master WHERE name = 'PartitionSample'") == [], \
+            "Plugin table created in main DB"
+        assert DataHandlerService().query_period(self._count_sql)[0][0] == 5000
+
+    def test_period_attach_touched_partitions_only(self):
+        DataHandlerService().init(self._location, self._testMethodName, False, partition_interval=3600)
+        DataHandlerService().start(Event())
+        self._write(100)
+        DataHandlerService().partitions.rollover()
+        self._write(50)
+        catalog = TableSchemaService().tables.Partitions
+        (first, _), (second, _) = DataHandlerService().partitions.select()
+        for part_id, start, end in ((first, '2021-01-01 00:00:00', '2021-01-01 12:00:00'),
+                                    (second, '2021-01-01 12:00:00', None)):
+            DataHandlerService().execute(f"UPDATE {catalog.name} SET Start = ?, End = ? WHERE PART_ID = ?",
+                                         start, end, part_id)
+        for start_mark, end_mark, expected_partitions, expected_rows in (
+                ('2021-01-01 01:00:00', '2021-01-01 02:00:00', [first], 100),
+                ('2021-01-02 01:00:00', '2021-01-02 02:00:00', [second], 50),
+                ('2021-01-01 11:00:00', '2021-01-01 13:00:00', [first, second], 150)):
+            partitions = [p for p, _ in DataHandlerService().partitions.select(start_mark, end_mark)]
+            assert partitions == expected_partitions, f"{start_mark} - {end_mark}: {partitions}"
+            rows = DataHandlerService().query_period(self._count_sql, start_mark=start_mark, end_mark=end_mark)
+            assert rows[0][0] == expected_rows, f"{start_mark} - {end_mark}: {rows}"
+        DataHandlerService().stop()
+        DataHandlerService().init(self._location, self._testMethodName, True, partition_interval=3600)
+        DataHandlerService().start(Event())
+        assert DataHandlerService().partitions.current[0] == second, "Open partition not reattached"
+
+
+class RollupSample(db.PlugInTable):
+    def __init__(self):
+        super().__init__('RollupSample')
+        self.add_time_reference()
+        self.add_field(model.Field('Name'))
+        self.add_field(model.Field('Value', model.FieldType.Real))
+
+
+class TestDataRollup(TestCase):
+    _location = r'./data_handler_rollup'
+    _start = datetime(2021, 1, 1)
+    _names = ('a', 'b')
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        rmtree(cls._location, True)
+        TableSchemaService().register_table(RollupSample())
+        TableSchemaService().register_table(db.RollupTable(RollupSample(), 'Name'))
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        DataHandlerService().stop()
+        DataHandlerService().init()
+        rmtree(cls._location, True)
+
+    def tearDown(self) -> None:
+        DataHandlerService().stop()
+
+    def _write(self, seconds, first=0):
+        table = TableSchemaService().tables.RollupSample
+        units = [DataUnit(table, table.template(None, None, name, float(i)),
+                          datetime=(self._start + timedelta(seconds=i)).strftime(DB_DATETIME_FORMAT))
+                 for i in range(first, seconds) for name in self._names]
+        for unit in units:
+            DataHandlerService().add_data_unit(unit)
+        done, not_done = wait_data_units(units, timeout=10)
+        assert len(not_done) == 0
+
+    @staticmethod
+    def _count(sql, *args):
+        return DataHandlerService().query(f"SELECT COUNT() FROM ({sql})", *args)[0][0]
+
+    def test_incremental_rollup(self):
+        DataHandlerService().init(self._location, self._testMethodName, False, rollup=(60, 600))
+        DataHandlerService().start(Event())
+        self._write(1800)
+        for _ in range(2):
+            DataHandlerService().rollup.run()
+            # Buckets closed up to latest sample minus lag: 28 x 1m, 2 x 10m per name
+            for resolution, buckets in ((60, 28), (600, 2)):
+                rows = self._count('SELECT * FROM RollupSample_rollup WHERE Resolution = ?', resolution)
+                assert rows == buckets * len(self._names), f"{resolution}s: {rows} rows"
+        assert DataHandlerService().query(
+            "SELECT Samples, Value_min, Value_avg, Value_max FROM RollupSample_rollup r "
+            "JOIN TimeLine t ON r.TL_REF = t.TL_ID WHERE Resolution = 60 AND Name = 'a' AND t.TimeStamp = ?",
+            '2021-01-01 00:01:00') == [(60, 60.0, 89.5, 119.0)]
+
+        assert DataHandlerService().rollup_source('RollupSample', width=640) is None, "Raw data expected"
+        source, params = DataHandlerService().rollup_source('RollupSample', width=2)
+        assert params[0] == 600, params
+        source, params = DataHandlerService().rollup_source('RollupSample', width=20)
+        assert params == (60, '2021-01-01 00:28:00'), params
+        # 1m rollups followed by raw rows not rolled up yet (Last 2 minutes)
+        assert self._count(source, *params) == 28 * len(self._names) + 120 * len(self._names)
+        sql = aTopSystemLevelChart('CPU').compose_sql_query(host_name='host', source='SELECT 1')
+        assert 'FROM (SELECT 1) top' in sql, sql
+
+    def test_raw_retention(self):
+        DataHandlerService().init(self._location, self._testMethodName, False, rollup=(60,), raw_retention=600)
+        DataHandlerService().start(Event())
+        self._write(1800)
+        DataHandlerService().rollup.run()
+        # Raw rows kept for last 10 minutes only (00:19:59 - 00:29:59)
+        assert self._count('SELECT * FROM RollupSample') == 601 * len(self._names)
+        source, params = DataHandlerService().rollup_source('RollupSample', '2021-01-01 00:00:00',
+                                                            '2021-01-01 00:05:00')
+        assert params[0] == 60, "Pruned period should be served by rollup"
+
+    def test_retention_keep_rows_not_rolled_up_by_coarse_resolution(self):
+        DataHandlerService().init(self._location, self._testMethodName, False, rollup=(60, 3600), raw_retention=600)
+        DataHandlerService().start(Event())
+        self._write(1800)
+        DataHandlerService().rollup.run()
+        # 1h bucket not closed yet; All raw rows kept for it
+        assert self._count('SELECT * FROM RollupSample') == 1800 * len(self._names)
+
+
+    def test_rollup_over_partitions(self):
+        DataHandlerService().init(self._location, self._testMethodName, False, partition_interval=3600,
+                                  rollup=(60,), raw_retention=600)
+        DataHandlerService().start(Event())
+        # Rollover within minute 14; Its bucket split between partitions
+        self._write(870)
+        DataHandlerService().partitions.rollover()
+        self._write(1800, 870)
+        catalog = TableSchemaService().tables.Partitions
+        (first, first_file), (second, _) = DataHandlerService().partitions.select()
+        for part_id, start, end in ((first, '2021-01-01 00:00:00', '2021-01-01 00:14:30'),
+                                    (second, '2021-01-01 00:14:30', None)):
+            DataHandlerService().execute(f"UPDATE {catalog.name} SET Start = ?, End = ? WHERE PART_ID = ?",
+                                         start, end, part_id)
+        DataHandlerService().rollup.run()
+        assert self._count('SELECT * FROM RollupSample_rollup') == 28 * len(self._names)
+        assert DataHandlerService().query(
+            "SELECT Samples, Value_min, Value_max FROM RollupSample_rollup r "
+            "JOIN TimeLine t ON r.TL_REF = t.TL_ID WHERE Name = 'a' AND t.TimeStamp IN (?, ?) ORDER BY TL_REF",
+            '2021-01-01 00:00:00', '2021-01-01 00:14:00') == [(60, 0.0, 59.0), (60, 840.0, 899.0)]
+        # Raw rows kept for last 10 minutes only; Closed partition left empty removed
+        rows = DataHandlerService().query_period('SELECT COUNT() FROM RollupSample')
+        assert rows[0][0] == 601 * len(self._names), rows
+        assert [p for p, _ in DataHandlerService().partitions.select()] == [second]
+        assert not os.path.exists(os.path.join(self._location, first_file))
+
+
+class TestWriterStatistics(TestCase):
+    _location = r'./data_handler_statistics'
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        rmtree(cls._location, True)
+        TableSchemaService().register_table(BenchSample())
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        DataHandlerService().stop()
+        rmtree(cls._location, True)
+
+    def test_histogram(self):
+        histogram = Histogram(1, 10, 100)
+        for value in range(1, 201):
+            histogram.add(value)
+        assert len(histogram) == 200 and histogram.mean == 100.5
+        assert histogram.percentile(5) == 10 and histogram.percentile(50) == 100 and histogram.percentile(99) == 200
+        assert histogram.buckets == {'<=1': 1, '<=10': 9, '<=100': 90, '>100': 100}
+
+    def test_writer_statistics(self):
+        DataHandlerService().init(self._location, self._testMethodName, False)
+        DataHandlerService().start(Event())
+        table = TableSchemaService().tables.BenchSample
+        units = [DataUnit(table, table.template(f"row_{i}", i / 3, i * 2.5, i)) for i in range(500)]
+        for unit in units:
+            DataHandlerService().add_data_unit(unit)
+        wait_data_units(units, timeout=10)
+        statistics = DataHandlerService().statistics
+        assert statistics['tables']['BenchSample']['rows'] == 500, statistics['tables']
+        assert statistics['queue_wait_ms']['count'] == 500
+        assert statistics['batch_size']['count'] == statistics['commit_latency_ms']['count'] == statistics['batches']
+        assert 'Table BenchSample: units=500, rows=500' in DataHandlerService().statistics_summary()
+
+    def test_recording_overhead(self):
+        table = BenchSample()
+        statements = [(DataUnit(table, table.template(f"row_{i}", i / 3, i * 2.5, i)), '', [()])
+                      for i in range(DataHandlerService().batch_size)]
+        statistics, batches = WriterStatistics(), 1000
+        _start = perf_counter()
+        for _ in range(batches):
+            statistics.add_batch(statements, 0, perf_counter(), perf_counter())
+        duration = perf_counter() - _start
+        print(f"Statistics overhead: {duration / batches / len(statements) * 1e6:.2f}us per unit")
+        assert duration / batches / len(statements) < 20e-6, f"Statistics recording too expensive: {duration}s"
+
+
+class TestShutdownDrain(TestCase):
+    _location = r'./data_handler_drain'
+    _units_count = 1000
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        rmtree(cls._location, True)
+        TableSchemaService().register_table(BenchSample())
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        DataHandlerService().stop()
+        rmtree(cls._location, True)
+
+    @staticmethod
+    def _hold_writer(locked: Event, duration):
+        with DataHandlerService()._db.lock:
+            locked.set()
+            sleep(duration)
+
+    def _count(self):
+        return DataHandlerService().execute('SELECT COUNT() FROM BenchSample')[0][0]
+
+    def test_journal_replayed_on_cumulative_init(self):
+        DataHandlerService().init(self._location, self._testMethodName, False, batch_size=50)
+        DataHandlerService().start(Event())
+        table = TableSchemaService().tables.BenchSample
+        locked = Event()
+        th = Thread(target=self._hold_writer, args=(locked, 1), daemon=True)
+        th.start()
+        locked.wait(5)
+        for i in range(self._units_count):
+            DataHandlerService().add_data_unit(DataUnit(table, (f"row_{i}", i / 3, i * 2.5, i)))
+        DataHandlerService().stop(timeout=0.5)
+        journal = DataHandlerService().queue_statistics['journal']
+        assert journal > 0, "Queue drained within deadline; Writer not blocked"
+        DataHandlerService().add_data_unit(DataUnit(table, ("late_row", 0, 0, 0)))
+        th.join()
+        sleep(0.5)
+        written = self._count()
+        assert written + journal == self._units_count, f"Data lost: {written} rows + {journal} in journal"
+
+        DataHandlerService().init(self._location, self._testMethodName, True)
+        DataHandlerService().start(Event())
+        assert self._count() == self._units_count + 1, f"Journal not replayed: {self._count()} rows"
+        DataHandlerService().stop()
+
+    def test_journal_discarded_on_new_db(self):
+        DataHandlerService().init(self._location, self._testMethodName, False)
+        table = TableSchemaService().tables.BenchSample
+        DataHandlerService()._journal.append(insert_sql(table.name, table.columns), [("row", 0, 0, 0)])
+        DataHandlerService().init(self._location, self._testMethodName, False)
+        DataHandlerService().start(Event())
+        assert not DataHandlerService()._journal.exists and self._count() == 0
+
+    def test_failed_journal_entries_dead_lettered(self):
+        DataHandlerService().init(self._location, self._testMethodName, False, batch_size=4)
+        table = TableSchemaService().tables.BenchSample
+        journal = DataHandlerService()._journal
+        rows = [[(f"row_{i}", 0, 0, i)] for i in range(10)]
+        journal.extend((insert_sql(table.name, table.columns), r) for r in rows[:5])
+        journal.append('INSERT INTO MissingTable VALUES (?)', [(1,)])
+        journal.extend((insert_sql(table.name, table.columns), r) for r in rows[5:])
+        DataHandlerService().init(self._location, self._testMethodName, True, batch_size=4)
+        DataHandlerService().start(Event())
+        try:
+            assert self._count() == 10, f"Rows lost or duplicated: {self._count()}"
+            assert not journal.exists, "Journal kept after replay"
+            DataHandlerService()._replay_journal()
+            assert self._count() == 10, f"Rows replayed twice: {self._count()}"
+            assert os.path.getsize(DataHandlerService()._journal.dead_letter_path) > 0
+        finally:
+            DataHandlerService().stop()
+
+    def test_replay_resumed_from_checkpoint(self):
+        path = os.path.join(self._location, f"{self._testMethodName}{JOURNAL_EXT}")
+        os.makedirs(self._location, exist_ok=True)
+        journal = DataJournal(path)
+        journal.extend((f"sql_{i}", [(i,)]) for i in range(6))
+        replayed = []
+        for entry in journal.replay():
+            replayed.append(entry)
+            if len(replayed) == 4:
+                journal.checkpoint()
+                break
+        assert [e[0] for e in journal.replay()] == ['sql_4', 'sql_5'], "Committed entries replayed again"
+        journal.checkpoint()
+        assert not journal.exists
+
+    def test_exit_hook_registered_once(self):
+        hooks = []
+        exit_hooks = SimpleNamespace(register=hooks.append,
+                                     unregister=lambda f: hooks.remove(f) if f in hooks else None)
+        DataHandlerService().init(self._location, self._testMethodName, False)
+        with patch('RemoteMonitorLibrary.api.services.atexit', exit_hooks):
+            DataHandlerService().start(Event())
+            DataHandlerService().start(Event())
+            try:
+                assert len(hooks) == 1, f"Exit hook registered on every start: {hooks}"
+            finally:
+                DataHandlerService().stop()
+            assert len(hooks) == 0, "Exit hook not unregistered on stop"
+
+class TestPriorityLane(TestCase):
+    _location = r'./data_handler_priority'
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        rmtree(cls._location, True)
+        TableSchemaService().register_table(BenchSample())
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        DataHandlerService().stop()
+        rmtree(cls._location, True)
+
+    def test_priority_ahead_of_bulk(self):
+        lock, order, bulk_locked = PriorityLock(), [], Event()
+
+        def _bulk(name, hold=0.0):
+            with lock.bulk():
+                bulk_locked.set()
+                order.append(name)
+                sleep(hold)
+
+        def _priority(name):
+            with lock.priority():
+                order.append(name)
+
+        first_bulk = Thread(target=_bulk, args=('bulk_1', 0.3))
+        first_bulk.start()
+        bulk_locked.wait(5)
+        priority = Thread(target=_priority, args=('priority',))
+        priority.start()
+        while lock.pending == 0:
+            sleep(0.01)
+        second_bulk = Thread(target=_bulk, args=('bulk_2',))
+        second_bulk.start()
+        for th in (first_bulk, priority, second_bulk):
+            th.join(5)
+        assert order == ['bulk_1', 'priority', 'bulk_2'], order
+
+    def test_control_write_latency_under_load(self):
+        DataHandlerService().init(self._location, self._testMethodName, False)
+        DataHandlerService().start(Event())
+        bench, host = TableSchemaService().tables.BenchSample, TableSchemaService().tables.TraceHost
+        units = [DataUnit(bench, (f"row_{i}", i / 3, i * 2.5, i)) for i in range(20000)]
+        loader = Thread(target=lambda: [DataHandlerService().add_data_unit(u) for u in units], daemon=True)
+        loader.start()
+        latencies = []
+        for i in range(20):
+            _start = perf_counter()
+            DataHandlerService().execute_priority(insert_sql(host.name, host.columns), None, f"host_{i}")
+            latencies.append(perf_counter() - _start)
+            sleep(0.01)
+        loader.join()
+        wait_data_units(units, timeout=30)
+        print(f"Control write latency under load: max {max(latencies) * 1000:.1f}ms, "
+              f"avg {sum(latencies) / len(latencies) * 1000:.1f}ms")
+        assert max(latencies) < 1, f"Control write stalled: {max(latencies)}s"
+        assert DataHandlerService().query('SELECT COUNT() FROM TraceHost')[0][0] == 20
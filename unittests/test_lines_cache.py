@@ -1,10 +1,13 @@
 import itertools
 from datetime import datetime
 from threading import Event
+from typing import Iterator
 from unittest import TestCase
 from shutil import rmtree
 
-from RemoteMonitorLibrary.api.services import CacheLines, DataHandlerService
+from RemoteMonitorLibrary.api import db, model
+from RemoteMonitorLibrary.api.services import CacheLines, DataHandlerService, LineHash, OutputStorage, \
+    TableSchemaService, cache_timestamp
 
 
 class TestCacheLines(TestCase):
@@ -35,11 +38,12 @@ class TestCacheLines(TestCase):
         self._event = Event()
         DataHandlerService().init(self._location, self._testMethodName, False)
         DataHandlerService().start(self._event)
-        self._workers = int(self._testMethodName.split('_')[-1])
+        # IN-query chunk size by test suffix (01 -> 100 lines, etc.)
+        self._chunk_size = int(self._testMethodName.split('_')[-1]) * 100
         self._test_start = datetime.now()
 
     def tearDown(self) -> None:
-        print(f"Test {self._testMethodName} {self._workers} workers - duration: "
+        print(f"Test {self._testMethodName} chunk {self._chunk_size} lines - duration: "
               f"{(datetime.now() - self._test_start).total_seconds()}s. [DB: {DataHandlerService().db_file}]")
         DataHandlerService().stop()
 
@@ -49,35 +53,35 @@ class TestCacheLines(TestCase):
     def test_upload_01(self):
         for name, portion in self._data_portions.items():
             _start = datetime.now()
-            CacheLines().upload('\n'.join(portion), self._workers)
+            CacheLines().upload('\n'.join(portion), chunk_size=self._chunk_size)
             print(f"\t{name} duration: {(datetime.now() - _start).total_seconds()}s.")
         self.verify_all_data_inside()
 
     def test_upload_02(self):
         for name, portion in self._data_portions.items():
             _start = datetime.now()
-            CacheLines().upload('\n'.join(portion), self._workers)
+            CacheLines().upload('\n'.join(portion), chunk_size=self._chunk_size)
             print(f"\t{name} duration: {(datetime.now() - _start).total_seconds()}s.")
         self.verify_all_data_inside()
 
     def test_upload_03(self):
         for name, portion in self._data_portions.items():
             _start = datetime.now()
-            CacheLines().upload('\n'.join(portion), self._workers)
+            CacheLines().upload('\n'.join(portion), chunk_size=self._chunk_size)
             print(f"\t{name} duration: {(datetime.now() - _start).total_seconds()}s.")
         self.verify_all_data_inside()
 
     def test_upload_04(self):
         for name, portion in self._data_portions.items():
             _start = datetime.now()
-            CacheLines().upload('\n'.join(portion), self._workers)
+            CacheLines().upload('\n'.join(portion), chunk_size=self._chunk_size)
             print(f"\t{name} duration: {(datetime.now() - _start).total_seconds()}s.")
         self.verify_all_data_inside()
 
     def test_upload_05(self):
         for name, portion in self._data_portions.items():
             _start = datetime.now()
-            CacheLines().upload('\n'.join(portion), self._workers)
+            CacheLines().upload('\n'.join(portion), chunk_size=self._chunk_size)
             print(f"\t{name} duration: {(datetime.now() - _start).total_seconds()}s.")
         self.verify_all_data_inside()
 
@@ -89,3 +93,271 @@ class TestCacheLines(TestCase):
     #
     # def test_upload_40(self):
     #    CacheLines().upload(self._data_source)
+
+
+class TestBulkCacheLines(TestCase):
+    _location = r'./line_cache_bulk'
+    _lines_count = 10000
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        rmtree(cls._location, True)
+        cls._output = '\n'.join([f"[{i:05d}] CC  kernel/module_{i % 500}.o -> build step {i}"
+                                 for i in range(cls._lines_count)])
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        DataHandlerService().stop()
+        rmtree(cls._location, True)
+
+    def setUp(self) -> None:
+        DataHandlerService().init(self._location, self._testMethodName, False)
+        DataHandlerService().start(Event())
+
+    def tearDown(self) -> None:
+        DataHandlerService().stop()
+
+    def _upload_rate(self, output):
+        _start = datetime.now()
+        output_ref = CacheLines().upload(output)
+        duration = (datetime.now() - _start).total_seconds()
+        print(f"\t{self._testMethodName}: {len(output.splitlines())} lines; {duration}s.")
+        return output_ref, len(output.splitlines()) / duration
+
+    def test_upload_10k_lines_throughput(self):
+        output_ref, new_lines_rate = self._upload_rate(self._output)
+        next_ref, cached_lines_rate = self._upload_rate(f"{self._output}\nextra line")
+        print(f"\tUpload throughput: {new_lines_rate:.0f} lines/s (new) -> {cached_lines_rate:.0f} lines/s (cached)")
+        assert cached_lines_rate > new_lines_rate, \
+            f"Cached lines not faster than new ones: {cached_lines_rate:.0f} vs. {new_lines_rate:.0f} lines/s"
+        assert next_ref == output_ref + 1
+        assert DataHandlerService().execute('SELECT COUNT() FROM LinesCache')[0][0] == self._lines_count + 1
+        assert DataHandlerService().execute('SELECT COUNT() FROM LinesCacheMap')[0][0] == self._lines_count * 2 + 1
+
+    def test_identical_output_reused(self):
+        output_ref = CacheLines().upload(self._output)
+        for _ in range(9):
+            assert CacheLines().upload(self._output) == output_ref
+        assert DataHandlerService().execute('SELECT COUNT() FROM LinesCacheMap')[0][0] == self._lines_count
+        assert CacheLines().statistics['dedup_ratio'] == 0.9, CacheLines().statistics
+
+    def test_upload_order_kept(self):
+        lines = self._output.splitlines()[:1000]
+        lines = lines + lines[:10]
+        output_ref = CacheLines().upload('\n'.join(lines))
+        stored = DataHandlerService().execute(
+            'SELECT Line FROM LinesCacheMap JOIN LinesCache ON LINE_ID = LINE_REF '
+            'WHERE OUTPUT_REF = ? ORDER BY ORDER_ID', output_ref)
+        assert [r[0] for r in stored] == lines
+
+
+class TestLineHashSchema(TestCase):
+    _location = r'./line_cache_hash'
+    _lines_count = 20000
+    _results = {}
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        rmtree(cls._location, True)
+        cls._output = '\n'.join([f"[{i:05d}] CC  kernel/module_{i % 500}.o -> build step {i}"
+                                 for i in range(cls._lines_count)])
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        DataHandlerService().stop()
+        rmtree(cls._location, True)
+        print("Line hash schema: {}".format(', '.join([f"{k}: {v}" for k, v in cls._results.items()])))
+
+    def _start(self, name, line_hash, cumulative=False):
+        DataHandlerService().init(self._location, name, cumulative, line_hash=line_hash)
+        DataHandlerService().start(Event())
+
+    def _stored_output(self, output_ref):
+        return [r[0] for r in DataHandlerService().execute(
+            'SELECT Line FROM LinesCacheMap JOIN LinesCache ON LINE_ID = LINE_REF '
+            'WHERE OUTPUT_REF = ? ORDER BY ORDER_ID', output_ref)]
+
+    def _measure(self, line_hash):
+        self._start(f"{self._testMethodName}_{line_hash}", line_hash)
+        CacheLines().upload(self._output)
+        lines = self._output.splitlines()
+        CacheLines().reset(LineHash(line_hash))
+        _start = datetime.now()
+        CacheLines()._resolve_line_ids(lines, CacheLines().DEFAULT_CHUNK_SIZE)
+        latency = (datetime.now() - _start).total_seconds()
+        DataHandlerService().execute('VACUUM')
+        size = DataHandlerService().execute('PRAGMA page_count')[0][0] * \
+            DataHandlerService().execute('PRAGMA page_size')[0][0]
+        DataHandlerService().stop()
+        self._results[line_hash] = f"{size / 1024:.0f}KB, lookup {latency:.3f}s"
+        return size, latency
+
+    def test_db_size_and_lookup(self):
+        md5_size, _ = self._measure('md5')
+        int64_size, _ = self._measure('int64')
+        assert int64_size < md5_size, f"Integer hash DB not smaller: {self._results}"
+
+    def test_collision_verified(self):
+        self._start(self._testMethodName, 'int64')
+        colliding_line = 'line with taken hash'
+        DataHandlerService().execute('INSERT INTO LinesCache VALUES (?, ?, ?)',
+                                     None, LineHash.Int64(colliding_line), 'other line')
+        output = f"first\n{colliding_line}\nlast"
+        output_ref = CacheLines().upload(output)
+        assert self._stored_output(output_ref) == output.splitlines()
+        assert CacheLines().statistics['collisions'] == 1
+        assert CacheLines().upload(f"{colliding_line}\nfirst") == output_ref + 1
+        assert self._stored_output(output_ref + 1) == [colliding_line, 'first']
+        DataHandlerService().stop()
+
+    def test_cumulative_migration(self):
+        self._start(self._testMethodName, 'md5')
+        output_ref = CacheLines().upload(self._output)
+        DataHandlerService().stop()
+
+        self._start(self._testMethodName, 'int64', True)
+        column_type = {r[1]: r[2] for r in DataHandlerService().execute('PRAGMA table_info(LinesCache)')}['HashTag']
+        assert column_type == 'INTEGER', column_type
+        assert self._stored_output(output_ref) == self._output.splitlines()
+        next_ref = CacheLines().upload(f"{self._output}\nextra line")
+        assert DataHandlerService().execute('SELECT COUNT() FROM LinesCache')[0][0] == self._lines_count + 1
+        assert self._stored_output(next_ref) == self._output.splitlines() + ['extra line']
+        DataHandlerService().stop()
+
+
+class TestOutputStorage(TestCase):
+    _location = r'./line_cache_storage'
+    _lines_count = 5000
+    _runs = 10
+    _results = {}
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        rmtree(cls._location, True)
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        DataHandlerService().stop()
+        rmtree(cls._location, True)
+        print("Output storage: {}".format(', '.join([f"{k}: {v}" for k, v in cls._results.items()])))
+
+    def setUp(self) -> None:
+        DataHandlerService().init(self._location, self._testMethodName, False)
+        DataHandlerService().start(Event())
+
+    def tearDown(self) -> None:
+        DataHandlerService().stop()
+
+    @classmethod
+    def _make_output(cls, run):
+        return '\n'.join([f"  CC [M]  drivers/net/module_{i % 700}.o" if i % 5 else
+                          f"[{run:03d}:{i:05d}] LD  vmlinux.o step {i * run}" for i in range(cls._lines_count)])
+
+    @staticmethod
+    def _read_blocks(output_ref):
+        blocks = DataHandlerService().execute(
+            'SELECT Codec, d.Data, b.Data FROM OutputBlocks b LEFT JOIN OutputDictionary d ON DICT_ID = DICT_REF '
+            'WHERE OUTPUT_REF = ? ORDER BY BLOCK_ID', output_ref)
+        return b''.join(OutputStorage(codec).decompress(data, zdict) for codec, zdict, data in blocks).decode('utf-8')
+
+    def test_compressed_round_trip(self):
+        outputs = [self._make_output(run) + '\n\nlast line after empty one' for run in range(4)]
+        refs = [CacheLines().upload(outputs[0], storage='zlib'), CacheLines().upload(outputs[1], storage='lzma'),
+                CacheLines().upload(outputs[2], storage='zlib', dictionary='make'),
+                CacheLines().upload(outputs[3], storage='lines')]
+        assert refs == list(range(4)), f"Output refs not shared across storage modes: {refs}"
+        for output, output_ref in zip(outputs[:3], refs):
+            assert self._read_blocks(output_ref).splitlines() == output.splitlines()
+        assert DataHandlerService().execute('SELECT COUNT() FROM OutputBlocks WHERE OUTPUT_REF = ?', refs[1])[0][0] \
+               > 1, "Output not split into blocks"
+
+    def test_dictionary_small_outputs(self):
+        outputs = [f"Status: OK\nIteration: {i}\nUptime: {i * 30}s\n{self._make_output(i)[:300]}" for i in range(50)]
+        sizes = {}
+        for dictionary in (None, 'status'):
+            refs = [CacheLines().upload(f"{output}\n{dictionary}", storage='zlib', dictionary=dictionary)
+                    for output in outputs]
+            sizes[dictionary] = DataHandlerService().execute(
+                f"SELECT SUM(LENGTH(Data)) FROM OutputBlocks WHERE OUTPUT_REF IN ({','.join(['?'] * len(refs))})",
+                *refs)[0][0]
+            assert self._read_blocks(refs[-1]).splitlines() == f"{outputs[-1]}\n{dictionary}".splitlines()
+        print(f"\tCompressed bytes: {sizes}")
+        assert sizes['status'] < sizes[None], f"Dictionary not effective: {sizes}"
+
+    def test_storage_size_and_write_cost(self):
+        outputs = [self._make_output(run) for run in range(self._runs)]
+        for storage, dictionary in (('lines', None), ('zlib', None), ('zlib', 'make'), ('lzma', None)):
+            DataHandlerService().stop()
+            name = f"{storage}_dict" if dictionary else storage
+            DataHandlerService().init(self._location, f"{self._testMethodName}_{name}", False)
+            DataHandlerService().start(Event())
+            _start = datetime.now()
+            for output in outputs:
+                CacheLines().upload(output, storage=storage, dictionary=dictionary)
+            duration = (datetime.now() - _start).total_seconds()
+            DataHandlerService().execute('VACUUM')
+            size = DataHandlerService().execute('PRAGMA page_count')[0][0] * \
+                DataHandlerService().execute('PRAGMA page_size')[0][0]
+            self._results[name] = (size, duration)
+        print("\n".join(f"\t{k}: {s / 1024:.0f}KB, {d / self._runs * 1000:.1f}ms per output"
+                        for k, (s, d) in self._results.items()))
+        assert self._results['zlib'][0] < self._results['lines'][0], f"Compressed storage not smaller: {self._results}"
+
+
+class OutputSample(db.PlugInTable):
+    def __init__(self):
+        super().__init__('OutputSample')
+        self.add_time_reference()
+        self.add_field(model.Field('Command'))
+        self.add_output_cache_reference()
+
+
+class TestOutputReader(TestCase):
+    _location = r'./line_cache_reader'
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        rmtree(cls._location, True)
+        TableSchemaService().register_table(OutputSample())
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        DataHandlerService().stop()
+        rmtree(cls._location, True)
+
+    def setUp(self) -> None:
+        DataHandlerService().init(self._location, self._testMethodName, False)
+        DataHandlerService().start(Event())
+
+    def tearDown(self) -> None:
+        DataHandlerService().stop()
+
+    @staticmethod
+    def _add_sample(host_id, timestamp, output, storage='lines'):
+        output_ref = CacheLines().upload(output, storage=storage)
+        DataHandlerService().execute('INSERT INTO OutputSample VALUES (?, ?, ?, ?)',
+                                     host_id, cache_timestamp(timestamp), 'cmd', output_ref)
+        return output_ref
+
+    def test_read_output_streamed(self):
+        output = '\n'.join(f"line {i}" for i in range(5000)) + '\n\nafter empty line'
+        for storage in ('lines', 'zlib', 'lzma'):
+            reader = CacheLines().read(CacheLines().upload(f"{output}\n{storage}", storage=storage))
+            assert isinstance(reader, Iterator)
+            assert next(reader) == 'line 0'
+            assert '\n'.join(['line 0'] + list(reader)) == f"{output}\n{storage}"
+        assert list(CacheLines().read(100)) == []
+
+    def test_read_range_for_host_and_period(self):
+        expected = {}
+        for second in range(6):
+            for host_id in (1, 2):
+                output = f"host {host_id}\nsecond {second}"
+                output_ref = self._add_sample(host_id, f"2021-01-01 00:00:{second:02d}", output,
+                                              'zlib' if second % 2 else 'lines')
+                if host_id == 1 and 1 <= second <= 4:
+                    expected[output_ref] = output
+        outputs = {ref: '\n'.join(lines) for ref, lines in
+                   CacheLines().read_range(1, '2021-01-01 00:00:01', '2021-01-01 00:00:04')}
+        assert outputs == expected, outputs
+        assert len(list(CacheLines().read_range(2))) == 6
@@ -0,0 +1,160 @@
+from collections import namedtuple
+from shutil import rmtree
+from threading import Thread, Event
+from time import perf_counter
+from unittest import TestCase
+
+from RemoteMonitorLibrary.api.services import DataHandlerService, TableSchemaService
+from RemoteMonitorLibrary.api.model import Field
+from RemoteMonitorLibrary.plugins_modules.atop_plugin import aTop, aTopSystemLevelChart, atop_system_level, \
+    atop_process_level
+from RemoteMonitorLibrary.utils.sql_engine import SQL_DB, insert_sql, select_sql, update_sql, statement_cache
+
+
+class TestSQL_DB(TestCase):
+    _location = r'./sql_engine'
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        rmtree(cls._location, True)
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        rmtree(cls._location, True)
+
+    @staticmethod
+    def _fill(db: SQL_DB):
+        db.execute('CREATE TABLE IF NOT EXISTS Sample (ID INTEGER, Name TEXT)')
+        db.execute(insert_sql('Sample', ['ID', 'Name']), [(i, f"name_{i}") for i in range(100)])
+
+    def test_wal_mode(self):
+        db = SQL_DB(self._location, self._testMethodName)
+        assert db.execute('PRAGMA journal_mode')[0][0] == 'wal'
+        db.close()
+
+    def test_read_not_blocked_by_writer(self):
+        db = SQL_DB(self._location, self._testMethodName)
+        self._fill(db)
+        writer_locked, release = Event(), Event()
+
+        def _hold_writer():
+            with db._lock:
+                writer_locked.set()
+                release.wait(10)
+
+        th = Thread(target=_hold_writer, daemon=True)
+        th.start()
+        writer_locked.wait(5)
+        try:
+            reader = Thread(target=lambda: self.assertEqual(db.query('SELECT COUNT() FROM Sample')[0][0], 100))
+            reader.start()
+            reader.join(2)
+            assert not reader.is_alive(), "Read query blocked by writer lock"
+        finally:
+            release.set()
+            th.join()
+        db.close()
+
+    def test_abandoned_iterators_not_block_query(self):
+        db = SQL_DB(self._location, self._testMethodName, read_pool_size=1)
+        self._fill(db)
+        iterators = [db.iterate('SELECT ID FROM Sample') for _ in range(3)]
+        for it in iterators:
+            assert next(it)[0] == 0
+        reader = Thread(target=lambda: self.assertEqual(db.query('SELECT COUNT() FROM Sample')[0][0], 100))
+        reader.start()
+        reader.join(2)
+        assert not reader.is_alive(), "Read query blocked by abandoned iterators"
+        for it in iterators:
+            it.close()
+        db.close()
+
+    def test_statement_preparation_overhead(self):
+        db = SQL_DB(self._location, self._testMethodName)
+        db.execute('CREATE TABLE IF NOT EXISTS TimeLine (TL_ID INTEGER PRIMARY KEY, TimeStamp TEXT)')
+        timestamps = [f"2021-01-01 {h:02d}:{m:02d}:{s:02d}" for h in range(2) for m in range(60) for s in range(60)]
+        db.execute(insert_sql('TimeLine', ['TL_ID', 'TimeStamp']), [(None, ts) for ts in timestamps])
+        db.execute('CREATE INDEX IF NOT EXISTS idx_TimeLine_TimeStamp ON TimeLine (TimeStamp)')
+        _start = perf_counter()
+        for ts in timestamps:
+            db.execute(f'SELECT TL_ID FROM TimeLine WHERE TimeStamp == "{ts}"')
+        interpolated = perf_counter() - _start
+        _start = perf_counter()
+        for ts in timestamps:
+            sql, params = select_sql('TimeLine', 'TL_ID', TimeStamp=ts)
+            db.execute(sql, *params)
+        bound = perf_counter() - _start
+        db.close()
+        print(f"TimeLine lookup: {interpolated / len(timestamps) * 1e6:.1f}us (interpolated) -> "
+              f"{bound / len(timestamps) * 1e6:.1f}us (bound parameters)")
+        assert bound < interpolated, f"Bound parameters slower: {bound}s vs. {interpolated}s"
+
+    def test_statement_text_cached(self):
+        assert insert_sql('Sample', ['ID', 'Name']) is insert_sql('Sample', ['ID', 'Name'])
+        assert update_sql('Sample', dict(Name='n'), ID=1) == ('UPDATE Sample\nSET Name = ?\nWHERE ID = ?', ('n', 1))
+        assert select_sql('Sample', 'Name', ID=1)[0] is select_sql('Sample', 'Name', ID=2)[0]
+        assert statement_cache.statistics['hits'] > 0
+
+    def test_filter_values_bound(self):
+        db = SQL_DB()
+        self._fill(db)
+        sql, params = update_sql('Sample', dict(Name='updated'), ID=7)
+        db.execute(sql, *params)
+        sql, params = select_sql('Sample', 'ID', Name='updated')
+        assert db.execute(sql, *params) == [(7,)]
+        db.close()
+
+    def test_memory_db_query(self):
+        db = SQL_DB()
+        self._fill(db)
+        assert db.query('SELECT COUNT() FROM Sample WHERE ID < ?', 10)[0][0] == 10
+        db.close()
+
+
+class TestTableIndexes(TestCase):
+    def test_foreign_key_indexes_derived(self):
+        indexes = [i.fields for i in atop_system_level().indexes]
+        assert ('HOST_REF', 'TL_REF') in indexes, f"Composite index missing: {indexes}"
+        assert ('TL_REF',) in indexes, f"Foreign key index missing: {indexes}"
+        assert ('HOST_REF',) not in indexes, f"Index covered by composite one duplicated: {indexes}"
+
+    def test_chart_query_use_indexes(self):
+        for table in aTop.affiliated_tables():
+            TableSchemaService().register_table(table)
+        DataHandlerService().init()
+        DataHandlerService().start(Event())
+        try:
+            sql = aTopSystemLevelChart('CPU').compose_sql_query(host_name='host', start_mark='2021-01-01 00:00:00')
+            plan = ' '.join(str(r[-1]) for r in DataHandlerService().execute(f"EXPLAIN QUERY PLAN {sql}"))
+            assert 'USING INDEX idx_atop_system_level_HOST_REF_TL_REF' in plan, plan
+            plan = ' '.join(str(r[-1]) for r in DataHandlerService().execute(
+                "EXPLAIN QUERY PLAN SELECT TL_ID FROM TimeLine WHERE TimeStamp == '2021-01-01 00:00:00'"))
+            assert 'idx_TimeLine_TimeStamp' in plan, plan
+        finally:
+            DataHandlerService().stop()
+
+
+class TestTableTemplate(TestCase):
+    _rows_count = 10000
+
+    def test_template_compiled_once(self):
+        table = atop_process_level()
+        assert table.template is table.template
+        template = table.template
+        table.add_field(Field('Extra'))
+        assert table.template is not template and table.template._fields[-1] == 'Extra'
+
+    def test_row_construction_cost(self):
+        table = atop_process_level()
+        row = (1, None, 1234, 0.5, 1.2, 0.0, 0.1, 0.0, 2.0, 3, 'apache_1234')
+        _start = perf_counter()
+        for _ in range(self._rows_count):
+            namedtuple(table.name, table.columns)(*row)
+        uncached = perf_counter() - _start
+        _start = perf_counter()
+        for _ in range(self._rows_count):
+            table.template(*row)
+        cached = perf_counter() - _start
+        print(f"atop_process_level row: {uncached / self._rows_count * 1e6:.1f}us (class per row) -> "
+              f"{cached / self._rows_count * 1e6:.2f}us (compiled template)")
+        assert cached * 10 < uncached, f"Template not cached: {cached}s vs. {uncached}s"